@@ -0,0 +1,211 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Compares how quickly sensor data reaches the racecar modules with a single-threaded
+and a multi-threaded ROS executor.
+
+Usage:
+    python3 executor_latency_benchmark.py [--duration 10] [--camera-work 0]
+
+Mock publishers send color and depth images, LIDAR scans, and IMU data on the
+topics used by the car.  The real CameraReal, LidarReal, and PhysicsReal modules
+receive them, and the latency from publishing a message until its callback
+finishes is reported for each topic and executor.  CameraReal only converts images
+when a program asks for them, so each timed image callback also converts its image
+to keep the camera's work inside the callbacks.  --camera-work adds extra time (in
+ms) to each color image callback to model a slower image conversion.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+
+import rclpy as ros2
+from rclpy.executors import MultiThreadedExecutor, SingleThreadedExecutor
+from rclpy.qos import qos_profile_sensor_data
+from cv_bridge import CvBridge
+from sensor_msgs.msg import Imu, LaserScan
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library", "real"))
+from camera_real import CameraReal
+from lidar_real import LidarReal
+from physics_real import PhysicsReal
+
+# The topics and publishing rates (in Hz) of the mock sensors
+TOPICS = {
+    "/camera/color": 30,
+    "/camera/depth": 30,
+    "/scan": 10,
+    "/camera/accel": 200,
+    "/camera/gyro": 200,
+}
+
+# The latencies (in ms) measured for each topic during the current run
+latencies: Dict[str, List[float]] = {topic: [] for topic in TOPICS}
+
+# Extra time (in seconds) spent in each color image callback
+camera_work: float = 0
+
+
+def record_latency(topic: str, message) -> None:
+    """
+    Records the time from when a message was stamped until now.
+    """
+    stamp = message.header.stamp.sec * 1_000_000_000 + message.header.stamp.nanosec
+    latencies[topic].append((time.time_ns() - stamp) / 1e6)
+
+
+class TimedCameraReal(CameraReal):
+    def _CameraReal__color_callback(self, data):
+        super()._CameraReal__color_callback(data)
+
+        # Convert into a new image, since callbacks may run on any thread
+        self._CameraReal__convert_color_image(data, None)
+        time.sleep(camera_work)
+        record_latency("/camera/color", data)
+
+    def _CameraReal__depth_callback(self, data):
+        super()._CameraReal__depth_callback(data)
+        self._CameraReal__convert_depth_image(data, None)
+        record_latency("/camera/depth", data)
+
+
+class TimedLidarReal(LidarReal):
+    def _LidarReal__scan_callback(self, data):
+        super()._LidarReal__scan_callback(data)
+        record_latency("/scan", data)
+
+
+class TimedPhysicsReal(PhysicsReal):
+    def _PhysicsReal__accel_callback(self, data):
+        super()._PhysicsReal__accel_callback(data)
+        record_latency("/camera/accel", data)
+
+    def _PhysicsReal__gyro_callback(self, data):
+        super()._PhysicsReal__gyro_callback(data)
+        record_latency("/camera/gyro", data)
+
+
+def create_mock_publishers(node) -> None:
+    """
+    Creates a timer on node for each topic which publishes freshly stamped messages.
+    """
+    bridge = CvBridge()
+    rng = np.random.default_rng(0)
+    color_message = bridge.cv2_to_imgmsg(
+        rng.integers(0, 256, (480, 640, 3), np.uint8), "bgr8"
+    )
+    depth_message = bridge.cv2_to_imgmsg(
+        rng.integers(0, 10000, (480, 640), np.uint16), "16UC1"
+    )
+    scan_message = LaserScan()
+    scan_message.ranges = rng.uniform(0.1, 10, 720).astype(np.float32).tolist()
+    imu_message = Imu()
+
+    messages = {
+        "/camera/color": color_message,
+        "/camera/depth": depth_message,
+        "/scan": scan_message,
+        "/camera/accel": imu_message,
+        "/camera/gyro": imu_message,
+    }
+
+    for topic, rate in TOPICS.items():
+        message = messages[topic]
+        publisher = node.create_publisher(
+            type(message), topic, qos_profile_sensor_data
+        )
+
+        def publish(publisher=publisher, message=message) -> None:
+            now = time.time_ns()
+            message.header.stamp.sec = now // 1_000_000_000
+            message.header.stamp.nanosec = now % 1_000_000_000
+            publisher.publish(message)
+
+        node.create_timer(1 / rate, publish)
+
+
+def run(executor, duration: float) -> None:
+    """
+    Receives sensor data with the real modules on executor for duration seconds.
+    """
+    for topic_latencies in latencies.values():
+        topic_latencies.clear()
+
+    modules = [TimedCameraReal(), TimedLidarReal(), TimedPhysicsReal()]
+    for module in modules:
+        executor.add_node(module.node)
+
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        executor.spin_once(timeout_sec=0.1)
+
+    for module in modules:
+        executor.remove_node(module.node)
+        module.node.destroy_node()
+
+
+def report(name: str) -> None:
+    """
+    Prints the latency percentiles of each topic.
+    """
+    print(f">> {name} executor")
+    for topic, topic_latencies in latencies.items():
+        if len(topic_latencies) == 0:
+            print(f"    {topic:14} no messages received")
+            continue
+        p50, p90, p99 = np.percentile(topic_latencies, [50, 90, 99])
+        print(
+            f"    {topic:14} {len(topic_latencies):5} messages | latency (ms): "
+            f"p50 {p50:.2f} | p90 {p90:.2f} | p99 {p99:.2f} | "
+            f"max {max(topic_latencies):.2f}"
+        )
+
+
+def main() -> None:
+    global camera_work
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--duration", type=float, default=10, help="seconds to run each executor"
+    )
+    parser.add_argument(
+        "--camera-work",
+        type=float,
+        default=0,
+        help="extra time per color image callback in ms",
+    )
+    args = parser.parse_args()
+    camera_work = args.camera_work / 1000
+
+    ros2.init()
+
+    # Publish from a separate executor so that the executor under test only
+    # receives messages
+    publisher_node = ros2.create_node("mock_sensors")
+    create_mock_publishers(publisher_node)
+    publisher_executor = SingleThreadedExecutor()
+    publisher_executor.add_node(publisher_node)
+    publisher_thread = threading.Thread(target=publisher_executor.spin)
+    publisher_thread.daemon = True
+    publisher_thread.start()
+
+    run(SingleThreadedExecutor(), args.duration)
+    report("Single-threaded")
+    run(MultiThreadedExecutor(4), args.duration)
+    report("Multi-threaded")
+
+    publisher_executor.shutdown()
+    ros2.shutdown()
+
+
+if __name__ == "__main__":
+    main()
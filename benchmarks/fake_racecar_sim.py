@@ -0,0 +1,431 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+A stand-in for RacecarSim which serves synthetic sensor data over the same UDP
+protocol, so that racecar_core programs run with -s without the Unity simulator.
+
+Usage:
+    python3 fake_racecar_sim.py [--rate 60] [--ticks 0]
+
+Start this script, then run a racecar_core program with the -s flag.  Each second,
+the script prints the achieved ticks per second and how long the program took to
+respond to each unity_update.
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+sys.path.insert(
+    1, os.path.join(os.path.dirname(__file__), "..", "library", "simulation")
+)
+from controller import Controller
+from racecar_core_sim import RacecarSim
+
+import synthetic
+
+Header = RacecarSim.Header
+Error = RacecarSim.Error
+
+
+class FakeSimStats(NamedTuple):
+    """
+    Summarizes the ticks served by a FakeRacecarSim.
+    """
+
+    # The number of unity_update messages answered and the seconds they took
+    num_ticks: int
+    elapsed: float
+    ticks_per_second: float
+
+    # The seconds between sending unity_update and receiving python_finished
+    tick_p50: float
+    tick_p90: float
+    tick_p99: float
+    tick_max: float
+
+    # The number of requests received with each header, by header name
+    message_counts: Dict[str, int]
+
+
+class FakeRacecarSim:
+    """
+    Implements the server side of the RacecarSim protocol with synthetic data.
+
+    Note:
+        Like RacecarSim, the server listens for synchronous requests on port 5065 and
+        asynchronous requests (such as get_color_image_async) on port 5064.  Each
+        port is served by its own thread.  Several cars may connect, in which case
+        each tick ends once every car has sent python_finished.
+    """
+
+    # The number of distinct synthetic frames served in a loop
+    __NUM_FRAMES = 60
+
+    # The number of packets in which a color image is sent
+    __NUM_FRAGMENTS = 32
+
+    # The resolution at which depth images are sent, which the client upscales
+    __DEPTH_SIZE = (80, 60)
+
+    # The number of seconds to wait for a message before checking whether to stop
+    __POLL_TIME = 0.25
+
+    def __init__(
+        self, tick_rate: float = 60, num_ticks: int = 0, num_cars: int = 1
+    ) -> None:
+        """
+        Opens the RacecarSim ports and generates the synthetic data.
+
+        Args:
+            tick_rate: The number of unity_update messages to send each second, or 0
+                to send the next one as soon as the program finishes.
+            num_ticks: The number of unity_update messages to send before unity_exit,
+                or 0 to continue until the program exits.
+            num_cars: The number of cars which must connect before the first tick.
+        """
+        assert tick_rate >= 0, f"tick_rate ({tick_rate}) must be non-negative."
+        assert num_cars > 0, f"num_cars ({num_cars}) must be a positive integer."
+        self.__tick_rate = tick_rate
+        self.__num_ticks = num_ticks
+        self.__num_cars = num_cars
+
+        self.__sync_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__sync_socket.bind(RacecarSim._RacecarSim__UNITY_PORT)
+        self.__async_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.__async_socket.bind(RacecarSim._RacecarSim__UNITY_ASYNC_PORT)
+        self.__sync_socket.settimeout(self.__POLL_TIME)
+        self.__async_socket.settimeout(self.__POLL_TIME)
+        self.__clients: List[Tuple[str, int]] = []
+        self.__connected = threading.Event()
+
+        # The remaining fragments of the image being sent to each car on each socket
+        self.__fragments: Dict[Tuple[socket.socket, Tuple[str, int]], List[bytes]] = {}
+        self.__running = True
+
+        self.__frame: int = 0
+        self.__color_images: List[bytes] = []
+        self.__depth_images: List[bytes] = []
+        self.__scans: List[bytes] = []
+        rng = np.random.default_rng(0)
+        for i, pose in enumerate(synthetic.circuit_poses(self.__NUM_FRAMES)):
+            color_image = cv.cvtColor(synthetic.color_image(i), cv.COLOR_BGR2RGBA)
+            depth_image = cv.resize(
+                synthetic.depth_image(i),
+                self.__DEPTH_SIZE,
+                interpolation=cv.INTER_AREA,
+            )
+            self.__color_images.append(color_image.tobytes())
+            self.__depth_images.append(depth_image.astype(np.float32).tobytes())
+            self.__scans.append(synthetic.lidar_scan(pose, rng=rng).tobytes())
+
+        self.__tick_latencies: List[float] = []
+        self.__message_counts: Dict[str, int] = {}
+        self.__start_time: float = 0
+        self.__end_time: float = 0
+        self.__lock = threading.Lock()
+
+    def run(self) -> FakeSimStats:
+        """
+        Waits for every car to connect, then runs start and update until num_ticks
+        have been served or a program exits.
+
+        Returns:
+            Statistics about the ticks served.
+        """
+        async_thread = threading.Thread(target=self.__serve_async, name="async")
+        async_thread.daemon = True
+        async_thread.start()
+        self.__connected.wait()
+
+        self.__start_time = time.perf_counter()
+        is_running = self.__tick(Header.unity_start)
+        period = 1 / self.__tick_rate if self.__tick_rate > 0 else 0
+        next_tick = time.perf_counter()
+        while is_running and (self.__num_ticks == 0 or self.__frame < self.__num_ticks):
+            next_tick += period
+            start = time.perf_counter()
+            is_running = self.__tick(Header.unity_update)
+            if is_running:
+                self.__tick_latencies.append(time.perf_counter() - start)
+                self.__frame += 1
+
+            # Fall back to the current time if the program could not keep up
+            wait = next_tick - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                next_tick = time.perf_counter()
+
+        if is_running:
+            exit_message = struct.pack("B", Header.unity_exit)
+            for client in self.__clients:
+                self.__send(self.__sync_socket, client, exit_message)
+        self.__end_time = time.perf_counter()
+
+        self.__running = False
+        async_thread.join()
+        self.__sync_socket.close()
+        self.__async_socket.close()
+        return self.get_stats()
+
+    def get_stats(self) -> FakeSimStats:
+        """
+        Returns statistics about the ticks served so far.
+        """
+        end_time = self.__end_time if self.__end_time > 0 else time.perf_counter()
+        elapsed = end_time - self.__start_time if self.__start_time > 0 else 0.0
+        latencies = np.array(self.__tick_latencies or [0.0])
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        with self.__lock:
+            message_counts = dict(self.__message_counts)
+        return FakeSimStats(
+            num_ticks=len(self.__tick_latencies),
+            elapsed=elapsed,
+            ticks_per_second=len(self.__tick_latencies) / elapsed if elapsed else 0.0,
+            tick_p50=float(p50),
+            tick_p90=float(p90),
+            tick_p99=float(p99),
+            tick_max=float(latencies.max()),
+            message_counts=message_counts,
+        )
+
+    def __send(
+        self, sock: socket.socket, client: Tuple[str, int], data: bytes
+    ) -> None:
+        sock.sendto(data, client)
+
+    def __receive(self, sock: socket.socket) -> Optional[Tuple[bytes, Tuple[str, int]]]:
+        """
+        Waits for a message from a program, or returns None once stopped.
+        """
+        while self.__running:
+            try:
+                return sock.recvfrom(16)
+            except socket.timeout:
+                pass
+        return None
+
+    def __tick(self, header: Header) -> bool:
+        """
+        Sends unity_start or unity_update to every car and serves requests until each
+        car sends python_finished.
+
+        Returns:
+            False if a program exited or reported an error.
+        """
+        for client in self.__clients:
+            self.__send(self.__sync_socket, client, struct.pack("B", header))
+
+        num_finished = 0
+        while num_finished < len(self.__clients):
+            message = self.__receive(self.__sync_socket)
+            if message is None:
+                return False
+
+            data, client = message
+            if data[0] == Header.python_finished:
+                num_finished += 1
+            elif not self.__handle_request(self.__sync_socket, client, data):
+                return False
+        return True
+
+    def __serve_async(self) -> None:
+        """
+        Answers the connection handshakes and any asynchronous requests.
+        """
+        while self.__running:
+            message = self.__receive(self.__async_socket)
+            if message is None:
+                return
+
+            data, client = message
+            if data[0] == Header.connect:
+                self.__handle_connect(client)
+            elif client in self.__clients:
+                if not self.__handle_request(self.__async_socket, client, data):
+                    # Stop the sync thread if a program exits between ticks
+                    self.__running = False
+                    return
+
+    def __handle_connect(self, client: Tuple[str, int]) -> None:
+        """
+        Assigns the next car to a program, unless it already has one.
+        """
+        # Programs repeat the handshake until it is answered, so answer only the
+        # first attempt
+        if client in self.__clients:
+            return
+
+        if len(self.__clients) == self.__num_cars:
+            error = struct.pack("BB", Header.error, Error.no_free_car)
+            self.__send(self.__async_socket, client, error)
+            return
+
+        car_index = len(self.__clients)
+        self.__clients.append(client)
+        self.__send(
+            self.__async_socket, client, struct.pack("BB", Header.connect, car_index)
+        )
+        if len(self.__clients) == self.__num_cars:
+            self.__connected.set()
+
+    def __handle_request(
+        self, sock: socket.socket, client: Tuple[str, int], data: bytes
+    ) -> bool:
+        """
+        Answers a single request from a program.
+
+        Returns:
+            False if the program exited or reported an error.
+        """
+        header = Header(data[0])
+        with self.__lock:
+            self.__message_counts[header.name] = (
+                self.__message_counts.get(header.name, 0) + 1
+            )
+
+        frame = self.__frame % self.__NUM_FRAMES
+        if header == Header.racecar_get_delta_time:
+            delta_time = 1 / self.__tick_rate if self.__tick_rate > 0 else 1 / 60
+            self.__send(sock, client, struct.pack("f", delta_time))
+        elif header == Header.camera_get_color_image:
+            self.__start_fragments(sock, client, self.__color_images[frame])
+        elif header == Header.python_send_next:
+            self.__send_next_fragment(sock, client)
+        elif header == Header.camera_get_depth_image:
+            self.__send(sock, client, self.__depth_images[frame])
+        elif header == Header.lidar_get_samples:
+            self.__send(sock, client, self.__scans[frame])
+        elif header in (
+            Header.physics_get_linear_acceleration,
+            Header.physics_get_angular_velocity,
+        ):
+            values = np.sin(self.__frame / 30 + np.arange(3)).astype(np.float32)
+            self.__send(sock, client, values.tobytes())
+        elif header in (
+            Header.controller_is_down,
+            Header.controller_was_pressed,
+            Header.controller_was_released,
+        ):
+            is_down = self.__get_button(header, data[1])
+            self.__send(sock, client, struct.pack("?", is_down))
+        elif header == Header.controller_get_trigger:
+            self.__send(sock, client, struct.pack("f", (self.__frame % 60) / 60))
+        elif header == Header.controller_get_joystick:
+            angle = self.__frame / 60 + data[1]
+            self.__send(sock, client, struct.pack("ff", np.cos(angle), np.sin(angle)))
+        elif header in (
+            Header.drive_set_speed_angle,
+            Header.drive_stop,
+            Header.drive_set_max_speed,
+            Header.racecar_set_update_slow_time,
+        ):
+            pass
+        elif header == Header.python_exit:
+            return False
+        elif header == Header.error:
+            error = data[1] if len(data) > 1 else Error.generic
+            print(f">> The program reported error [{Error(error).name}], closing...")
+            return False
+        else:
+            print(f">> Unsupported request [{header.name}], closing...")
+            self.__send(sock, client, struct.pack("BB", Header.error, Error.generic))
+            return False
+        return True
+
+    def __get_button(self, header: Header, button: int) -> bool:
+        """
+        Returns the state of a button, which each button holds down for a second in
+        turn.
+        """
+        held = (self.__frame // 60) % len(Controller.Button)
+        was_held = ((self.__frame - 1) // 60) % len(Controller.Button)
+        if header == Header.controller_is_down:
+            return button == held
+        elif header == Header.controller_was_pressed:
+            return button == held and held != was_held
+        return button == was_held and held != was_held
+
+    def __start_fragments(
+        self, sock: socket.socket, client: Tuple[str, int], data: bytes
+    ) -> None:
+        """
+        Sends the first fragment of data, and the next each time the program sends
+        python_send_next.
+        """
+        size = len(data) // self.__NUM_FRAGMENTS
+        self.__fragments[(sock, client)] = [
+            data[i * size : (i + 1) * size] for i in range(self.__NUM_FRAGMENTS)
+        ]
+        self.__send_next_fragment(sock, client)
+
+    def __send_next_fragment(
+        self, sock: socket.socket, client: Tuple[str, int]
+    ) -> None:
+        fragments = self.__fragments.get((sock, client))
+        if fragments is None:
+            error = struct.pack("BB", Header.error, Error.fragment_mismatch)
+            self.__send(sock, client, error)
+        elif fragments:
+            self.__send(sock, client, fragments.pop(0))
+        else:
+            # The program also acknowledges the last fragment
+            del self.__fragments[(sock, client)]
+
+
+def format_stats(stats: FakeSimStats) -> str:
+    """
+    Returns a one line summary of the ticks served.
+    """
+    return (
+        f">> {stats.num_ticks} ticks in {stats.elapsed:.2f} s "
+        f"({stats.ticks_per_second:.1f} ticks/s) | tick latency (ms): "
+        f"p50 {stats.tick_p50 * 1000:.3f} | p90 {stats.tick_p90 * 1000:.3f} | "
+        f"p99 {stats.tick_p99 * 1000:.3f} | max {stats.tick_max * 1000:.3f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--rate", type=float, default=60, help="ticks per second, or 0 for no limit"
+    )
+    parser.add_argument(
+        "--ticks", type=int, default=0, help="ticks before exiting, or 0 for no limit"
+    )
+    parser.add_argument(
+        "--cars", type=int, default=1, help="the number of cars which must connect"
+    )
+    args = parser.parse_args()
+
+    server = FakeRacecarSim(args.rate, args.ticks, args.cars)
+    print(">> Fake RacecarSim started, run a racecar_core program with -s to begin...")
+
+    def print_stats() -> None:
+        while True:
+            time.sleep(1)
+            stats = server.get_stats()
+            if stats.num_ticks > 0:
+                print(format_stats(stats))
+
+    reporter = threading.Thread(target=print_stats, daemon=True)
+    reporter.start()
+    stats = server.run()
+    print(format_stats(stats))
+    print(">> requests:", stats.message_counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Runs the lab solutions headless in benchmark mode (-b) and compares their update
+rate, CPU time per tick, and peak memory use.
+
+Usage:
+    python3 lab_benchmark.py [solution.py ...] [--recording DIR] [--ticks 600]
+        [--save FILE]
+
+Without --recording, each solution runs with -s against FakeRacecarSim, which
+serves synthetic data as fast as the solution responds.  With --recording, each
+solution replays the recording as fast as possible.  Pages of a replayed recording
+are memory-mapped, so they count toward the peak memory use.
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LIBRARY = os.path.join(ROOT, "library")
+FAKE_RACECAR_SIM = os.path.join(ROOT, "benchmarks", "fake_racecar_sim.py")
+
+
+def run_solution(
+    solution: str, recording: Optional[str], num_ticks: int, timeout: float
+) -> Dict[str, Any]:
+    """
+    Runs a solution in benchmark mode and returns the statistics it saved.
+    """
+    env = dict(os.environ, PYTHONPATH=LIBRARY)
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        command = [sys.executable, os.path.abspath(solution), "-h", "-b"]
+        if recording is None:
+            server = subprocess.Popen(
+                [sys.executable, FAKE_RACECAR_SIM, "--rate", "0"]
+                + ["--ticks", str(num_ticks)],
+                stdout=subprocess.DEVNULL,
+            )
+            command.append("-s")
+        else:
+            command += ["--replay", os.path.abspath(recording)]
+
+        try:
+            result = subprocess.run(
+                command,
+                cwd=directory,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+        finally:
+            if server is not None:
+                server.wait(timeout)
+
+        path = os.path.join(directory, "racecar_benchmark.json")
+        assert (
+            result.returncode == 0 and os.path.exists(path)
+        ), f"{solution} failed:\n{result.stderr.decode()[-2000:]}"
+        with open(path) as file:
+            return json.load(file)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "solutions",
+        nargs="*",
+        default=sorted(glob.glob(os.path.join(ROOT, "labSolutions", "*.py"))),
+    )
+    parser.add_argument("--recording", help="a recording made with the -r flag")
+    parser.add_argument(
+        "--ticks", type=int, default=600, help="ticks to run against FakeRacecarSim"
+    )
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--save", help="save the results to a JSON file")
+    args = parser.parse_args()
+
+    source = args.recording or f"FakeRacecarSim ({args.ticks} ticks)"
+    print(f">> source: {source}")
+    print(
+        f"{'solution':<30}{'ticks':>7}{'ticks/s':>10}{'process':>10}"
+        f"{'update':>9}{'library':>9}{'user':>9}{'RSS MB':>9}  (CPU ms/tick)"
+    )
+
+    results: Dict[str, Dict[str, Any]] = {}
+    failures: List[str] = []
+    for solution in args.solutions:
+        name = os.path.basename(solution)
+        try:
+            stats = run_solution(solution, args.recording, args.ticks, args.timeout)
+        except (AssertionError, subprocess.TimeoutExpired) as error:
+            print(f"{name:<30} failed")
+            failures.append(f"{name}: {error}")
+            continue
+
+        results[name] = stats
+        print(
+            f"{name:<30}{stats['num_ticks']:>7}{stats['ticks_per_second']:>10.1f}"
+            f"{stats['process_cpu_per_tick'] * 1000:>10.3f}"
+            f"{stats['update_cpu_per_tick'] * 1000:>9.3f}"
+            f"{stats['library_cpu_per_tick'] * 1000:>9.3f}"
+            f"{stats['user_cpu_per_tick'] * 1000:>9.3f}"
+            f"{stats['peak_rss']:>9.1f}"
+        )
+
+        # Give the operating system time to release the RacecarSim ports
+        time.sleep(0.1)
+
+    for failure in failures:
+        print(f">> {failure}")
+
+    if args.save is not None:
+        with open(args.save, "w") as file:
+            json.dump({"source": source, "results": results}, file, indent=2)
+        print(f">> saved results to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
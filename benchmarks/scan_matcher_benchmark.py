@@ -0,0 +1,80 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Measures how long ScanMatcher.update takes on a sequence of LIDAR scans.
+
+Usage:
+    python3 scan_matcher_benchmark.py [--scans scans.npy] [--frames 600]
+
+Without --scans, the car drives a synthetic circuit and the estimated pose is
+compared to the true pose.  A recorded scan file must contain a two dimensional
+array with one LIDAR scan per row.
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+from scan_matcher import ScanMatcher
+
+import synthetic
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scans", help="a .npy file of recorded LIDAR scans")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument(
+        "--budget", type=float, default=5.0, help="time budget per update in ms"
+    )
+    args = parser.parse_args()
+
+    poses = None
+    if args.scans is not None:
+        scans = np.load(args.scans).astype(np.float32)[: args.frames]
+    else:
+        rng = np.random.default_rng(0)
+        poses = synthetic.circuit_poses(args.frames)
+        scans = [synthetic.lidar_scan(pose, rng=rng) for pose in poses]
+
+    matcher = ScanMatcher(args.budget / 1000)
+    durations = np.empty(len(scans))
+    for i, scan in enumerate(scans):
+        matcher.update(scan)
+        durations[i] = matcher.get_last_duration() * 1000
+
+    # The first update only builds the lookup grid
+    durations = durations[1:]
+    p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+    print(f">> {len(scans)} scans of {len(scans[0])} samples")
+    print(
+        f">> update latency (ms): mean {durations.mean():.3f} | p50 {p50:.3f} | "
+        f"p90 {p90:.3f} | p99 {p99:.3f} | max {durations.max():.3f}"
+    )
+    print(
+        f">> over {args.budget} ms budget: "
+        f"{np.count_nonzero(durations > args.budget)} / {len(durations)}"
+    )
+
+    x, y, heading = matcher.get_pose()
+    print(f">> estimated pose: ({x:.1f} cm, {y:.1f} cm, {heading:.1f} deg)")
+    if poses is not None:
+        true_x, true_y, true_heading = poses[-1]
+        heading_error = (heading - true_heading + 180) % 360 - 180
+        print(
+            f">> true pose: ({true_x:.1f} cm, {true_y:.1f} cm, {true_heading:.1f} deg)"
+        )
+        print(
+            f">> drift: {math.hypot(x - true_x, y - true_y):.1f} cm, "
+            f"{heading_error:.2f} deg over {len(scans)} scans"
+        )
+
+
+if __name__ == "__main__":
+    main()
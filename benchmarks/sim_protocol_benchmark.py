@@ -0,0 +1,187 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Measures the throughput and message latency of the RacecarSim protocol by running a
+RacecarSim client against FakeRacecarSim in a separate process.
+
+Usage:
+    python3 sim_protocol_benchmark.py [--workload full] [--ticks 600] [--rate 0]
+        [--cars 1] [--workers N] [--client sync]
+
+The workload chooses which sensors update() reads each tick: full (camera, depth,
+LIDAR, IMU, and controller), camera, lidar, or idle (only the drive command).
+With --cars, several cars run from this process through RacecarSimFleet.  With
+--client async, a single RacecarSimAsync car requests the sensors of each workload
+concurrently.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+sys.path.insert(
+    1, os.path.join(os.path.dirname(__file__), "..", "library", "simulation")
+)
+from profiler import Profiler
+from async_sim import RacecarSimAsync
+from fleet_sim import RacecarSimFleet
+from racecar_core_sim import RacecarSim
+
+import fake_racecar_sim
+
+
+def get_workloads(rc: RacecarSim) -> Dict[str, Callable[[], None]]:
+    """
+    Returns the update function of each workload.
+    """
+
+    def full() -> None:
+        rc.camera.get_color_image()
+        rc.camera.get_depth_image()
+        rc.lidar.get_samples()
+        rc.physics.get_linear_acceleration()
+        rc.physics.get_angular_velocity()
+        rc.controller.is_down(rc.controller.Button.A)
+        rc.controller.get_trigger(rc.controller.Trigger.RIGHT)
+        rc.controller.get_joystick(rc.controller.Joystick.LEFT)
+        rc.drive.set_speed_angle(0.5, 0)
+
+    def camera() -> None:
+        rc.camera.get_color_image()
+        rc.drive.set_speed_angle(0.5, 0)
+
+    def lidar() -> None:
+        rc.lidar.get_samples()
+        rc.drive.set_speed_angle(0.5, 0)
+
+    def idle() -> None:
+        rc.drive.set_speed_angle(0.5, 0)
+
+    return {"full": full, "camera": camera, "lidar": lidar, "idle": idle}
+
+
+def get_async_workloads(
+    rc: RacecarSimAsync,
+) -> Dict[str, Callable[[], Awaitable[None]]]:
+    """
+    Returns the update coroutine of each workload, which requests sensors together.
+    """
+
+    async def full() -> None:
+        await asyncio.gather(
+            rc.camera.get_color_image(),
+            rc.camera.get_depth_image(),
+            rc.lidar.get_samples(),
+            rc.physics.get_linear_acceleration(),
+            rc.physics.get_angular_velocity(),
+            rc.controller.is_down(rc.controller.Button.A),
+            rc.controller.get_trigger(rc.controller.Trigger.RIGHT),
+            rc.controller.get_joystick(rc.controller.Joystick.LEFT),
+        )
+        await rc.drive.set_speed_angle(0.5, 0)
+
+    async def camera() -> None:
+        await rc.camera.get_color_image()
+        await rc.drive.set_speed_angle(0.5, 0)
+
+    async def lidar() -> None:
+        await rc.lidar.get_samples()
+        await rc.drive.set_speed_angle(0.5, 0)
+
+    async def idle() -> None:
+        await rc.drive.set_speed_angle(0.5, 0)
+
+    return {"full": full, "camera": camera, "lidar": lidar, "idle": idle}
+
+
+def serve(tick_rate: float, num_ticks: int, num_cars: int, connection) -> None:
+    """
+    Runs FakeRacecarSim and sends its statistics through connection.
+    """
+    server = fake_racecar_sim.FakeRacecarSim(tick_rate, num_ticks, num_cars)
+    connection.send(None)
+    connection.send(server.run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--workload", choices=["full", "camera", "lidar", "idle"], default="full"
+    )
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="ticks per second, or 0 for no limit"
+    )
+    parser.add_argument(
+        "--cars", type=int, default=1, help="cars to run with RacecarSimFleet"
+    )
+    parser.add_argument("--workers", type=int, help="threads shared by the cars")
+    parser.add_argument("--client", choices=["sync", "async"], default="sync")
+    args = parser.parse_args()
+
+    # Run the server in its own process so that it does not compete for the GIL
+    receiver, sender = multiprocessing.Pipe(False)
+    server = multiprocessing.Process(
+        target=serve, args=(args.rate, args.ticks, args.cars, sender), daemon=True
+    )
+    server.start()
+    receiver.recv()
+
+    # Several cars share one process through a fleet, whose statistics are combined
+    profiler = Profiler()
+    go: Callable[[], Any]
+    if args.client == "async":
+        assert args.cars == 1, "--client async runs a single car."
+        rc_async = RacecarSimAsync(isHeadless=True)
+        update = get_async_workloads(rc_async)[args.workload]
+        rc_async.set_start_update(lambda: None, update)
+        cars = []
+        go = rc_async.go
+    elif args.cars == 1:
+        cars = [RacecarSim(isHeadless=True)]
+        go = cars[0].go
+    else:
+        fleet = RacecarSimFleet(args.cars, args.workers)
+        cars = fleet.cars
+        go = fleet.go
+
+    for rc in cars:
+        for name in ("camera", "controller", "drive", "lidar", "physics"):
+            profiler.instrument_object(getattr(rc, name), name)
+        update = get_workloads(rc)[args.workload]
+        rc.set_start_update(lambda: None, profiler.wrap(update, "update"))
+
+    start = time.perf_counter()
+    go()
+    elapsed = time.perf_counter() - start
+
+    stats = receiver.recv()
+    server.join()
+
+    print(
+        f">> workload: {args.workload} on {args.cars} cars, client ran for "
+        f"{elapsed:.2f} s"
+    )
+    print(fake_racecar_sim.format_stats(stats))
+    print(
+        ">> requests per tick: "
+        + ", ".join(
+            f"{name} {count / max(stats.num_ticks, 1):.1f}"
+            for name, count in sorted(stats.message_counts.items())
+        )
+    )
+    # The calls of RacecarSimAsync are coroutines, which the profiler cannot time
+    if cars:
+        print(">> client call latency:")
+        print(profiler.format_stats())
+
+
+if __name__ == "__main__":
+    main()
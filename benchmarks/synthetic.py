@@ -0,0 +1,184 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Generates synthetic sensor data for the benchmarks.
+"""
+
+import math
+import cv2 as cv
+import numpy as np
+from typing import Any, List, Optional, Tuple
+from nptyping import NDArray
+
+
+def _box(x: float, y: float, width: float, height: float) -> List[Tuple]:
+    """
+    Returns the four walls of an axis-aligned box centered at (x, y).
+    """
+    left, right = x - width / 2, x + width / 2
+    bottom, top = y - height / 2, y + height / 2
+    return [
+        (left, bottom, right, bottom),
+        (right, bottom, right, top),
+        (right, top, left, top),
+        (left, top, left, bottom),
+    ]
+
+
+# The walls of a room containing two pillars, as (x0, y0, x1, y1) in cm, where x
+# points to the right of the car's starting pose and y points forward
+WALLS: NDArray[(Any, 4), np.float64] = np.array(
+    _box(150, 0, 700, 700) + _box(150, 0, 60, 60) + _box(400, 250, 40, 80)
+)
+
+# The radius (in cm) of the circle driven by circuit_poses, centered at (150, 0)
+CIRCUIT_RADIUS = 150
+
+
+def circuit_poses(
+    num_frames: int, speed: float = 4.0
+) -> List[Tuple[float, float, float]]:
+    """
+    Returns the poses of a car driving clockwise around the pillar in the room.
+
+    Args:
+        num_frames: The number of poses to generate.
+        speed: The distance (in cm) traveled between consecutive poses.
+
+    Returns:
+        A list of (x, y, heading) poses, with heading in degrees clockwise.
+    """
+    poses = []
+    for i in range(num_frames):
+        turned = i * speed / CIRCUIT_RADIUS
+        poses.append(
+            (
+                CIRCUIT_RADIUS - CIRCUIT_RADIUS * math.cos(turned),
+                CIRCUIT_RADIUS * math.sin(turned),
+                math.degrees(turned) % 360,
+            )
+        )
+    return poses
+
+
+def lidar_scan(
+    pose: Tuple[float, float, float] = (0, 0, 0),
+    num_samples: int = 720,
+    noise: float = 0.5,
+    dropout: float = 0.01,
+    rng: Optional[np.random.Generator] = None,
+) -> NDArray[720, np.float32]:
+    """
+    Simulates a LIDAR scan taken from a pose in the room.
+
+    Args:
+        pose: The (x, y, heading) of the car.
+        num_samples: The number of samples in the scan.
+        noise: The standard deviation (in cm) of the noise added to each sample.
+        dropout: The fraction of samples replaced with 0.0 (no data).
+        rng: The random generator used for noise, or None for a fixed seed.
+
+    Returns:
+        A scan in the same format as rc.lidar.get_samples().
+    """
+    rng = np.random.default_rng(0) if rng is None else rng
+    x, y, heading = pose
+    angles = np.radians(heading + np.arange(num_samples) * 360 / num_samples)
+    directions = np.stack((np.sin(angles), np.cos(angles)), axis=1)
+
+    # Intersect every ray with every wall
+    starts = WALLS[:, :2] - (x, y)
+    edges = WALLS[:, 2:] - WALLS[:, :2]
+    denominators = np.outer(directions[:, 0], edges[:, 1]) - np.outer(
+        directions[:, 1], edges[:, 0]
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = (starts[:, 0] * edges[:, 1] - starts[:, 1] * edges[:, 0]) / (
+            denominators
+        )
+        positions = (
+            np.outer(directions[:, 1], starts[:, 0])
+            - np.outer(directions[:, 0], starts[:, 1])
+        ) / denominators
+    hits = (distances > 0) & (0 <= positions) & (positions <= 1)
+    scan = np.where(hits, distances, np.inf).min(axis=1)
+
+    scan += rng.normal(0, noise, num_samples)
+    scan[~np.isfinite(scan)] = 0
+    scan[rng.random(num_samples) < dropout] = 0
+    return scan.astype(np.float32)
+
+
+# The size of the synthetic camera images, matching rc.camera
+IMAGE_WIDTH = 640
+IMAGE_HEIGHT = 480
+
+
+def color_image(
+    frame: int = 0, rng: Optional[np.random.Generator] = None
+) -> NDArray[(480, 640, 3), np.uint8]:
+    """
+    Draws a camera image of an orange cone, a blue line, and an AR marker on a noisy
+    gray floor, which move from frame to frame.
+
+    Args:
+        frame: The frame number, which determines where each object is drawn.
+        rng: The random generator used for noise, or None for a fixed seed.
+
+    Returns:
+        A BGR image in the same format as rc.camera.get_color_image().
+    """
+    rng = np.random.default_rng(frame) if rng is None else rng
+    image = np.full((IMAGE_HEIGHT, IMAGE_WIDTH, 3), 90, np.uint8)
+    image += rng.integers(0, 20, image.shape, np.uint8)
+
+    # A blue line on the floor which sways from side to side
+    offset = int(120 * math.sin(frame / 30))
+    cv.line(
+        image,
+        (IMAGE_WIDTH // 2 + offset, IMAGE_HEIGHT),
+        (IMAGE_WIDTH // 2 - offset // 2, IMAGE_HEIGHT // 2),
+        (255, 128, 0),
+        25,
+    )
+
+    # An orange cone which grows as the car approaches it
+    radius = 20 + frame % 60
+    cv.circle(image, (160 + frame % 320, 240), radius, (0, 128, 255), -1)
+
+    # An AR marker on the wall
+    marker = cv.aruco.drawMarker(
+        cv.aruco.Dictionary_get(cv.aruco.DICT_6X6_250), frame % 10, 120
+    )
+    image[40:160, 440:560] = marker[:, :, np.newaxis]
+    return image
+
+
+def depth_image(
+    frame: int = 0, rng: Optional[np.random.Generator] = None
+) -> NDArray[(480, 640), np.float32]:
+    """
+    Generates a depth image of a floor receding toward the horizon with a box in
+    front of the car, which moves from frame to frame.
+
+    Args:
+        frame: The frame number, which determines where the box is.
+        rng: The random generator used for noise, or None for a fixed seed.
+
+    Returns:
+        A depth image (in cm) in the same format as rc.camera.get_depth_image().
+    """
+    rng = np.random.default_rng(frame) if rng is None else rng
+    rows = np.arange(IMAGE_HEIGHT, dtype=np.float32)[:, np.newaxis]
+    image = np.repeat(
+        10000 / np.maximum(rows - IMAGE_HEIGHT / 2, 10), IMAGE_WIDTH, axis=1
+    )
+    image += rng.normal(0, 1, image.shape).astype(np.float32)
+
+    # A box which approaches the car, and pixels with no data around its edge
+    left = 200 + frame % 200
+    image[180:360, left : left + 120] = 300 - frame % 250
+    image[180:360, left - 4 : left] = 0
+    return image.astype(np.float32)
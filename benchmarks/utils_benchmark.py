@@ -0,0 +1,280 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Measures the latency of the racecar_utils functions called every frame by typical
+programs, and compares it to a saved baseline.
+
+Usage:
+    python3 utils_benchmark.py [--recording DIR] [--frames 200] [--repeat 3]
+        [--save FILE] [--compare FILE] [--tolerance 0.25] [--filter NAME]
+
+Without --recording, the functions run on synthetic 640x480 camera images and
+720-sample LIDAR scans.  With --compare, the script exits with status 1 if the
+median latency of any function exceeds its baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import cv2 as cv
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+from dashboard import Dashboard
+from display import Display
+from recorder import Recording
+import racecar_utils as rc_utils
+
+import synthetic
+
+
+class Frame(NamedTuple):
+    """
+    The sensor data passed to each benchmarked function.
+    """
+
+    color_image: np.ndarray
+    depth_image: np.ndarray
+    scan: np.ndarray
+    contours: List[np.ndarray]
+    contour: np.ndarray
+
+
+class _BenchmarkDisplay(Display):
+    """
+    A display which draws images without showing them, so that drawing is measured.
+    """
+
+    def __init__(self) -> None:
+        Display.__init__(self, False)
+
+    def create_window(self) -> None:
+        pass
+
+    def show_color_image(self, image: np.ndarray) -> None:
+        pass
+
+
+# The HSV range of the orange cone in the synthetic images
+ORANGE = ((10, 100, 100), (25, 255, 255))
+
+# The number of calls made before timing begins
+WARMUP_CALLS = 5
+
+
+def load_frames(recording_path: str, num_frames: int) -> List[Frame]:
+    """
+    Loads camera images and LIDAR scans from a recording, or generates them.
+    """
+    raw_frames: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+    if recording_path is None:
+        rng = np.random.default_rng(0)
+        poses = synthetic.circuit_poses(num_frames)
+        for i, pose in enumerate(poses):
+            raw_frames.append(
+                (
+                    synthetic.color_image(i),
+                    synthetic.depth_image(i),
+                    synthetic.lidar_scan(pose, rng=rng),
+                )
+            )
+    else:
+        recording = Recording(recording_path)
+        for frame in recording.get_frame_numbers()[:num_frames]:
+            color_image, _ = recording.get("color_image", frame)
+            depth_image, _ = recording.get("depth_image", frame)
+            scan, _ = recording.get("lidar", frame)
+            if all(data is not None for data in (color_image, depth_image, scan)):
+                raw_frames.append(
+                    (np.array(color_image), np.array(depth_image), np.array(scan))
+                )
+        assert (
+            len(raw_frames) > 0
+        ), f"The recording at {recording_path} has no frames with images and scans."
+
+    frames = []
+    for color_image, depth_image, scan in raw_frames:
+        contours = rc_utils.find_contours(color_image, *ORANGE)
+        contour = rc_utils.get_largest_contour(contours)
+        if contour is None:
+            contour = np.array([[[0, 0]], [[0, 10]], [[10, 10]], [[10, 0]]], np.int32)
+        frames.append(Frame(color_image, depth_image, scan, contours, contour))
+    return frames
+
+
+def get_benchmarks() -> Dict[str, Callable[[Frame], Any]]:
+    """
+    Returns each benchmarked function, called with typical arguments.
+    """
+    display = _BenchmarkDisplay()
+    center = (synthetic.IMAGE_HEIGHT // 2, synthetic.IMAGE_WIDTH // 2)
+    dashboard = Dashboard(2, 2, synthetic.IMAGE_HEIGHT, synthetic.IMAGE_WIDTH)
+    blank = np.zeros((synthetic.IMAGE_HEIGHT, synthetic.IMAGE_WIDTH, 3), np.uint8)
+
+    def draw_dashboard(f: Frame) -> None:
+        dashboard.set_color_image(0, f.color_image)
+        dashboard.set_depth_image(1, f.depth_image)
+        dashboard.set_lidar(2, f.scan)
+        dashboard.clear(3)
+        dashboard.set_text(3, ["fps: 60.0", "speed: 0.50"])
+
+    def stack_images(f: Frame) -> None:
+        top = rc_utils.stack_images_horizontal(
+            f.color_image, rc_utils.colormap_depth_image(f.depth_image.copy())
+        )
+        bottom = rc_utils.stack_images_horizontal(blank, blank)
+        rc_utils.stack_images_vertical(top, bottom)
+
+    return {
+        "find_contours": lambda f: rc_utils.find_contours(f.color_image, *ORANGE),
+        "get_largest_contour": lambda f: rc_utils.get_largest_contour(f.contours),
+        "get_contour_center": lambda f: rc_utils.get_contour_center(f.contour),
+        "get_pixel_average_distance": lambda f: rc_utils.get_pixel_average_distance(
+            f.depth_image, center
+        ),
+        "get_closest_pixel": lambda f: rc_utils.get_closest_pixel(f.depth_image),
+        # colormap_depth_image clips the image in place, so give it a copy
+        "colormap_depth_image": lambda f: rc_utils.colormap_depth_image(
+            f.depth_image.copy()
+        ),
+        "get_lidar_closest_point": lambda f: rc_utils.get_lidar_closest_point(f.scan),
+        "get_lidar_average_distance": lambda f: rc_utils.get_lidar_average_distance(
+            f.scan, 0
+        ),
+        "get_lidar_clusters": lambda f: rc_utils.get_lidar_clusters(f.scan),
+        "get_lidar_segments": lambda f: rc_utils.get_lidar_segments(f.scan),
+        "get_lidar_wall": lambda f: rc_utils.get_lidar_wall(f.scan),
+        "get_ar_markers": lambda f: rc_utils.get_ar_markers(f.color_image),
+        "Display.show_lidar": lambda f: display.show_lidar(f.scan),
+        "Dashboard (4 panels)": draw_dashboard,
+        "stack_images (4 panels)": stack_images,
+    }
+
+
+def measure(
+    function: Callable[[Frame], Any], frames: List[Frame], repeat: int
+) -> Dict[str, float]:
+    """
+    Calls function repeat times on each frame and returns latency statistics in ms.
+    """
+    for i in range(WARMUP_CALLS):
+        function(frames[i % len(frames)])
+
+    durations = np.empty(repeat * len(frames))
+    for i in range(len(durations)):
+        frame = frames[i % len(frames)]
+        start = time.perf_counter_ns()
+        function(frame)
+        durations[i] = (time.perf_counter_ns() - start) / 1e6
+
+    p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+    return {
+        "mean": float(durations.mean()),
+        "p50": float(p50),
+        "p90": float(p90),
+        "p99": float(p99),
+        "max": float(durations.max()),
+    }
+
+
+def get_environment() -> Dict[str, str]:
+    """
+    Returns the versions and machine which affect the measured latencies.
+    """
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--recording", help="a recording made with the -r flag")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="the number of passes over the frames"
+    )
+    parser.add_argument("--save", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare the results to a baseline file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="the fraction by which a median may exceed its baseline",
+    )
+    parser.add_argument("--filter", help="only run functions containing this text")
+    args = parser.parse_args()
+
+    # Run on a single thread so that results are comparable between machines
+    cv.setNumThreads(1)
+
+    frames = load_frames(args.recording, args.frames)
+    source = args.recording or "synthetic"
+    print(f">> {len(frames)} frames from {source}")
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+
+    results: Dict[str, Dict[str, float]] = {}
+    regressions: List[str] = []
+    print(
+        f"{'function':<30}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+        f"{'vs base':>10}  (ms)"
+    )
+    for name, function in get_benchmarks().items():
+        if args.filter is not None and args.filter not in name:
+            continue
+
+        stats = measure(function, frames, args.repeat)
+        results[name] = stats
+
+        change = ""
+        if baseline is not None and name in baseline:
+            ratio = stats["p50"] / max(baseline[name]["p50"], 1e-6)
+            change = f"{(ratio - 1) * 100:+.0f}%"
+            if ratio > 1 + args.tolerance:
+                regressions.append(name)
+                change += " !"
+        print(
+            f"{name:<30}{stats['mean']:>9.3f}{stats['p50']:>9.3f}"
+            f"{stats['p90']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}"
+            f"{change:>10}"
+        )
+
+    if args.save is not None:
+        with open(args.save, "w") as file:
+            json.dump(
+                {
+                    "environment": get_environment(),
+                    "source": source,
+                    "num_frames": len(frames),
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f">> saved baseline to {args.save}")
+
+    if regressions:
+        print(
+            f">> {len(regressions)} regressions beyond {args.tolerance * 100:.0f}%: "
+            + ", ".join(regressions)
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
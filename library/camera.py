@@ -7,10 +7,13 @@ Defines the interface of the Camera module of the racecar_core library.
 """
 
 import abc
-import copy
 import numpy as np
+from typing import Dict, Tuple
 from nptyping import NDArray
 
+import copy_on_write
+from sensor_frame import LatencyHistogram, SensorFrame
+
 
 class Camera(abc.ABC):
     """
@@ -24,9 +27,16 @@ class Camera(abc.ABC):
     # Maximum range of the depth camera (in cm)
     _MAX_RANGE = 1200
 
+    def __init__(self) -> None:
+        # The age of each image when it was first used, indexed by stream name
+        self._latency: Dict[str, LatencyHistogram] = {
+            "color_image": LatencyHistogram(),
+            "depth_image": LatencyHistogram(),
+        }
+
     def get_color_image(self) -> NDArray[(480, 640, 3), np.uint8]:
         """
-        Returns a deep copy of the current color image captured by the camera.
+        Returns a read-only view of the current color image captured by the camera.
 
         Returns:
             An array representing the pixels in the image, organized as follows
@@ -37,20 +47,32 @@ class Camera(abc.ABC):
         Note:
             Each color value ranges from 0 to 255.
 
-            This function returns a deep copy of the captured image. This means that
-            we can modify the returned image and it will not change the image returned
-            by future calls to get_color_image().
+            The returned image is not copied, so it cannot be modified with numpy or
+            OpenCV.  Drawing functions in racecar_utils (such as draw_contour and
+            draw_circle) draw on a hidden copy which is made the first time the image
+            is drawn on, and only rc.display.show_color_image() shows that copy.
+            Other functions, such as rc_utils.crop, see the image without the
+            drawing.  To modify the image in any other way, or to keep the drawing,
+            first call rc_utils.get_writable_image().
+
+            The image never changes once it is returned, even though it is not
+            copied.  A program can keep it for as long as it likes, such as to
+            compare it with a later frame, and each new frame is stored in a
+            different image.
 
         Example::
 
-            # Initialize image with a deep copy of the most recent color image captured
-            # by the camera
+            # Initialize image with the most recent color image captured by the camera
             image = rc.camera.get_color_image()
 
             # Store the amount of blue in the pixel on row 3, column 5
             blue = image[3][5][0]
+
+            # Draw a circle on (a copy of) the image, and show the result
+            rc_utils.draw_circle(image, (50, 50))
+            rc.display.show_color_image(image)
         """
-        return copy.deepcopy(self.get_color_image_no_copy())
+        return copy_on_write.get_read_only_view(self.get_color_image_no_copy())
 
     @abc.abstractmethod
     def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
@@ -66,7 +88,9 @@ class Camera(abc.ABC):
         Warning:
             Do not modify the returned image. The returned image is a reference to the
             captured image, so any changes will also affect the images returned by any
-            future calls to get_color_image() or get_color_image_no_copy().
+            other calls to get_color_image() or get_color_image_no_copy() in the same
+            frame.  Later frames are stored in different images, so an image which the
+            program keeps is never overwritten.
 
         Note:
             Each color value ranges from 0 to 255.
@@ -87,9 +111,9 @@ class Camera(abc.ABC):
             cropped_image = rc_utils.crop(image, (0, 0), (10, 10))
 
             # However, if we wish to draw on the image, we must first create a manual
-            # copy with copy.deepcopy()
-            image_copy = copy.deepcopy(image)
-            modified_image = rc_utils.draw_circle(image_copy, (50, 50))
+            # copy with np.copy()
+            image_copy = np.copy(image)
+            rc_utils.draw_circle(image_copy, (50, 50))
         """
         pass
 
@@ -130,6 +154,11 @@ class Camera(abc.ABC):
             A two dimensional array indexed from top left to the bottom right storing
             the distance of each pixel from the car in cm.
 
+        Note:
+            The image is shared by every call to get_depth_image() in the same frame,
+            so modify a copy of it instead.  Later frames are stored in different
+            images, so an image which the program keeps is never overwritten.
+
         Example::
 
             # Initialize image with the most recent depth image captured by the camera
@@ -163,6 +192,87 @@ class Camera(abc.ABC):
         """
         pass
 
+    def get_color_image_with_meta(self) -> SensorFrame:
+        """
+        Returns the current color image along with when it was captured.
+
+        Returns:
+            A SensorFrame whose data is the image returned by get_color_image(), and
+            whose timestamp and sequence number identify when the image was captured.
+
+        Note:
+            The first time each image is returned, its age is added to the
+            "color_image" histogram of rc.get_sensor_latency().
+
+        Example::
+
+            frame = rc.camera.get_color_image_with_meta()
+
+            # Find how many seconds ago the image was captured
+            age = (rc.get_frame_timestamp() - frame.timestamp) / 1e9
+        """
+        frame = SensorFrame(self.get_color_image(), *self._get_color_image_meta())
+        self._latency["color_image"].record_frame(frame)
+        return frame
+
+    def get_depth_image_with_meta(self) -> SensorFrame:
+        """
+        Returns the current depth image along with when it was captured.
+
+        Returns:
+            A SensorFrame whose data is the image returned by get_depth_image(), and
+            whose timestamp and sequence number identify when the image was captured.
+
+        Note:
+            The first time each image is returned, its age is added to the
+            "depth_image" histogram of rc.get_sensor_latency().
+        """
+        frame = SensorFrame(self.get_depth_image(), *self._get_depth_image_meta())
+        self._latency["depth_image"].record_frame(frame)
+        return frame
+
+    @abc.abstractmethod
+    def has_new_color_image(self) -> bool:
+        """
+        Returns whether the camera captured a new color image since the previous frame.
+
+        Returns:
+            True if get_color_image() returns a different image than it did during
+            the previous frame.
+
+        Example::
+
+            # Only search for contours when there is a new image to search
+            if rc.camera.has_new_color_image():
+                image = rc.camera.get_color_image()
+        """
+        pass
+
+    @abc.abstractmethod
+    def has_new_depth_image(self) -> bool:
+        """
+        Returns whether the camera captured a new depth image since the previous frame.
+
+        Returns:
+            True if get_depth_image() returns a different image than it did during
+            the previous frame.
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_color_image_meta(self) -> Tuple[int, int]:
+        """
+        Returns the capture timestamp and sequence number of the current color image.
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_depth_image_meta(self) -> Tuple[int, int]:
+        """
+        Returns the capture timestamp and sequence number of the current depth image.
+        """
+        pass
+
     def get_width(self) -> int:
         """
         Returns the pixel width of the color and depth images.
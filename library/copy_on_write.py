@@ -0,0 +1,123 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains functions which hand out read-only images and copy them only when they are
+drawn on.
+"""
+
+import threading
+import weakref
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from nptyping import NDArray
+
+# The number of released copies of each shape kept for reuse
+_POOL_SIZE: int = 4
+
+# The writable copy of each read-only image which has been drawn on, indexed by the
+# id of the read-only image.  Each copy is stored with a weak reference to its image,
+# which confirms that the id has not been reused by a newer image.
+_copies: Dict[int, Tuple[weakref.ref, NDArray]] = {}
+
+# Released copies which can be reused, indexed by shape and data type
+_pool: Dict[Tuple[Tuple[int, ...], np.dtype], List[NDArray]] = {}
+
+# Reentrant, since an image may be garbage collected while the lock is held
+_lock = threading.RLock()
+
+
+def get_read_only_view(image: Optional[NDArray]) -> Optional[NDArray]:
+    """
+    Returns a read-only view of an image without copying it.
+
+    Args:
+        image: The image to view, or None.
+
+    Returns:
+        A view which shares memory with image but cannot be written to with numpy.
+    """
+    if image is None:
+        return None
+
+    view = image.view()
+    view.flags.writeable = False
+    return view
+
+
+def get_drawing_image(image: NDArray) -> NDArray:
+    """
+    Returns an image which the racecar_utils draw functions can draw on in place of
+    the provided image.
+
+    Args:
+        image: The image to draw on.
+
+    Returns:
+        The image itself if it is writable.  Otherwise, a copy of the image which is
+        reused by every call with the same image and released when the image is
+        garbage collected.
+
+    Note:
+        The copy is only seen by resolve_image, and must not be handed to the user,
+        since it is reused once the image is garbage collected.
+    """
+    if image.flags.writeable:
+        return image
+
+    key = id(image)
+    with _lock:
+        copy = _find_copy(image)
+        if copy is None:
+            buffers = _pool.get((image.shape, image.dtype))
+            copy = buffers.pop() if buffers else np.empty_like(image)
+            np.copyto(copy, image)
+            reference = weakref.ref(image, lambda r: _release_copy(key, r))
+            _copies[key] = (reference, copy)
+    return copy
+
+
+def resolve_image(image: Optional[NDArray]) -> Optional[NDArray]:
+    """
+    Returns the image which should be shown in place of the provided image.
+
+    Args:
+        image: An image which may have been drawn on, or None.
+
+    Returns:
+        The copy made by get_drawing_image if image was drawn on, and otherwise
+        image itself.
+    """
+    if image is None or image.flags.writeable:
+        return image
+
+    with _lock:
+        copy = _find_copy(image)
+    return image if copy is None else copy
+
+
+def _find_copy(image: NDArray) -> Optional[NDArray]:
+    """
+    Returns the copy made for a read-only image, or None if it has no copy.
+    """
+    entry = _copies.get(id(image))
+    if entry is None or entry[0]() is not image:
+        return None
+    return entry[1]
+
+
+def _release_copy(key: int, reference: weakref.ref) -> None:
+    """
+    Returns the copy of a garbage collected image to the pool.
+    """
+    with _lock:
+        entry = _copies.get(key)
+        if entry is None or entry[0] is not reference:
+            return
+        del _copies[key]
+
+        copy = entry[1]
+        buffers = _pool.setdefault((copy.shape, copy.dtype), [])
+        if len(buffers) < _POOL_SIZE:
+            buffers.append(copy)
@@ -0,0 +1,283 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the Dashboard class, which draws several debug images into one image
+without allocating new images each frame.
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import cv2 as cv
+import numpy as np
+from nptyping import NDArray
+
+import copy_on_write
+import racecar_utils as rc_utils
+
+
+class Dashboard:
+    """
+    A grid of equally sized panels which share a single preallocated image.
+
+    Note:
+        Each panel is a view into the dashboard image, and each set function draws
+        straight into its panel, resizing when the source is a different size.  The
+        scratch buffers used to colormap depth images are also allocated once, so
+        drawing the dashboard each frame allocates no images.
+
+    Example::
+
+        dashboard = Dashboard(2, 2)
+
+        def update():
+            dashboard.set_color_image(0, rc.camera.get_color_image())
+            dashboard.set_depth_image(1, rc.camera.get_depth_image())
+            dashboard.set_lidar(2, rc.lidar.get_samples())
+            dashboard.clear(3)
+            dashboard.set_text(3, [f"speed: {speed:.2f}", f"angle: {angle:.2f}"])
+            rc.display.show_color_image(dashboard.get_image())
+    """
+
+    # The scale, thickness, and spacing in pixels of each line of text
+    __TEXT_SCALE = 0.6
+    __TEXT_THICKNESS = 1
+    __LINE_HEIGHT = 22
+
+    # The radius of the dot which marks the car in a LIDAR panel
+    __LIDAR_CAR_RADIUS = 2
+
+    def __init__(
+        self,
+        rows: int = 2,
+        columns: int = 2,
+        panel_height: int = 240,
+        panel_width: int = 320,
+    ) -> None:
+        """
+        Allocates the dashboard image.
+
+        Args:
+            rows: The number of rows of panels.
+            columns: The number of columns of panels.
+            panel_height: The height of each panel in pixels.
+            panel_width: The width of each panel in pixels.
+        """
+        assert rows > 0, f"rows ({rows}) must be a positive integer."
+        assert columns > 0, f"columns ({columns}) must be a positive integer."
+        assert panel_height > 0, f"panel_height ({panel_height}) must be positive."
+        assert panel_width > 0, f"panel_width ({panel_width}) must be positive."
+
+        self.__image: NDArray[(Any, Any, 3), np.uint8] = np.zeros(
+            (rows * panel_height, columns * panel_width, 3), np.uint8
+        )
+        self.__panel_size: Tuple[int, int] = (panel_height, panel_width)
+
+        # Panels are numbered left to right, then top to bottom
+        self.__panels: List[NDArray[(Any, Any, 3), np.uint8]] = [
+            self.__image[
+                r * panel_height : (r + 1) * panel_height,
+                c * panel_width : (c + 1) * panel_width,
+            ]
+            for r in range(rows)
+            for c in range(columns)
+        ]
+
+        # Scratch buffers for depth images, at the size of a panel
+        self.__depth: NDArray[(Any, Any), np.float32] = np.empty(
+            self.__panel_size, np.float32
+        )
+        self.__depth_gray: NDArray[(Any, Any), np.uint8] = np.empty(
+            self.__panel_size, np.uint8
+        )
+        self.__depth_mask: NDArray[(Any, Any), np.uint8] = np.empty(
+            self.__panel_size, np.uint8
+        )
+
+        # The unit vector toward each LIDAR sample, indexed by the number of samples
+        self.__lidar_directions: Dict[int, NDArray[(2, Any), np.float32]] = {}
+
+    def get_image(self) -> NDArray[(Any, Any, 3), np.uint8]:
+        """
+        Returns the dashboard image, which is reused by every frame.
+        """
+        return self.__image
+
+    def get_panel(self, index: int) -> NDArray[(Any, Any, 3), np.uint8]:
+        """
+        Returns a writable view of a panel, for drawing on with OpenCV.
+        """
+        self.__check_index(index)
+        return self.__panels[index]
+
+    def get_num_panels(self) -> int:
+        """
+        Returns the number of panels.
+        """
+        return len(self.__panels)
+
+    def clear(self, index: int) -> None:
+        """
+        Fills a panel with black.
+        """
+        self.get_panel(index).fill(0)
+
+    def set_color_image(
+        self, index: int, image: NDArray[(Any, Any, 3), np.uint8]
+    ) -> None:
+        """
+        Draws a color image in a panel, resized to fit.
+
+        Args:
+            index: The panel in which to draw the image.
+            image: The color image to draw, which may have been drawn on by
+                racecar_utils functions such as draw_contour.
+        """
+        panel = self.get_panel(index)
+        self.__fit(copy_on_write.resolve_image(image), panel)
+
+    def set_depth_image(
+        self,
+        index: int,
+        depth_image: NDArray[(Any, Any), np.float32],
+        max_depth: int = 1000,
+    ) -> None:
+        """
+        Draws a depth image in a panel with the colors of colormap_depth_image.
+
+        Args:
+            index: The panel in which to draw the image.
+            depth_image: The depth image to draw, which is not modified.
+            max_depth: The farthest depth to show in the image in cm.  Anything past
+                this depth is shown as the farthest color.
+        """
+        assert max_depth > 0, f"max_depth ({max_depth}) must be positive."
+        panel = self.get_panel(index)
+        depth = self.__fit(depth_image, self.__depth)
+
+        # Match colormap_depth_image, which shifts depths down by 0.01 modulo
+        # max_depth so that 0 (no data) becomes the farthest color.  After clipping,
+        # only depths below 0.01 wrap around, which a masked add handles far faster
+        # than a floating point modulo.
+        np.minimum(depth, max_depth, depth)
+        cv.compare(depth, 0.01, cv.CMP_LT, self.__depth_mask)
+        cv.add(depth, max_depth, depth, self.__depth_mask)
+        np.subtract(depth, 0.01, depth)
+        cv.convertScaleAbs(depth, self.__depth_gray, alpha=255 / max_depth)
+        np.negative(self.__depth_gray, self.__depth_gray)
+        cv.applyColorMap(self.__depth_gray, cv.COLORMAP_INFERNO, panel)
+
+    def set_lidar(
+        self,
+        index: int,
+        samples: NDArray[Any, np.float32],
+        max_range: int = 1000,
+        highlighted_samples: List[Tuple[float, float]] = [],
+    ) -> None:
+        """
+        Draws a LIDAR scan in a panel, in the style of Display.show_lidar.
+
+        Args:
+            index: The panel in which to draw the scan.
+            samples: A complete LIDAR scan.
+            max_range: The farthest distance to show in cm, which reaches the
+                shorter edge of the panel.
+            highlighted_samples: A list of samples in (angle, distance) format to show
+                as light blue dots.  Angle must be in degrees from straight ahead
+                (clockwise), and distance must be in cm.
+        """
+        assert max_range > 0, f"max_range ({max_range}) must be positive."
+        panel = self.get_panel(index)
+        panel.fill(0)
+
+        height, width = self.__panel_size
+        radius = min(height, width) // 2
+        center = (height // 2, width // 2)
+
+        # Draw a red pixel for each non-zero sample less than max_range
+        directions = self.__get_lidar_directions(len(samples))
+        visible = (samples > 0) & (samples < max_range)
+        lengths = samples[visible] * (radius / max_range)
+        rows = (center[0] - lengths * directions[0, visible]).astype(np.int32)
+        columns = (center[1] + lengths * directions[1, visible]).astype(np.int32)
+        np.clip(rows, 0, height - 1, rows)
+        np.clip(columns, 0, width - 1, columns)
+        panel[rows, columns, 2] = 255
+
+        rc_utils.draw_circle(
+            panel, center, rc_utils.ColorBGR.green.value, self.__LIDAR_CAR_RADIUS
+        )
+
+        # Draw a light blue pixel for each point in highlighted_samples
+        for (angle, distance) in highlighted_samples:
+            if 0 < distance < max_range:
+                angle_rad = np.radians(angle)
+                length = radius * distance / max_range
+                r = int(center[0] - length * np.cos(angle_rad))
+                c = int(center[1] + length * np.sin(angle_rad))
+                if 0 <= r < height and 0 <= c < width:
+                    panel[r, c] = (255, 255, 0)
+
+    def set_text(
+        self,
+        index: int,
+        lines: List[str],
+        color: Tuple[int, int, int] = rc_utils.ColorBGR.white.value,
+    ) -> None:
+        """
+        Writes lines of text over the top left corner of a panel.
+
+        Args:
+            index: The panel on which to write.
+            lines: The lines of text, such as metrics, from top to bottom.
+            color: The color of the text, specified as blue-green-red channels each
+                ranging from 0 to 255 inclusive.
+
+        Note:
+            The text is drawn over the current contents of the panel, so set_text
+            should be called after the panel's image is drawn each frame.
+        """
+        panel = self.get_panel(index)
+        for i, line in enumerate(lines):
+            cv.putText(
+                panel,
+                line,
+                (6, (i + 1) * self.__LINE_HEIGHT),
+                cv.FONT_HERSHEY_SIMPLEX,
+                self.__TEXT_SCALE,
+                color,
+                self.__TEXT_THICKNESS,
+                cv.LINE_AA,
+            )
+
+    def __check_index(self, index: int) -> None:
+        assert (
+            0 <= index < len(self.__panels)
+        ), f"index ({index}) must be between 0 and {len(self.__panels) - 1}."
+
+    def __fit(self, source: NDArray, destination: NDArray) -> NDArray:
+        """
+        Copies source into destination, resizing it if their sizes differ.
+        """
+        if source.shape[:2] == destination.shape[:2]:
+            np.copyto(destination, source)
+        else:
+            cv.resize(
+                source,
+                (destination.shape[1], destination.shape[0]),
+                destination,
+                interpolation=cv.INTER_AREA,
+            )
+        return destination
+
+    def __get_lidar_directions(self, num_samples: int) -> NDArray[(2, Any), np.float32]:
+        """
+        Returns the cosine and sine of the angle of each sample in a scan.
+        """
+        directions = self.__lidar_directions.get(num_samples)
+        if directions is None:
+            angles = np.linspace(0, 2 * np.pi, num_samples, endpoint=False)
+            directions = np.stack((np.cos(angles), np.sin(angles))).astype(np.float32)
+            self.__lidar_directions[num_samples] = directions
+        return directions
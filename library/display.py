@@ -9,10 +9,11 @@ Defines the interface of the Display module of the racecar_core library.
 import abc
 import numpy as np
 import math
-from typing import List, Tuple, Any
+from typing import List, Optional, Tuple, Any
 from nptyping import NDArray
 
 import racecar_utils as rc_utils
+from display_worker import DisplayStats, DisplayWorker
 
 
 class Display(abc.ABC):
@@ -28,6 +29,9 @@ class Display(abc.ABC):
     def __init__(self, isHeadless: bool) -> None:
         self.__isHeadless = isHeadless
 
+        # The worker which shows images in the window, or None if there is no window
+        self._worker: Optional[DisplayWorker] = None
+
     @abc.abstractmethod
     def create_window(self) -> None:
         """
@@ -66,6 +70,47 @@ class Display(abc.ABC):
         """
         pass
 
+    def set_max_fps(self, max_fps: Optional[float] = None) -> None:
+        """
+        Sets the largest number of images shown in the window per second.
+
+        Args:
+            max_fps: The maximum frame rate of the window, or None to show images as
+                fast as the window allows, which is the default.
+
+        Note:
+            Images are shown on a separate thread, so show_color_image and the other
+            display methods return without waiting for the window.  Images which
+            arrive faster than max_fps, or while the window is still showing an
+            earlier image, are dropped.
+
+        Example::
+
+            # Refresh the window at most 10 times per second
+            rc.display.set_max_fps(10)
+        """
+        assert max_fps is None or max_fps > 0, f"max_fps ({max_fps}) must be positive."
+        if self._worker is not None:
+            self._worker.set_max_fps(max_fps)
+
+    def get_stats(self) -> Optional[DisplayStats]:
+        """
+        Returns the number of images shown and dropped and the time spent showing.
+
+        Returns:
+            A DisplayStats tuple, or None if the display has no window.
+
+        Example::
+
+            def update_slow():
+                stats = rc.display.get_stats()
+                if stats is not None:
+                    print(f"Shown {stats.num_shown}, dropped {stats.num_dropped}")
+        """
+        if self._worker is None:
+            return None
+        return self._worker.get_stats()
+
     def show_depth_image(
         self,
         image: NDArray[(Any, Any), np.float32],
@@ -0,0 +1,269 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the StreamDisplay class, which serves display images as an MJPEG stream over
+HTTP so that they can be watched from a browser.
+"""
+
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+import cv2 as cv
+import numpy as np
+from nptyping import NDArray
+
+import copy_on_write
+import racecar_utils as rc_utils
+from display import Display
+from display_worker import DisplayStats
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    """
+    Serves a page showing the stream at / and the MJPEG stream itself at /stream.
+    """
+
+    __PAGE = (
+        b"<html><head><title>RACECAR display</title></head>"
+        b'<body style="margin:0;background:#000">'
+        b'<img src="/stream" style="max-width:100%"></body></html>'
+    )
+
+    def do_GET(self) -> None:
+        if self.path == "/":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(self.__PAGE)))
+            self.end_headers()
+            self.wfile.write(self.__PAGE)
+        elif self.path == "/stream":
+            self.__stream()
+        else:
+            self.send_error(404)
+
+    def log_message(self, format: str, *args) -> None:
+        # Requests are not printed, since they would bury the program's output
+        pass
+
+    def __stream(self) -> None:
+        display: StreamDisplay = self.server.display
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        display._StreamDisplay__add_client()
+        try:
+            sequence = -1
+            while True:
+                frame = display._StreamDisplay__wait_for_frame(sequence)
+                if frame is None:
+                    continue
+                jpeg, sequence = frame
+                self.wfile.write(
+                    b"--frame\r\nContent-Type: image/jpeg\r\n"
+                    + f"Content-Length: {len(jpeg)}\r\n\r\n".encode()
+                )
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            display._StreamDisplay__remove_client()
+
+
+class StreamDisplay(Display):
+    """
+    Encodes display images as JPEG on a separate thread and serves them over HTTP,
+    so the display can be watched from a browser without an X display.
+
+    Note:
+        While no browser is watching, the display methods return immediately without
+        drawing, copying, or encoding the image.  Images which arrive faster than the
+        maximum frame rate, or while the previous image is still being encoded, are
+        dropped.
+
+    Example::
+
+        # Stream the display to http://<car address>:8080/
+        rc.display = StreamDisplay(8080)
+    """
+
+    # The number of seconds a stream waits for a new image before checking again
+    # whether its client is still connected
+    __FRAME_TIMEOUT = 1.0
+
+    def __init__(
+        self,
+        port: int = 8080,
+        quality: int = 80,
+        max_fps: float = 15,
+        host: str = "0.0.0.0",
+    ) -> None:
+        """
+        Starts serving the stream.
+
+        Args:
+            port: The port on which to serve the stream.
+            quality: The JPEG quality of the stream, from 0 to 100.
+            max_fps: The largest number of images encoded per second.
+            host: The address on which to listen, where 0.0.0.0 accepts connections
+                from other computers.
+        """
+        # The display is headless until a browser connects, so that the drawing in
+        # show_depth_image and show_lidar is skipped as well
+        Display.__init__(self, True)
+        assert 0 <= quality <= 100, f"quality ({quality}) must be between 0 and 100."
+
+        self.__quality = quality
+        self.__condition = threading.Condition()
+        self.__num_clients: int = 0
+
+        # The image waiting to be encoded and the buffers which can hold the next one
+        self.__pending: Optional[NDArray] = None
+        self.__free: List[NDArray] = []
+
+        # The most recently encoded image and the number of images encoded before it
+        self.__jpeg: bytes = b""
+        self.__sequence: int = -1
+
+        self.__frame_interval_ns: int = 0
+        self.__next_frame_ns: int = 0
+        self.set_max_fps(max_fps)
+
+        self.__num_shown: int = 0
+        self.__num_dropped: int = 0
+        self.__total_encode_ns: int = 0
+        self.__max_encode_ns: int = 0
+
+        self.__server = ThreadingHTTPServer((host, port), _StreamHandler)
+        self.__server.daemon_threads = True
+        self.__server.display = self
+        threading.Thread(
+            target=self.__server.serve_forever, name="stream_server", daemon=True
+        ).start()
+        threading.Thread(target=self.__run, name="stream_encoder", daemon=True).start()
+
+        rc_utils.print_colored(
+            f">> Streaming the display at http://{host}:{port}/",
+            rc_utils.TerminalColor.green,
+        )
+
+    def create_window(self) -> None:
+        # Browsers connect to the stream on their own
+        pass
+
+    def show_color_image(self, image: NDArray) -> None:
+        if self._Display__isHeadless:
+            return
+
+        now = time.perf_counter_ns()
+        with self.__condition:
+            if now < self.__next_frame_ns:
+                self.__num_dropped += 1
+                return
+            self.__next_frame_ns = now + self.__frame_interval_ns
+            buffer = self.__take_buffer(image)
+
+        np.copyto(buffer, copy_on_write.resolve_image(image))
+
+        with self.__condition:
+            if self.__pending is not None:
+                self.__num_dropped += 1
+                self.__free.append(self.__pending)
+            self.__pending = buffer
+            self.__condition.notify_all()
+
+    def set_max_fps(self, max_fps: Optional[float] = None) -> None:
+        assert max_fps is None or max_fps > 0, f"max_fps ({max_fps}) must be positive."
+        self.__frame_interval_ns = 0 if max_fps is None else int(1e9 / max_fps)
+
+    def get_stats(self) -> DisplayStats:
+        # Images count as shown once they are encoded
+        with self.__condition:
+            return DisplayStats(
+                num_shown=self.__num_shown,
+                num_dropped=self.__num_dropped,
+                mean_show_time=self.__total_encode_ns / max(self.__num_shown, 1) / 1e9,
+                max_show_time=self.__max_encode_ns / 1e9,
+            )
+
+    def get_num_clients(self) -> int:
+        """
+        Returns the number of browsers watching the stream.
+        """
+        return self.__num_clients
+
+    def __take_buffer(self, image: NDArray) -> NDArray:
+        """
+        Returns a free buffer with the shape and data type of image.
+        """
+        while self.__free:
+            buffer = self.__free.pop()
+            if buffer.shape == image.shape and buffer.dtype == image.dtype:
+                return buffer
+        return np.empty_like(image)
+
+    def __run(self) -> None:
+        """
+        Encodes each image as it arrives and hands it to the streams.
+        """
+        while True:
+            with self.__condition:
+                while self.__pending is None:
+                    self.__condition.wait()
+                image = self.__pending
+                self.__pending = None
+
+            start = time.perf_counter_ns()
+            try:
+                _, jpeg = cv.imencode(
+                    ".jpg", image, [cv.IMWRITE_JPEG_QUALITY, self.__quality]
+                )
+            except Exception:
+                rc_utils.print_error(
+                    ">> Error encoding the display stream:\n" + traceback.format_exc()
+                )
+                jpeg = None
+            encode_ns = time.perf_counter_ns() - start
+
+            with self.__condition:
+                self.__free.append(image)
+                if jpeg is not None:
+                    self.__jpeg = jpeg.tobytes()
+                    self.__sequence += 1
+                    self.__num_shown += 1
+                    self.__total_encode_ns += encode_ns
+                    self.__max_encode_ns = max(self.__max_encode_ns, encode_ns)
+                self.__condition.notify_all()
+
+    def __wait_for_frame(self, sequence: int) -> Optional[Tuple[bytes, int]]:
+        """
+        Waits for an image newer than sequence.
+
+        Returns:
+            The JPEG image and its sequence number, or None if no new image arrived
+            in time.
+        """
+        with self.__condition:
+            self.__condition.wait_for(
+                lambda: self.__sequence > sequence, self.__FRAME_TIMEOUT
+            )
+            if self.__sequence <= sequence:
+                return None
+            return self.__jpeg, self.__sequence
+
+    def __add_client(self) -> None:
+        with self.__condition:
+            self.__num_clients += 1
+            self._Display__isHeadless = False
+
+    def __remove_client(self) -> None:
+        with self.__condition:
+            self.__num_clients -= 1
+            self._Display__isHeadless = self.__num_clients == 0
@@ -0,0 +1,211 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the DisplayWorker class, which shows images in a window on a separate thread.
+"""
+
+import sys
+import threading
+import time
+import traceback
+from typing import List, NamedTuple, Optional
+
+import cv2 as cv
+import numpy as np
+from nptyping import NDArray
+
+import racecar_utils as rc_utils
+
+
+class DisplayStats(NamedTuple):
+    """
+    Summarizes how many images a display window showed and how long showing took.
+    """
+
+    # The number of images shown in the window
+    num_shown: int
+
+    # The number of images not shown, either because they arrived sooner than the
+    # maximum frame rate (if any) allows or because a newer image replaced them
+    num_dropped: int
+
+    # The average and longest number of seconds spent showing an image
+    mean_show_time: float
+    max_show_time: float
+
+
+class DisplayWorker:
+    """
+    Shows images in an OpenCV window from a dedicated thread, so that drawing the
+    window never delays the frame which requested it.
+
+    Note:
+        Only the most recent image is kept; an image still waiting when a new one
+        arrives is dropped.  Images are copied into a small set of reused buffers,
+        so the caller may modify an image as soon as show returns.
+
+        macOS only allows windows to be used from the main thread, so there images
+        are shown on the calling thread, still limited to any maximum frame rate.
+    """
+
+    # The number of seconds between updates of an idle window, which keep it
+    # responsive while no new images arrive
+    __IDLE_INTERVAL = 0.1
+
+    def __init__(
+        self, window_name: str, window_flags: int, max_fps: Optional[float] = None
+    ) -> None:
+        """
+        Creates a worker for a window, whose thread starts when it is first used.
+
+        Args:
+            window_name: The title of the window.
+            window_flags: The OpenCV flags with which to create the window.
+            max_fps: The largest number of images shown per second, or None for no
+                limit.
+        """
+        self.__window_name = window_name
+        self.__window_flags = window_flags
+        self.__is_threaded: bool = sys.platform != "darwin"
+
+        self.__condition = threading.Condition()
+        self.__thread: Optional[threading.Thread] = None
+        self.__create_window: bool = False
+        self.__has_window: bool = False
+
+        # The image waiting to be shown and the buffers which can hold the next one
+        self.__pending: Optional[NDArray] = None
+        self.__free: List[NDArray] = []
+
+        self.__frame_interval_ns: int = 0
+        self.__next_frame_ns: int = 0
+        self.set_max_fps(max_fps)
+
+        self.__num_shown: int = 0
+        self.__num_dropped: int = 0
+        self.__total_show_ns: int = 0
+        self.__max_show_ns: int = 0
+
+    def set_max_fps(self, max_fps: Optional[float]) -> None:
+        """
+        Sets the largest number of images shown per second, or None for no limit.
+        """
+        assert max_fps is None or max_fps > 0, f"max_fps ({max_fps}) must be positive."
+        self.__frame_interval_ns = 0 if max_fps is None else int(1e9 / max_fps)
+
+    def create_window(self) -> None:
+        """
+        Requests that the window is created, if it does not already exist.
+        """
+        if not self.__is_threaded:
+            self.__open_window()
+            return
+
+        with self.__condition:
+            self.__create_window = True
+            self.__start()
+            self.__condition.notify()
+
+    def show(self, image: NDArray) -> None:
+        """
+        Copies an image to be shown in the window as soon as the worker is free.
+        """
+        now = time.perf_counter_ns()
+        with self.__condition:
+            if now < self.__next_frame_ns:
+                self.__num_dropped += 1
+                return
+            self.__next_frame_ns = now + self.__frame_interval_ns
+            buffer = self.__take_buffer(image)
+
+        np.copyto(buffer, image)
+
+        if not self.__is_threaded:
+            self.__show(buffer)
+            self.__free.append(buffer)
+            return
+
+        with self.__condition:
+            if self.__pending is not None:
+                self.__num_dropped += 1
+                self.__free.append(self.__pending)
+            self.__pending = buffer
+            self.__start()
+            self.__condition.notify()
+
+    def get_stats(self) -> DisplayStats:
+        """
+        Returns the number of images shown and dropped and the time spent showing.
+        """
+        with self.__condition:
+            return DisplayStats(
+                num_shown=self.__num_shown,
+                num_dropped=self.__num_dropped,
+                mean_show_time=self.__total_show_ns / max(self.__num_shown, 1) / 1e9,
+                max_show_time=self.__max_show_ns / 1e9,
+            )
+
+    def __take_buffer(self, image: NDArray) -> NDArray:
+        """
+        Returns a free buffer with the shape and data type of image.
+        """
+        while self.__free:
+            buffer = self.__free.pop()
+            if buffer.shape == image.shape and buffer.dtype == image.dtype:
+                return buffer
+        return np.empty_like(image)
+
+    def __start(self) -> None:
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.__run, name="display")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def __run(self) -> None:
+        """
+        Shows each image as it arrives and keeps the window responsive while idle.
+        """
+        while True:
+            with self.__condition:
+                if self.__pending is None and not self.__create_window:
+                    self.__condition.wait(self.__IDLE_INTERVAL)
+                image = self.__pending
+                self.__pending = None
+                create_window = self.__create_window
+                self.__create_window = False
+
+            # If the window fails, the worker stops and later images are only replaced
+            try:
+                if create_window:
+                    self.__open_window()
+
+                if image is not None:
+                    self.__show(image)
+                    with self.__condition:
+                        self.__free.append(image)
+                elif self.__has_window:
+                    cv.waitKey(1)
+            except Exception:
+                rc_utils.print_error(
+                    ">> Error in the display window:\n" + traceback.format_exc()
+                )
+                return
+
+    def __open_window(self) -> None:
+        if not self.__has_window:
+            cv.namedWindow(self.__window_name, self.__window_flags)
+            self.__has_window = True
+
+    def __show(self, image: NDArray) -> None:
+        start = time.perf_counter_ns()
+        cv.imshow(self.__window_name, image)
+        cv.waitKey(1)
+        self.__has_window = True
+        show_ns = time.perf_counter_ns() - start
+
+        with self.__condition:
+            self.__num_shown += 1
+            self.__total_show_ns += show_ns
+            self.__max_show_ns = max(self.__max_show_ns, show_ns)
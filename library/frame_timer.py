@@ -0,0 +1,140 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the FrameTimer class, which measures the timing of the racecar's frames.
+"""
+
+import time
+import numpy as np
+from typing import NamedTuple
+
+
+class FrameStats(NamedTuple):
+    """
+    Summarizes the timing of recent frames.
+    """
+
+    # The number of frames run so far
+    num_frames: int
+
+    # The average number of seconds between the start of consecutive frames
+    mean_period: float
+
+    # The standard deviation of the number of seconds between frames
+    jitter: float
+
+    # The longest number of seconds between the start of consecutive frames
+    max_period: float
+
+    # The average and longest number of seconds of work done in each frame
+    mean_work_time: float
+    max_work_time: float
+
+    # The number of frames whose work took longer than the frame budget
+    num_overruns: int
+
+
+class FrameTimer:
+    """
+    Timestamps each frame with a monotonic clock and keeps statistics about how long
+    frames take and how evenly they are spaced.
+
+    Note:
+        Timestamps come from time.perf_counter_ns, which is not affected by changes
+        to the system clock (for example, from NTP), so only differences between
+        timestamps are meaningful.
+    """
+
+    # The number of recent frames used to compute statistics
+    __HISTORY_SIZE = 600
+
+    def __init__(self, frame_rate: float = 60) -> None:
+        self.__budget_ns: int = int(1e9 / frame_rate)
+        self.__periods: np.ndarray = np.zeros(self.__HISTORY_SIZE, np.int64)
+        self.__work_times: np.ndarray = np.zeros(self.__HISTORY_SIZE, np.int64)
+        self.__num_frames: int = 0
+        self.__num_overruns: int = 0
+
+        now = time.perf_counter_ns()
+        self.__cur_frame_time: int = now
+        self.__last_frame_time: int = now
+
+    def set_frame_rate(self, frame_rate: float) -> None:
+        """
+        Changes the frame rate used to decide whether a frame overran its budget.
+
+        Args:
+            frame_rate: The target number of frames per second.
+        """
+        assert frame_rate > 0, f"frame_rate ({frame_rate}) must be positive."
+        self.__budget_ns = int(1e9 / frame_rate)
+
+    def start_frame(self) -> int:
+        """
+        Marks the start of a new frame.
+
+        Returns:
+            The timestamp of the new frame in nanoseconds.
+        """
+        now = time.perf_counter_ns()
+        self.__last_frame_time = self.__cur_frame_time
+        self.__cur_frame_time = now
+
+        if self.__num_frames > 0:
+            index = (self.__num_frames - 1) % self.__HISTORY_SIZE
+            self.__periods[index] = now - self.__last_frame_time
+        self.__num_frames += 1
+        return now
+
+    def end_frame(self) -> int:
+        """
+        Marks the end of the work done in the current frame.
+
+        Returns:
+            The number of nanoseconds of work done in the current frame.
+        """
+        work_time = time.perf_counter_ns() - self.__cur_frame_time
+        self.__work_times[(self.__num_frames - 1) % self.__HISTORY_SIZE] = work_time
+        if work_time > self.__budget_ns:
+            self.__num_overruns += 1
+        return work_time
+
+    def get_frame_timestamp(self) -> int:
+        """
+        Returns the monotonic timestamp (in nanoseconds) of the start of the frame.
+        """
+        return self.__cur_frame_time
+
+    def get_budget(self) -> int:
+        """
+        Returns the number of nanoseconds of work allowed in each frame.
+        """
+        return self.__budget_ns
+
+    def get_delta_time(self) -> float:
+        """
+        Returns the number of seconds between the start of the previous frame and
+        the start of the current frame.
+        """
+        return (self.__cur_frame_time - self.__last_frame_time) / 1e9
+
+    def get_stats(self) -> FrameStats:
+        """
+        Returns statistics about the timing of recent frames.
+        """
+        num_periods = min(max(self.__num_frames - 1, 0), self.__HISTORY_SIZE)
+        num_work_times = min(self.__num_frames, self.__HISTORY_SIZE)
+        periods = self.__periods[:num_periods] / 1e9
+        work_times = self.__work_times[:num_work_times] / 1e9
+
+        return FrameStats(
+            num_frames=self.__num_frames,
+            mean_period=float(periods.mean()) if num_periods > 0 else 0.0,
+            jitter=float(periods.std()) if num_periods > 0 else 0.0,
+            max_period=float(periods.max()) if num_periods > 0 else 0.0,
+            mean_work_time=float(work_times.mean()) if num_work_times > 0 else 0.0,
+            max_work_time=float(work_times.max()) if num_work_times > 0 else 0.0,
+            num_overruns=self.__num_overruns,
+        )
@@ -0,0 +1,92 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains functions which wrap racecar functions so that each call can be measured,
+shared by the Profiler and the ThroughputMeter.
+"""
+
+import functools
+import inspect
+import types
+from typing import Any, Callable
+
+
+def wrap(function: Callable, name: str, hook: Any) -> Callable:
+    """
+    Returns a function which calls function and reports each call to hook.
+
+    Args:
+        function: The function to measure.
+        name: The name under which calls are reported.
+        hook: An object with a start_call() method, which is called before each call
+            and returns a value such as a start time, and an end_call(name, start)
+            method, which is called after each call with that value.
+
+    Note:
+        If function was already returned by wrap, hook is added to it instead of
+        wrapping it a second time, so several measurements share a single wrapper
+        and the name of the first.
+    """
+    hooks = getattr(function, "_instrument_hooks", None)
+    if hooks is not None:
+        if hook not in hooks:
+            hooks.append(hook)
+        return function
+
+    hooks = [hook]
+
+    @functools.wraps(function)
+    def instrumented(*args, **kwargs) -> Any:
+        starts = [hook.start_call() for hook in hooks]
+        try:
+            return function(*args, **kwargs)
+        finally:
+            # End in reverse order, so each hook excludes the ones added before it
+            for hook, start in zip(reversed(hooks), reversed(starts)):
+                hook.end_call(name, start)
+
+    instrumented._instrument_hooks = hooks
+    return instrumented
+
+
+def instrument_object(
+    obj: Any, prefix: str, hook: Any, include_update: bool = False
+) -> None:
+    """
+    Reports calls to the public methods of an object to hook.
+
+    Args:
+        obj: The object whose methods are replaced with measured versions.
+        prefix: The name of the object, which is prepended to each method name.
+        hook: The object to which calls are reported (see wrap).
+        include_update: If True, calls to the private __update method of the object
+            are also reported, under the name update.
+    """
+    for name, method in inspect.getmembers(obj, _is_method):
+        if not name.startswith("_"):
+            setattr(obj, name, wrap(method, f"{prefix}.{name}", hook))
+        elif include_update and name.endswith("__update") and name.count("__") == 1:
+            setattr(obj, name, wrap(method, f"{prefix}.update", hook))
+
+
+def instrument_module(module: types.ModuleType, prefix: str, hook: Any) -> None:
+    """
+    Reports calls to the public functions defined in a module to hook.
+
+    Args:
+        module: The module whose functions are replaced with measured versions.
+        prefix: The name of the module, which is prepended to each function name.
+        hook: The object to which calls are reported (see wrap).
+    """
+    for name, function in inspect.getmembers(module, inspect.isfunction):
+        if not name.startswith("_") and function.__module__ == module.__name__:
+            setattr(module, name, wrap(function, f"{prefix}.{name}", hook))
+
+
+def _is_method(member: Any) -> bool:
+    """
+    Returns True for methods, including methods already replaced by wrap.
+    """
+    return inspect.ismethod(member) or hasattr(member, "_instrument_hooks")
@@ -0,0 +1,74 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the LatestValue class, which hands the most recent value from one thread
+to another.
+"""
+
+import time
+from typing import Generic, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Sample(NamedTuple):
+    """
+    A value published to a LatestValue, along with when it was published.
+    """
+
+    value: object
+
+    # The number of values published before this one, or -1 if none was published
+    sequence: int
+
+    # The monotonic timestamp (in nanoseconds) at which the value was published
+    timestamp: int
+
+
+class LatestValue(Generic[T]):
+    """
+    Holds the most recently published value so that a reader thread always sees a
+    complete value together with its own sequence number and timestamp.
+
+    Note:
+        Each value is stored with its sequence number and timestamp in a single
+        tuple, and publishing replaces the reference to that tuple, which is atomic
+        under the Python interpreter lock.  A reader therefore never sees a value
+        from one publish paired with metadata from another, and neither side ever
+        blocks.  Published values must not be modified afterwards; the reader may
+        still be using them.
+
+        There must be only one publishing thread.
+    """
+
+    def __init__(self, initial_value: Optional[T] = None) -> None:
+        self.__sample: Sample = Sample(initial_value, -1, 0)
+        self.__next_sequence: int = 0
+
+    def publish(self, value: T, timestamp: Optional[int] = None) -> None:
+        """
+        Replaces the current value.
+
+        Args:
+            value: The new value, which must not be modified afterwards.
+            timestamp: When the value was produced in time.perf_counter_ns units,
+                or None to use the current time.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter_ns()
+        self.__sample = Sample(value, self.__next_sequence, timestamp)
+        self.__next_sequence += 1
+
+    def get(self) -> Sample:
+        """
+        Returns the most recently published value with its sequence and timestamp.
+        """
+        return self.__sample
+
+    def get_value(self) -> Optional[T]:
+        """
+        Returns the most recently published value.
+        """
+        return self.__sample.value
@@ -7,18 +7,41 @@ Defines the interface for the Lidar module of the racecar_core library.
 """
 
 import abc
+import time
 import numpy as np
+from enum import IntEnum
+from typing import Any, Dict, Optional, Tuple
 from nptyping import NDArray
 
+from sensor_frame import LatencyHistogram, SensorFrame
+
 
 class Lidar(abc.ABC):
     """
     Returns the scan data captured by the Lidar.
     """
 
+    class Filter(IntEnum):
+        """
+        The filters which can be applied across the scan history.
+        """
+
+        median = 0
+        mean = 1
+        min = 2
+
     # The number of samples in a full Lidar scan.
     _NUM_SAMPLES: int = 720
 
+    # The number of scans kept in the scan history by default
+    _DEFAULT_HISTORY_SIZE: int = 5
+
+    def __init__(self) -> None:
+        self.__allocate_history(self._DEFAULT_HISTORY_SIZE, self._NUM_SAMPLES)
+
+        # The age of each scan when it was first used
+        self._latency: Dict[str, LatencyHistogram] = {"lidar": LatencyHistogram()}
+
     @abc.abstractmethod
     def get_samples(self) -> NDArray[720, np.float32]:
         """
@@ -67,6 +90,53 @@ class Lidar(abc.ABC):
         """
         pass
 
+    def get_samples_with_meta(self) -> SensorFrame:
+        """
+        Returns the current LIDAR scan along with when it was captured.
+
+        Returns:
+            A SensorFrame whose data is the scan returned by get_samples(), and whose
+            timestamp and sequence number identify when the scan was captured.
+
+        Note:
+            The first time each scan is returned, its age is added to the "lidar"
+            histogram of rc.get_sensor_latency().
+
+        Example::
+
+            frame = rc.lidar.get_samples_with_meta()
+
+            # Find how many seconds ago the scan was captured
+            age = (rc.get_frame_timestamp() - frame.timestamp) / 1e9
+        """
+        frame = SensorFrame(self.get_samples(), *self._get_samples_meta())
+        self._latency["lidar"].record_frame(frame)
+        return frame
+
+    @abc.abstractmethod
+    def has_new_samples(self) -> bool:
+        """
+        Returns whether the LIDAR completed a new scan since the previous frame.
+
+        Returns:
+            True if get_samples() returns a different scan than it did during the
+            previous frame.
+
+        Example::
+
+            # Only update the map when the scan has changed
+            if rc.lidar.has_new_samples():
+                grid.update(rc.lidar.get_samples())
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_samples_meta(self) -> Tuple[int, int]:
+        """
+        Returns the capture timestamp and sequence number of the current scan.
+        """
+        pass
+
     def get_num_samples(self) -> int:
         """
         Returns the number of samples in a full LIDAR scan.
@@ -82,3 +152,178 @@ class Lidar(abc.ABC):
             rear_distance = scan[rc.lidar.get_num_samples() // 2]
         """
         return self._NUM_SAMPLES
+
+    def set_history_size(self, size: int = _DEFAULT_HISTORY_SIZE) -> None:
+        """
+        Changes the number of scans kept in the scan history.
+
+        Args:
+            size: The maximum number of scans to keep.
+
+        Note:
+            Changing the history size clears all scans currently in the history.
+            The history never holds more than size x get_num_samples() values.
+
+        Example::
+
+            # Keep the 10 most recent scans
+            rc.lidar.set_history_size(10)
+        """
+        assert size > 0, f"size ({size}) must be a positive integer."
+        self.__allocate_history(size, self.__history.shape[1])
+
+    def get_history(
+        self, num_scans: Optional[int] = None
+    ) -> Tuple[NDArray[(Any, 720), np.float32], NDArray[Any, np.float64]]:
+        """
+        Returns the most recent scans stored in the scan history.
+
+        Args:
+            num_scans: The number of scans to return, or None to return every scan in
+                the history.
+
+        Returns:
+            A two dimensional array of scans (oldest first), and an array containing
+            the time (in seconds) at which each scan was received.
+
+        Note:
+            On the real car, every scan is added to the history as it is received.
+            In the simulator and in a replay, a scan is only added once it is used,
+            such as by get_samples(), get_history(), or get_filtered_samples().  In
+            every case, the newest scan in the history is the same scan returned by
+            get_samples().
+
+            The timestamps come from time.perf_counter, like the timestamps of every
+            other sensor, so only the difference between two timestamps is
+            meaningful.
+
+        Example::
+
+            scans, timestamps = rc.lidar.get_history()
+
+            # Find how much time passed between the two most recent scans
+            if len(timestamps) >= 2:
+                scan_period = timestamps[-1] - timestamps[-2]
+        """
+        # Make sure the current scan has been added to the history
+        self.get_samples()
+
+        indices = self.__get_history_indices(num_scans)
+        return self.__history[indices], self.__history_timestamps[indices]
+
+    def get_filtered_samples(
+        self, filter_type: Filter = Filter.median, num_scans: Optional[int] = None
+    ) -> NDArray[720, np.float32]:
+        """
+        Combines the most recent scans in the scan history into a single scan.
+
+        Args:
+            filter_type: How to combine the measurements of each sample across time.
+            num_scans: The number of recent scans to combine, or None to combine every
+                scan in the history.
+
+        Returns:
+            An array of distance measurements in cm, in the same format as
+            get_samples().
+
+        Note:
+            Samples with no data (0.0) are ignored, so a sample is only 0.0 if it
+            had no data in every scan considered.
+
+            A median filter rejects the brief dropouts and spikes which are common
+            near glass and mirrors, at the cost of reacting more slowly to changes.
+
+        Example::
+
+            # Ignore dropouts by taking the median of the last 5 scans
+            scan = rc.lidar.get_filtered_samples()
+
+            # Conservatively use the closest measurement of the last 3 scans
+            closest_scan = rc.lidar.get_filtered_samples(rc.lidar.Filter.min, 3)
+        """
+        # Make sure the current scan has been added to the history
+        self.get_samples()
+
+        scans = self.__history[self.__get_history_indices(num_scans)]
+        if scans.shape[0] == 0:
+            return np.zeros(self.__history.shape[1], np.float32)
+
+        valid = (scans > 0) & np.isfinite(scans)
+        counts = np.count_nonzero(valid, axis=0)
+
+        if filter_type == self.Filter.min:
+            result = np.where(valid, scans, np.inf).min(axis=0)
+        elif filter_type == self.Filter.mean:
+            sums = np.where(valid, scans, 0).sum(axis=0)
+            result = sums / np.maximum(counts, 1)
+        else:
+            # Move missing values to the end of each column, then average the middle
+            # one or two valid values
+            ordered = np.sort(np.where(valid, scans, np.inf), axis=0)
+            lower = np.take_along_axis(
+                ordered, np.maximum(counts - 1, 0)[np.newaxis] // 2, axis=0
+            )[0]
+            upper = np.take_along_axis(
+                ordered, np.minimum(counts // 2, scans.shape[0] - 1)[np.newaxis], axis=0
+            )[0]
+            result = (lower + upper) / 2
+
+        result[counts == 0] = 0.0
+        return result.astype(np.float32, copy=False)
+
+    def _record_samples(
+        self, samples: NDArray[720, np.float32], timestamp: Optional[int] = None
+    ) -> None:
+        """
+        Adds a newly received scan to the scan history.
+
+        Args:
+            samples: The scan to add.
+            timestamp: The monotonic timestamp (in nanoseconds) at which the scan was
+                received, in time.perf_counter_ns units, or None to use the current
+                time.
+        """
+        if len(samples) == 0:
+            return
+
+        # Scans from a different LIDAR model cannot be mixed with the current history
+        if len(samples) != self.__history.shape[1]:
+            self.__allocate_history(self.__history.shape[0], len(samples))
+
+        self.__history[self.__history_index] = samples
+        if timestamp is None:
+            timestamp = time.perf_counter_ns()
+        self.__history_timestamps[self.__history_index] = timestamp / 1e9
+        self.__history_index = (self.__history_index + 1) % self.__history.shape[0]
+        self.__history_count = min(self.__history_count + 1, self.__history.shape[0])
+
+    def __allocate_history(self, size: int, num_samples: int) -> None:
+        """
+        Allocates an empty scan history.
+
+        Args:
+            size: The maximum number of scans to keep.
+            num_samples: The number of samples in each scan.
+        """
+        self.__history = np.zeros((size, num_samples), np.float32)
+        self.__history_timestamps = np.zeros(size, np.float64)
+
+        # The slot in which the next scan is stored, and the number of stored scans
+        self.__history_index = 0
+        self.__history_count = 0
+
+    def __get_history_indices(self, num_scans: Optional[int]) -> NDArray[Any, np.int64]:
+        """
+        Returns the slots of the most recent scans in the history, oldest first.
+
+        Args:
+            num_scans: The number of scans to select, or None to select all scans.
+        """
+        count = self.__history_count
+        if num_scans is not None:
+            assert num_scans > 0, f"num_scans ({num_scans}) must be a positive integer."
+            count = min(count, num_scans)
+
+        return (
+            self.__history_index - count + np.arange(count)
+        ) % self.__history.shape[0]
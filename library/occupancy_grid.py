@@ -0,0 +1,286 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the OccupancyGrid class, which builds a local map from LIDAR scans.
+"""
+
+import math
+import numpy as np
+from typing import Any, Tuple
+from nptyping import NDArray
+
+import racecar_utils as rc_utils
+
+
+class OccupancyGrid:
+    """
+    Maintains a map of the area around the car, storing the probability that each
+    cell is occupied by an obstacle.
+
+    The map is a square window centered on the car.  As the car drives, the window
+    scrolls along with it, so cells which fall off of the edge are forgotten and
+    memory use stays fixed.
+    """
+
+    # Log-odds added to a cell each time a LIDAR ray ends in it
+    __LOG_ODDS_HIT = 0.85
+
+    # Log-odds added to a cell each time a LIDAR ray passes through it
+    __LOG_ODDS_MISS = -0.4
+
+    # Limits on the log-odds of each cell, which allow the map to adapt to change
+    __LOG_ODDS_MIN = -4.0
+    __LOG_ODDS_MAX = 4.0
+
+    def __init__(
+        self, size: int = 200, resolution: float = 5.0, max_range: float = 800
+    ) -> None:
+        """
+        Creates an empty occupancy grid centered on the car.
+
+        Args:
+            size: The width and height of the grid in cells.
+            resolution: The width of each cell in cm.
+            max_range: The farthest LIDAR measurement (in cm) added to the map.
+
+        Example::
+
+            # Create a 10 m x 10 m map with 5 cm cells
+            grid = OccupancyGrid(200, 5.0)
+        """
+        assert size > 0, f"size ({size}) must be a positive integer."
+        assert resolution > 0, f"resolution ({resolution}) must be positive."
+        assert max_range > 0, f"max_range ({max_range}) must be positive."
+
+        self.__size: int = size
+        self.__resolution: float = resolution
+        self.__max_range: float = max_range
+
+        self.__log_odds: NDArray[(Any, Any), np.float32] = np.zeros(
+            (size, size), np.float32
+        )
+        self.__scratch: NDArray[(Any, Any), np.float32] = np.zeros_like(
+            self.__log_odds
+        )
+        self.__free_mask: NDArray[Any, np.bool_] = np.zeros(size * size, np.bool_)
+        self.__hit_mask: NDArray[Any, np.bool_] = np.zeros(size * size, np.bool_)
+
+        # The pose of the car as (x, y, heading), and the world position of the
+        # center cell of the grid
+        self.__pose: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+        self.__origin: Tuple[float, float] = (0.0, 0.0)
+
+    def update(
+        self,
+        scan: NDArray[Any, np.float32],
+        delta_heading: float = 0.0,
+        delta_position: Tuple[float, float] = (0.0, 0.0),
+    ) -> None:
+        """
+        Moves the car by the provided amount and adds a LIDAR scan to the map.
+
+        Args:
+            scan: The samples from a LIDAR scan taken at the new pose.
+            delta_heading: The number of degrees the car turned clockwise since the
+                previous update.
+            delta_position: The distance (in cm) the car moved since the previous
+                update, expressed as (right, forward) relative to its new heading.
+
+        Note:
+            Ignores any samples with a value of 0.0 (no data).  Samples beyond
+            max_range clear the cells along their ray but do not mark an obstacle.
+
+        Example::
+
+            grid = OccupancyGrid()
+
+            def update():
+                # The IMU measures yaw counterclockwise in rad/s, so convert it into
+                # clockwise degrees turned during this frame
+                yaw = rc.physics.get_angular_velocity()[1]
+                delta_heading = -math.degrees(yaw) * rc.get_delta_time()
+
+                grid.update(rc.lidar.get_samples(), delta_heading)
+        """
+        self.__move(delta_heading, delta_position)
+
+        num_samples = len(scan)
+        if num_samples == 0:
+            return
+
+        x, y, heading = self.__pose
+        center = self.__size // 2
+
+        # The position of the car in (fractional) grid cells
+        car_row = center - (y - self.__origin[1]) / self.__resolution
+        car_col = center + (x - self.__origin[0]) / self.__resolution
+
+        # Find the end point of each ray, treating every long-range sample as a
+        # free ray of length max_range
+        valid = (scan > 0) & np.isfinite(scan)
+        is_hit = valid & (scan < self.__max_range)
+        distances = np.minimum(np.where(valid, scan, 0), self.__max_range)
+        angles = np.radians(heading + np.arange(num_samples) * 360 / num_samples)
+        row_spans = -distances * np.cos(angles) / self.__resolution
+        col_spans = distances * np.sin(angles) / self.__resolution
+
+        # Step along each ray at most one cell per step along each axis, which visits
+        # the same cells as Bresenham's line algorithm
+        num_steps = np.ceil(np.maximum(np.abs(row_spans), np.abs(col_spans)))
+        num_steps = num_steps.astype(np.int32)
+        steps = np.arange(max(1, num_steps.max()))[np.newaxis, :]
+        fractions = steps / np.maximum(num_steps, 1)[:, np.newaxis]
+        rows = np.rint(car_row + fractions * row_spans[:, np.newaxis]).astype(np.int32)
+        cols = np.rint(car_col + fractions * col_spans[:, np.newaxis]).astype(np.int32)
+
+        # Every cell before the end of a valid ray is free
+        is_free = valid[:, np.newaxis] & (steps < num_steps[:, np.newaxis])
+        is_free &= (0 <= rows) & (rows < self.__size)
+        is_free &= (0 <= cols) & (cols < self.__size)
+        self.__free_mask[:] = False
+        self.__free_mask[rows[is_free] * self.__size + cols[is_free]] = True
+
+        # The cell at the end of each ray which struck an obstacle is occupied
+        hit_rows = np.rint(car_row + row_spans[is_hit]).astype(np.int32)
+        hit_cols = np.rint(car_col + col_spans[is_hit]).astype(np.int32)
+        in_grid = (
+            (0 <= hit_rows)
+            & (hit_rows < self.__size)
+            & (0 <= hit_cols)
+            & (hit_cols < self.__size)
+        )
+        self.__hit_mask[:] = False
+        self.__hit_mask[hit_rows[in_grid] * self.__size + hit_cols[in_grid]] = True
+        self.__free_mask &= ~self.__hit_mask
+
+        log_odds = self.__log_odds.reshape(-1)
+        log_odds[self.__free_mask] += self.__LOG_ODDS_MISS
+        log_odds[self.__hit_mask] += self.__LOG_ODDS_HIT
+        np.clip(log_odds, self.__LOG_ODDS_MIN, self.__LOG_ODDS_MAX, log_odds)
+
+    def get_probabilities(self) -> NDArray[(Any, Any), np.float32]:
+        """
+        Returns the probability that each cell in the map is occupied.
+
+        Returns:
+            A two dimensional array of probabilities from 0.0 to 1.0, where cells
+            which have not been observed have a probability of 0.5.
+
+        Note:
+            The grid is oriented so that the first row is in the direction the car
+            faced when the map was created (heading 0), and the car is always in the
+            cell closest to the center of the grid.
+
+        Example::
+
+            probabilities = grid.get_probabilities()
+
+            # Count the number of cells that are probably walls
+            num_walls = np.count_nonzero(probabilities > 0.8)
+        """
+        return 1 / (1 + np.exp(-self.__log_odds))
+
+    def get_log_odds(self) -> NDArray[(Any, Any), np.float32]:
+        """
+        Returns a direct reference to the log-odds that each cell is occupied.
+
+        Warning:
+            Do not modify the returned array, since it is the map itself.
+        """
+        return self.__log_odds
+
+    def get_pose(self) -> Tuple[float, float, float]:
+        """
+        Returns the position and heading of the car relative to where the map began.
+
+        Returns:
+            The (x, y, heading) of the car, where x is the distance (in cm) to the
+            right of the start, y is the distance (in cm) forward of the start, and
+            heading is the number of degrees the car has turned clockwise.
+        """
+        return self.__pose
+
+    def get_resolution(self) -> float:
+        """
+        Returns the width of each cell in cm.
+        """
+        return self.__resolution
+
+    def get_image(self) -> NDArray[(Any, Any, 3), np.uint8]:
+        """
+        Renders the map as a color image.
+
+        Returns:
+            An image with one pixel per cell, where likely obstacles are white,
+            likely free space is black, and unobserved space is gray.  The car is
+            shown as a green dot.
+
+        Example::
+
+            rc.display.show_color_image(grid.get_image())
+        """
+        gray = (self.get_probabilities() * 255).astype(np.uint8)
+        image = np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+        # Scrolling keeps the car in the center cell
+        center = self.__size // 2
+        car_pixel = (center, center)
+        rc_utils.draw_circle(image, car_pixel, rc_utils.ColorBGR.green.value, 1)
+        return image
+
+    def reset(self) -> None:
+        """
+        Clears the map and resets the pose of the car to the origin.
+        """
+        self.__log_odds.fill(0)
+        self.__pose = (0.0, 0.0, 0.0)
+        self.__origin = (0.0, 0.0)
+
+    def __move(self, delta_heading: float, delta_position: Tuple[float, float]) -> None:
+        """
+        Updates the pose of the car and scrolls the grid to keep the car centered.
+
+        Args:
+            delta_heading: The number of degrees the car turned clockwise.
+            delta_position: The (right, forward) distance the car moved in cm.
+        """
+        x, y, heading = self.__pose
+        heading = (heading + delta_heading) % 360
+
+        # Rotate the motion from the car's frame into the map's frame
+        heading_rad = math.radians(heading)
+        right, forward = delta_position
+        x += right * math.cos(heading_rad) + forward * math.sin(heading_rad)
+        y += -right * math.sin(heading_rad) + forward * math.cos(heading_rad)
+        self.__pose = (x, y, heading)
+
+        # Scroll by whole cells once the car leaves the center cell
+        shift_cols = round((x - self.__origin[0]) / self.__resolution)
+        shift_rows = -round((y - self.__origin[1]) / self.__resolution)
+        if shift_rows != 0 or shift_cols != 0:
+            self.__shift(shift_rows, shift_cols)
+            self.__origin = (
+                self.__origin[0] + shift_cols * self.__resolution,
+                self.__origin[1] - shift_rows * self.__resolution,
+            )
+
+    def __shift(self, rows: int, cols: int) -> None:
+        """
+        Moves the contents of the grid so that cell (rows, cols) becomes the center.
+
+        Args:
+            rows: The number of rows to shift the window down by.
+            cols: The number of columns to shift the window right by.
+        """
+        self.__scratch.fill(0)
+        size = self.__size
+        if abs(rows) < size and abs(cols) < size:
+            src_rows = slice(max(rows, 0), size + min(rows, 0))
+            dst_rows = slice(max(-rows, 0), size + min(-rows, 0))
+            src_cols = slice(max(cols, 0), size + min(cols, 0))
+            dst_cols = slice(max(-cols, 0), size + min(-cols, 0))
+            self.__scratch[dst_rows, dst_cols] = self.__log_odds[src_rows, src_cols]
+
+        self.__log_odds, self.__scratch = self.__scratch, self.__log_odds
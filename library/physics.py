@@ -8,14 +8,24 @@ Defines the interface of the Physics module of the racecar_core library
 
 import abc
 import numpy as np
+from typing import Dict, Tuple
 from nptyping import NDArray
 
+from sensor_frame import LatencyHistogram, SensorFrame
+
 
 class Physics(abc.ABC):
     """
     Returns the linear acceleration and angular velocity measured by the IMU.
     """
 
+    def __init__(self) -> None:
+        # The age of each measurement when it was first used, indexed by stream name
+        self._latency: Dict[str, LatencyHistogram] = {
+            "linear_acceleration": LatencyHistogram(),
+            "angular_velocity": LatencyHistogram(),
+        }
+
     @abc.abstractmethod
     def get_linear_acceleration(self) -> NDArray[3, np.float32]:
         """
@@ -68,3 +78,67 @@ class Physics(abc.ABC):
             yaw = ang_vel[1]
         """
         pass
+
+    def get_linear_acceleration_with_meta(self) -> SensorFrame:
+        """
+        Returns the car's linear acceleration along with when it was measured.
+
+        Returns:
+            A SensorFrame whose data is the vector returned by
+            get_linear_acceleration(), and whose timestamp and sequence number
+            identify the most recent measurement included in it.
+
+        Note:
+            The first time each measurement is returned, its age is added to the
+            "linear_acceleration" histogram of rc.get_sensor_latency().
+        """
+        frame = SensorFrame(
+            self.get_linear_acceleration(), *self._get_linear_acceleration_meta()
+        )
+        self._latency["linear_acceleration"].record_frame(frame)
+        return frame
+
+    def get_angular_velocity_with_meta(self) -> SensorFrame:
+        """
+        Returns the car's angular velocity along with when it was measured.
+
+        Returns:
+            A SensorFrame whose data is the vector returned by get_angular_velocity(),
+            and whose timestamp and sequence number identify the most recent
+            measurement included in it.
+
+        Note:
+            The first time each measurement is returned, its age is added to the
+            "angular_velocity" histogram of rc.get_sensor_latency().
+        """
+        frame = SensorFrame(
+            self.get_angular_velocity(), *self._get_angular_velocity_meta()
+        )
+        self._latency["angular_velocity"].record_frame(frame)
+        return frame
+
+    @abc.abstractmethod
+    def has_new_data(self) -> bool:
+        """
+        Returns whether the IMU took a new measurement since the previous frame.
+
+        Returns:
+            True if get_linear_acceleration() or get_angular_velocity() returns a
+            value measured during the previous frame, or False if they repeat older
+            values because no measurement arrived.
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_linear_acceleration_meta(self) -> Tuple[int, int]:
+        """
+        Returns the timestamp and sequence number of the latest accelerometer reading.
+        """
+        pass
+
+    @abc.abstractmethod
+    def _get_angular_velocity_meta(self) -> Tuple[int, int]:
+        """
+        Returns the timestamp and sequence number of the latest gyroscope reading.
+        """
+        pass
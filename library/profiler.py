@@ -0,0 +1,162 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the Profiler class, which measures how long racecar functions take.
+"""
+
+import threading
+import time
+import types
+import numpy as np
+from typing import Any, Callable, Dict, List, NamedTuple
+
+import instrument
+
+
+class SpanStats(NamedTuple):
+    """
+    Summarizes the durations (in seconds) of the calls to a profiled function.
+    """
+
+    name: str
+    count: int
+    total: float
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class Profiler:
+    """
+    Wraps functions so that the duration of each call is recorded under a span name.
+
+    Note:
+        Durations are measured with time.perf_counter_ns and include the time spent
+        in any profiled functions called from within the span.
+    """
+
+    # The number of recent durations of each span used to compute percentiles
+    __HISTORY_SIZE = 1000
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__durations: Dict[str, np.ndarray] = {}
+        self.__counts: Dict[str, int] = {}
+        self.__totals: Dict[str, int] = {}
+
+    def record(self, name: str, duration: int) -> None:
+        """
+        Records a single call to a span.
+
+        Args:
+            name: The name of the span.
+            duration: The duration of the call in nanoseconds.
+        """
+        with self.__lock:
+            count = self.__counts.get(name, 0)
+            if count == 0:
+                self.__durations[name] = np.zeros(self.__HISTORY_SIZE, np.int64)
+                self.__totals[name] = 0
+            self.__durations[name][count % self.__HISTORY_SIZE] = duration
+            self.__counts[name] = count + 1
+            self.__totals[name] += duration
+
+    def start_call(self) -> int:
+        """
+        Returns the start time of a call to a wrapped function (see instrument.wrap).
+        """
+        return time.perf_counter_ns()
+
+    def end_call(self, name: str, start: int) -> None:
+        """
+        Records a call to a wrapped function which began at start.
+        """
+        self.record(name, time.perf_counter_ns() - start)
+
+    def wrap(self, function: Callable, name: str) -> Callable:
+        """
+        Returns a function which calls function and records its duration as name.
+        """
+        return instrument.wrap(function, name, self)
+
+    def instrument_object(self, obj: Any, prefix: str) -> None:
+        """
+        Profiles the public methods and the private __update method of an object.
+
+        Args:
+            obj: The object whose methods are replaced with profiled versions.
+            prefix: The name of the object, which is prepended to each span name.
+        """
+        instrument.instrument_object(obj, prefix, self, include_update=True)
+
+    def instrument_module(self, module: types.ModuleType, prefix: str) -> None:
+        """
+        Profiles the public functions defined in a module.
+
+        Args:
+            module: The module whose functions are replaced with profiled versions.
+            prefix: The name of the module, which is prepended to each span name.
+        """
+        instrument.instrument_module(module, prefix, self)
+
+    def get_stats(self) -> List[SpanStats]:
+        """
+        Returns statistics about each span, sorted from most to least total time.
+        """
+        with self.__lock:
+            spans = [
+                (name, count, self.__totals[name], self.__durations[name].copy())
+                for name, count in self.__counts.items()
+            ]
+
+        stats = []
+        for name, count, total, durations in spans:
+            durations = durations[: min(count, self.__HISTORY_SIZE)] / 1e9
+            p50, p90, p99 = np.percentile(durations, [50, 90, 99])
+            stats.append(
+                SpanStats(
+                    name=name,
+                    count=count,
+                    total=total / 1e9,
+                    mean=total / count / 1e9,
+                    p50=float(p50),
+                    p90=float(p90),
+                    p99=float(p99),
+                    max=float(durations.max()),
+                )
+            )
+        stats.sort(key=lambda span: span.total, reverse=True)
+        return stats
+
+    def format_stats(self, max_spans: int = 15) -> str:
+        """
+        Returns a table of the spans with the most total time.
+
+        Args:
+            max_spans: The number of spans to include in the table.
+        """
+        lines = [
+            f"{'span':<40}{'count':>7}{'total':>10}{'mean':>9}"
+            f"{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}  (ms)"
+        ]
+        for span in self.get_stats()[:max_spans]:
+            lines.append(
+                f"{span.name[:39]:<40}{span.count:>7}{span.total * 1000:>10.2f}"
+                f"{span.mean * 1000:>9.3f}{span.p50 * 1000:>9.3f}"
+                f"{span.p90 * 1000:>9.3f}{span.p99 * 1000:>9.3f}"
+                f"{span.max * 1000:>9.3f}"
+            )
+        return "\n".join(lines)
+
+    def reset(self) -> None:
+        """
+        Removes every recorded duration.
+        """
+        with self.__lock:
+            self.__durations.clear()
+            self.__counts.clear()
+            self.__totals.clear()
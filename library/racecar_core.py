@@ -7,8 +7,12 @@ Contains the Racecar class, the top level of the racecar_core library
 """
 
 import abc
+import atexit
+import copy
+import datetime
+import os
 import sys
-from typing import Callable, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import camera
 import controller
@@ -16,6 +20,13 @@ import display
 import drive
 import lidar
 import physics
+from frame_timer import FrameStats
+from profiler import Profiler, SpanStats
+from recorder import Recorder
+import tracer
+from sensor_frame import LatencyHistogram
+from slow_worker import SensorSnapshot, SlowWorkerStats
+from throughput import ThroughputMeter
 
 import racecar_utils as rc_utils
 
@@ -26,6 +37,18 @@ class Racecar(abc.ABC):
     with and control the different pieces of the RACECAR hardware.
     """
 
+    # Times racecar functions if the program was run with the -p flag
+    _profiler: Optional[Profiler] = None
+
+    # The file to which the trace is saved if the program was run with the -t flag
+    _trace_path: Optional[str] = None
+
+    # Records the data of each frame if a recording was requested
+    _recorder: Optional[Recorder] = None
+
+    # Measures the speed and CPU use of update if the program was run with the -b flag
+    _throughput_meter: Optional[ThroughputMeter] = None
+
     def __init__(self) -> None:
         self.camera: camera.Camera
         self.controller: controller.Controller
@@ -50,7 +73,8 @@ class Racecar(abc.ABC):
         self,
         start: Callable[[], None],
         update: Callable[[], None],
-        update_slow: Optional[Callable[[], None]] = None,
+        update_slow: Optional[Callable[..., Any]] = None,
+        update_slow_async: bool = False,
     ) -> None:
         """
         Sets the start and update functions used in user program mode.
@@ -61,9 +85,21 @@ class Racecar(abc.ABC):
                 60 frames occur per second.
             update_slow: A function called once per fixed time interval in user
                 program mode (by default once per second).
+            update_slow_async: If True, update_slow is called on a separate thread so
+                that it never delays update.
 
         Note:
-            The provided functions should not take any parameters.
+            The provided functions should not take any parameters, except for
+            update_slow when update_slow_async is True.  In that case, update_slow
+            receives a SensorSnapshot containing copies of the sensor data from the
+            frame in which it was requested, and must not call any racecar functions.
+            Its return value can be retrieved with get_update_slow_result().  In the
+            simulator, the snapshot only contains the sensor data which update
+            requested that frame, and the rest is None.
+
+            Without update_slow_async, update_slow runs on the same thread as update.
+            On the real car, it runs after the frame's drive command is sent, and
+            the degrade overrun policy postpones it while frames are running late.
 
         Example::
 
@@ -83,6 +119,42 @@ class Racecar(abc.ABC):
 
             # Tell the racecar to run until the program is exited
             rc.go()
+
+            # Alternatively, run a heavy update_slow without delaying update
+            def update_slow(snapshot):
+                return rc_utils.get_ar_markers(snapshot.color_image)
+
+            rc.set_start_update(start, update, update_slow, update_slow_async=True)
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_update_slow_result(self) -> Any:
+        """
+        Returns the value returned by the most recent asynchronous call to update_slow.
+
+        Returns:
+            The most recent return value of update_slow, or None if update_slow has
+            not finished yet or is not asynchronous.
+
+        Example::
+
+            def update():
+                # Use the AR markers most recently found by update_slow
+                markers = rc.get_update_slow_result()
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_update_slow_stats(self) -> Optional[SlowWorkerStats]:
+        """
+        Returns statistics about how far behind the control loop update_slow runs.
+
+        Returns:
+            A SlowWorkerStats tuple containing the number of completed and dropped
+            calls, and the average, longest, and most recent number of seconds from
+            the frame in which update_slow was requested until it finished, or None
+            if update_slow is not asynchronous.
         """
         pass
 
@@ -102,6 +174,67 @@ class Racecar(abc.ABC):
         """
         pass
 
+    @abc.abstractmethod
+    def get_frame_timestamp(self) -> int:
+        """
+        Returns the time at which the current frame started.
+
+        Returns:
+            A monotonic timestamp in nanoseconds.
+
+        Note:
+            The timestamp is not affected by changes to the system clock, so only the
+            difference between two timestamps is meaningful.
+
+        Example::
+
+            # Measure how long the current frame has taken so far
+            elapsed_ns = time.perf_counter_ns() - rc.get_frame_timestamp()
+        """
+        pass
+
+    @abc.abstractmethod
+    def get_frame_stats(self) -> FrameStats:
+        """
+        Returns statistics about the timing of recent frames.
+
+        Returns:
+            A FrameStats tuple containing the number of frames run, the average
+            period and jitter (standard deviation of the period) in seconds, the
+            average and longest time spent working in each frame, and the number of
+            frames whose work exceeded the frame budget.
+
+        Example::
+
+            def update_slow():
+                stats = rc.get_frame_stats()
+                print(f"Jitter: {stats.jitter * 1000:.2f} ms")
+                print(f"Overruns: {stats.num_overruns} of {stats.num_frames} frames")
+        """
+        pass
+
+    def get_sensor_latency(self) -> Dict[str, LatencyHistogram]:
+        """
+        Returns histograms of how old sensor data was when it was first used.
+
+        Returns:
+            A LatencyHistogram for each sensor stream ("color_image", "depth_image",
+            "lidar", "linear_acceleration", and "angular_velocity").  Each histogram
+            records the time from capture until the data was first returned by the
+            matching get_*_with_meta() function.
+
+        Example::
+
+            def update_slow():
+                stats = rc.get_sensor_latency()["lidar"].get_stats()
+                print(f"LIDAR age: p50 {stats.p50 * 1000:.1f} ms")
+        """
+        return {
+            **self.camera._latency,
+            **self.lidar._latency,
+            **self.physics._latency,
+        }
+
     @abc.abstractmethod
     def set_update_slow_time(self, time: float = 1.0) -> None:
         """
@@ -117,18 +250,195 @@ class Racecar(abc.ABC):
         """
         pass
 
+    def get_profile_stats(self) -> Optional[List[SpanStats]]:
+        """
+        Returns how long racecar functions took since the end of the last update_slow.
+
+        Returns:
+            A SpanStats tuple for each profiled function, sorted from most to least
+            total time, or None if the program was not run with the "-p" flag.
+
+        Note:
+            When profiling, the module functions (such as rc.camera.get_color_image),
+            the racecar_utils functions, and the start, update, and update_slow
+            functions are timed.  A summary is printed and the statistics are cleared
+            after each call to update_slow.
+
+        Example::
+
+            def update():
+                stats = rc.get_profile_stats()
+                if stats is not None and len(stats) > 0:
+                    print(f"Slowest function: {stats[0].name}")
+        """
+        if self._profiler is None:
+            return None
+        return self._profiler.get_stats()
+
+    def save_trace(self, path: Optional[str] = None) -> int:
+        """
+        Saves a timeline of recent frames, sensor reads, and callbacks to a file.
+
+        Args:
+            path: The Chrome trace JSON file to write, or None to use the file chosen
+                when tracing was enabled.
+
+        Returns:
+            The number of spans saved, or 0 if the program was not run with the "-t"
+            flag.
+
+        Note:
+            When tracing, the trace is also saved automatically when the program
+            exits.  Open the file in chrome://tracing or https://ui.perfetto.dev.
+
+        Example::
+
+            def update():
+                # Save the trace as soon as a frame runs long, to look for the cause
+                if rc.get_delta_time() > 0.05:
+                    rc.save_trace("slow_frame.json")
+        """
+        trace = tracer.get_tracer()
+        if trace is None:
+            return 0
+        return trace.save(self._trace_path if path is None else path)
+
+    def _enable_tracer(self, path: str) -> None:
+        """
+        Starts recording a timeline which is saved to path when the program exits.
+        """
+        tracer.enable_tracing()
+        self._trace_path = path
+        atexit.register(self.save_trace)
+
+    def _enable_recorder(self, path: str) -> None:
+        """
+        Starts recording each frame of user program mode to the directory at path.
+        """
+        self._recorder = Recorder(self, path)
+        atexit.register(self._recorder.close)
+
+    def _enable_throughput_meter(self, path: str) -> None:
+        """
+        Starts measuring the speed and CPU use of update, which are saved to the JSON
+        file at path when the program exits.
+        """
+        self._throughput_meter = ThroughputMeter()
+        for name in ("camera", "controller", "display", "drive", "lidar", "physics"):
+            self._throughput_meter.instrument_object(getattr(self, name), name)
+        self._throughput_meter.instrument_module(rc_utils, "rc_utils")
+        atexit.register(self._throughput_meter.save, path)
+
+    def _enable_profiler(self) -> None:
+        """
+        Starts timing the module functions and the racecar_utils functions.
+        """
+        self._profiler = Profiler()
+        for name in ("camera", "controller", "display", "drive", "lidar", "physics"):
+            self._profiler.instrument_object(getattr(self, name), name)
+        self._profiler.instrument_module(rc_utils, "rc_utils")
+
+    def _instrument_callbacks(
+        self,
+        start: Callable[[], None],
+        update: Callable[[], None],
+        update_slow: Optional[Callable[..., Any]],
+    ) -> Tuple[Callable[[], None], Callable[[], None], Optional[Callable[..., Any]]]:
+        """
+        Wraps the user's callbacks so that they are measured, traced, profiled, and
+        recorded if enabled.
 
-def create_racecar(isSimulation: Optional[bool] = None) -> Racecar:
+        Returns:
+            The start, update, and update_slow functions to use.  When profiling, the
+            update_slow function also prints and clears the statistics, and is
+            provided even if the user did not provide one.
+        """
+        if self._throughput_meter is not None:
+            update = self._throughput_meter.wrap_update(update)
+
+        trace = tracer.get_tracer()
+        if trace is not None:
+            start = trace.wrap(start, "start", "user")
+            update = trace.wrap(update, "update", "user")
+            if update_slow is not None:
+                update_slow = trace.wrap(update_slow, "update_slow", "user")
+
+        profiler = self._profiler
+        if profiler is not None:
+            profiled_update_slow = (
+                profiler.wrap(update_slow, "update_slow")
+                if update_slow is not None
+                else None
+            )
+
+            def update_slow_and_print(*args) -> Any:
+                result = None
+                if profiled_update_slow is not None:
+                    result = profiled_update_slow(*args)
+                print(">> Profile since the last update_slow:")
+                print(profiler.format_stats())
+                profiler.reset()
+                return result
+
+            start = profiler.wrap(start, "start")
+            update = profiler.wrap(update, "update")
+            update_slow = update_slow_and_print
+
+        # Record each frame after update has chosen the drive command
+        recorder = self._recorder
+        if recorder is not None:
+            user_update = update
+
+            def update_and_record() -> None:
+                user_update()
+                recorder.record()
+
+            update = update_and_record
+
+        return start, update, update_slow
+
+    def _take_snapshot(self) -> SensorSnapshot:
+        """
+        Copies the sensor data of the current frame for use on another thread.
+        """
+        return SensorSnapshot(
+            timestamp=self.get_frame_timestamp(),
+            color_image=copy.deepcopy(self.camera.get_color_image_no_copy()),
+            depth_image=copy.deepcopy(self.camera.get_depth_image()),
+            lidar_samples=copy.deepcopy(self.lidar.get_samples()),
+            linear_acceleration=self.physics.get_linear_acceleration(),
+            angular_velocity=self.physics.get_angular_velocity(),
+        )
+
+
+def create_racecar(
+    isSimulation: Optional[bool] = None,
+    isMultithreaded: Optional[bool] = None,
+    recordingPath: Optional[str] = None,
+    replayPath: Optional[str] = None,
+    replaySpeedup: Optional[float] = None,
+) -> Racecar:
     """
     Generates a racecar object based on the isSimulation argument or execution flags.
 
     Args:
         isSimulation: If True, create a RacecarSim, if False, create a RacecarReal,
             if None, decide based on the command line arguments
+        isMultithreaded: If True, a RacecarReal receives sensor data on several
+            threads, if None, decide based on the command line arguments
+        recordingPath: The directory in which to record the sensor data, controller
+            state, and drive commands of each frame in user program mode, or None to
+            decide based on the command line arguments
+        replayPath: The directory of a recording to play back instead of connecting to
+            RacecarSim or the car, or None to decide based on the command line arguments
+        replaySpeedup: How many times faster than it was recorded to play back the
+            recording, 0 to play it as fast as possible, or None to decide based on
+            the command line arguments
 
     Returns:
-        A RacecarSim object (for use with the Unity simulation) or a RacecarReal object
-        (for use on the physical car).
+        A RacecarSim object (for use with the Unity simulation), a RacecarReal object
+        (for use on the physical car), or a RacecarReplay object (for playing back a
+        recording).
 
     Note:
         If isSimulation is None, this function will return a RacecarSim if the program
@@ -138,37 +448,206 @@ def create_racecar(isSimulation: Optional[bool] = None) -> Racecar:
 
         If the program was executed with the "-h" flag, it is run in headless mode,
         which disables the display module.
+
+        If isMultithreaded is None, a RacecarReal receives sensor data on several
+        threads if the program was executed with the "-m" flag.  This has no effect
+        on a RacecarSim.
+
+        If the program was executed with the "-w" flag, the display is streamed
+        over HTTP instead of shown in a window, even in headless mode, and can be
+        watched from a browser at port 8080 of the car, or at the port given with
+        "--stream-port <port>".
+
+        If the program was executed with the "-p" flag, racecar functions are timed
+        and a summary is printed after each call to update_slow.
+
+        If the program was executed with the "-t" flag, a timeline of the program is
+        saved to racecar_trace.json when it exits.
+
+        If the program was executed with the "-b" flag, the rate at which update ran,
+        its CPU time split between the library and the user's code, and the peak
+        memory use are printed and saved to racecar_benchmark.json when it exits.
+
+        If recordingPath is None and the program was executed with the "-r" flag, a
+        recording is saved in the recordings directory.
+
+        If replayPath is None and the program was executed with "--replay <path>",
+        the recording at path is played back, as fast as possible unless a speedup
+        is given with "--speedup <factor>".  This takes precedence over isSimulation.
     """
     library_path: str = __file__.replace("racecar_core.py", "")
     isHeadless: bool = "-h" in sys.argv
     initializeDisplay: bool = "-d" in sys.argv
+    isProfiled: bool = "-p" in sys.argv
+    isTraced: bool = "-t" in sys.argv
+    isBenchmarked: bool = "-b" in sys.argv
+    streamPort: Optional[int] = None
+    if "-w" in sys.argv:
+        streamPort = int(_get_argument("--stream-port") or 8080)
+    if recordingPath is None and "-r" in sys.argv:
+        recordingPath = os.path.join(
+            "recordings", datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        )
+    if isMultithreaded is None:
+        isMultithreaded = "-m" in sys.argv
+    if replayPath is None:
+        replayPath = _get_argument("--replay")
+    if replaySpeedup is None:
+        replaySpeedup = float(_get_argument("--speedup") or 0)
 
     # If isSimulation was not specified, set it to True if the user ran the program with
     # the -s flag and false otherwise
     if isSimulation is None:
         isSimulation = "-s" in sys.argv
 
+    # Choose the stream display first, so that the backend does not create a window
+    streamDisplay: Optional[display.Display] = None
+    if streamPort is not None:
+        streamDisplay = _create_stream_display(streamPort)
+
     racecar: Racecar
-    if isSimulation:
+    if replayPath is not None:
+        sys.path.insert(1, library_path + "replay")
+        from racecar_core_replay import RacecarReplay
+
+        racecar = RacecarReplay(replayPath, isHeadless, replaySpeedup, streamDisplay)
+    elif isSimulation:
         sys.path.insert(1, library_path + "simulation")
         from racecar_core_sim import RacecarSim
 
-        racecar = RacecarSim(isHeadless)
+        racecar = RacecarSim(isHeadless, streamDisplay)
     else:
         sys.path.insert(1, library_path + "real")
         from racecar_core_real import RacecarReal
 
-        racecar = RacecarReal(isHeadless)
+        racecar = RacecarReal(isHeadless, isMultithreaded, streamDisplay)
 
     if initializeDisplay:
         racecar.display.create_window()
 
+    if isProfiled:
+        racecar._enable_profiler()
+
+    if isTraced:
+        racecar._enable_tracer("racecar_trace.json")
+
+    if isBenchmarked:
+        racecar._enable_throughput_meter("racecar_benchmark.json")
+
+    if recordingPath is not None:
+        racecar._enable_recorder(recordingPath)
+
     rc_utils.print_colored(
         ">> Racecar created with the following options:"
         + f"\n    Simulation (-s): [{isSimulation}]"
         + f"\n    Headless (-h): [{isHeadless}]"
-        + f"\n    Initialize with display (-d): [{initializeDisplay}]",
+        + f"\n    Initialize with display (-d): [{initializeDisplay}]"
+        + f"\n    Stream display (-w): [{streamPort}]"
+        + f"\n    Multi-threaded (-m): [{isMultithreaded}]"
+        + f"\n    Profile (-p): [{isProfiled}]"
+        + f"\n    Trace (-t): [{isTraced}]"
+        + f"\n    Benchmark (-b): [{isBenchmarked}]"
+        + f"\n    Record (-r): [{recordingPath}]"
+        + f"\n    Replay (--replay): [{replayPath}]",
+        rc_utils.TerminalColor.pink,
+    )
+
+    return racecar
+
+
+def create_racecar_fleet(num_cars: int, max_workers: Optional[int] = None):
+    """
+    Generates an object which runs several cars in RacecarSim from one process.
+
+    Args:
+        num_cars: The number of cars to connect to RacecarSim.
+        max_workers: The number of threads which run the cars' start and update
+            functions, or None to use one thread per car up to the number of
+            processors.
+
+    Returns:
+        A RacecarSimFleet whose cars attribute holds a RacecarSim for each car.
+
+    Note:
+        Every car is headless, and the -p, -t, -r, and -b flags do not apply.
+
+    Example::
+
+        fleet = racecar_core.create_racecar_fleet(2)
+        for rc in fleet.cars:
+            rc.set_start_update(start, update)
+        fleet.go()
+    """
+    library_path: str = __file__.replace("racecar_core.py", "")
+    sys.path.insert(1, library_path + "simulation")
+    from fleet_sim import RacecarSimFleet
+
+    fleet = RacecarSimFleet(num_cars, max_workers)
+    rc_utils.print_colored(
+        f">> Racecar fleet created with {num_cars} simulated cars",
         rc_utils.TerminalColor.pink,
     )
+    return fleet
+
+
+def create_racecar_async():
+    """
+    Generates an object which runs in RacecarSim from an asyncio event loop.
+
+    Returns:
+        A RacecarSimAsync, whose sensor and drive functions are coroutines.
+
+    Note:
+        If the program was executed with the "-h" flag, it is run in headless mode,
+        which disables the display module.  The -p, -t, -r, and -b flags do not
+        apply.
+
+    Example::
 
+        rc = racecar_core.create_racecar_async()
+
+        async def update():
+            image, scan = await asyncio.gather(
+                rc.camera.get_color_image(), rc.lidar.get_samples()
+            )
+            await rc.drive.set_speed_angle(0.5, 0)
+
+        rc.set_start_update(start, update)
+        rc.go()
+    """
+    library_path: str = __file__.replace("racecar_core.py", "")
+    sys.path.insert(1, library_path + "simulation")
+    from async_sim import RacecarSimAsync
+
+    racecar = RacecarSimAsync("-h" in sys.argv)
+    rc_utils.print_colored(
+        ">> Racecar created for asyncio with the following options:"
+        + f"\n    Headless (-h): [{'-h' in sys.argv}]",
+        rc_utils.TerminalColor.pink,
+    )
     return racecar
+
+
+def _get_argument(flag: str) -> Optional[str]:
+    """
+    Returns the command line argument following flag, or None if flag was not used.
+    """
+    if flag not in sys.argv:
+        return None
+
+    index = sys.argv.index(flag) + 1
+    assert index < len(sys.argv), f"The {flag} flag must be followed by a value."
+    return sys.argv[index]
+
+
+def _create_stream_display(port: int) -> display.Display:
+    """
+    Returns a display which can be watched from a browser instead of a window.
+
+    Note:
+        The stream display is imported here so that its web server is only loaded
+        when the -w flag is used.
+    """
+    from display_stream import StreamDisplay
+
+    return StreamDisplay(port)
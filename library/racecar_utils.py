@@ -7,11 +7,14 @@ Contains helper functions to support common operations.
 """
 
 import cv2 as cv
+import math
 import numpy as np
 from typing import *
 from nptyping import NDArray
 from enum import Enum, IntEnum
 
+import copy_on_write
+
 
 ########################################################################################
 # General
@@ -446,6 +449,41 @@ def get_largest_contour(
     return greatest_contour
 
 
+def get_writable_image(
+    color_image: NDArray[(Any, Any, 3), np.uint8]
+) -> NDArray[(Any, Any, 3), np.uint8]:
+    """
+    Returns a version of an image which can be modified freely.
+
+    Args:
+        color_image: The image to modify, such as an image from
+            rc.camera.get_color_image().
+
+    Returns:
+        The image itself if it is writable.  Otherwise, a new copy of the image,
+        including anything already drawn on it with the draw functions.
+
+    Note:
+        rc.camera.get_color_image() returns a read-only image so that it is not
+        copied every frame.  The draw functions accept a read-only image, but draw
+        on a hidden copy which only rc.display.show_color_image() shows.  Call this
+        function first to keep the drawing when the image is passed to any other
+        function, such as crop, stack_images_horizontal, or an OpenCV function.
+
+    Example::
+
+        image = rc_utils.get_writable_image(rc.camera.get_color_image())
+
+        # Draw on the image, then crop it without losing the drawing
+        rc_utils.draw_circle(image, (240, 320))
+        cv.putText(image, "center", (330, 240), cv.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0))
+        rc.display.show_color_image(rc_utils.crop(image, (120, 160), (360, 480)))
+    """
+    if color_image.flags.writeable:
+        return color_image
+    return np.copy(copy_on_write.resolve_image(color_image))
+
+
 def draw_contour(
     color_image: NDArray[(Any, Any, 3), np.uint8],
     contour: NDArray,
@@ -460,6 +498,12 @@ def draw_contour(
         color: The color to draw the contour, specified as
             blue-green-red channels each ranging from 0 to 255 inclusive.
 
+    Note:
+        If color_image is read-only, such as an image from
+        rc.camera.get_color_image(), the contour is drawn on a hidden copy of the
+        image which only rc.display.show_color_image() shows in its place.  To pass
+        the drawing on to other functions, use get_writable_image first.
+
     Example::
 
         image = rc.camera.get_color_image()
@@ -479,6 +523,7 @@ def draw_contour(
             0 <= channel <= 255
         ), f"Each channel in color ({color}) must be in the range 0 to 255 inclusive."
 
+    color_image = copy_on_write.get_drawing_image(color_image)
     cv.drawContours(color_image, [contour], 0, color, 3)
 
 
@@ -498,6 +543,12 @@ def draw_circle(
             blue-green-red channels each ranging from 0 to 255 inclusive.
         radius: The radius of the circle in pixels.
 
+    Note:
+        If color_image is read-only, such as an image from
+        rc.camera.get_color_image(), the circle is drawn on a hidden copy of the
+        image which only rc.display.show_color_image() shows in its place.  To pass
+        the drawing on to other functions, use get_writable_image first.
+
     Example::
 
         image = rc.camera.get_color_image()
@@ -527,6 +578,7 @@ def draw_circle(
     assert radius > 0, f"radius ({radius}) must be a positive integer."
 
     # cv.circle expects the center in (column, row) format
+    color_image = copy_on_write.get_drawing_image(color_image)
     cv.circle(color_image, (center[1], center[0]), radius, color, -1)
 
 
@@ -944,6 +996,353 @@ def get_lidar_average_distance(
     return sum(samples) / len(samples)
 
 
+def get_lidar_clusters(
+    scan: NDArray[Any, np.float32], max_gap: float = 20, min_samples: int = 3
+) -> NDArray[(Any, 6), np.float32]:
+    """
+    Splits a LIDAR scan into clusters of samples which belong to the same object.
+
+    Args:
+        scan: The samples from a LIDAR scan.
+        max_gap: The largest distance (in cm) between the points of two adjacent
+            samples in the same cluster.
+        min_samples: The fewest samples a cluster must contain to be returned.
+
+    Returns:
+        An array with one row per cluster, ordered clockwise, where each row is
+        (centroid_x, centroid_y, extent, distance, first_index, last_index).
+        centroid_x and centroid_y are the position (in cm) of the center of the
+        cluster to the right of and in front of the car.  extent is the distance
+        (in cm) between the first and last point of the cluster, and distance is the
+        distance (in cm) to the closest point in the cluster.  first_index and
+        last_index are the indices in scan of the first and last sample.
+
+    Note:
+        Ignores any samples with a value of 0.0 (no data).
+
+        A cluster which passes through the 360-0 degree boundary has a last_index
+        smaller than its first_index.
+
+    Example::
+
+        scan = rc.lidar.get_samples()
+        clusters = rc_utils.get_lidar_clusters(scan)
+
+        # Find the angle and distance of the closest object
+        if len(clusters) > 0:
+            x, y, extent, distance, _, _ = clusters[np.argmin(clusters[:, 3])]
+            angle = math.degrees(math.atan2(x, y)) % 360
+    """
+    indices, points, starts, ends = _get_lidar_cluster_bounds(scan, max_gap)
+    if len(starts) == 0:
+        return np.zeros((0, 6), np.float32)
+
+    # The runs cover every point, so reducing at each start spans exactly one run.
+    # Small clusters are only dropped afterwards, since a reduction at the kept
+    # starts alone would span the dropped runs between them.
+    distances = np.linalg.norm(points, axis=1)
+    sums = np.add.reduceat(points, starts, axis=0)
+    closest = np.minimum.reduceat(distances, starts)
+
+    counts = ends - starts
+    keep = counts >= min_samples
+    starts, ends, counts = starts[keep], ends[keep], counts[keep]
+
+    clusters = np.empty((len(starts), 6), np.float32)
+    clusters[:, 0:2] = sums[keep] / counts[:, np.newaxis]
+    clusters[:, 2] = np.linalg.norm(points[ends - 1] - points[starts], axis=1)
+    clusters[:, 3] = closest[keep]
+    clusters[:, 4] = indices[starts]
+    clusters[:, 5] = indices[ends - 1]
+    return clusters
+
+
+def get_lidar_segments(
+    scan: NDArray[Any, np.float32],
+    max_gap: float = 20,
+    tolerance: float = 4,
+    min_samples: int = 5,
+) -> NDArray[(Any, 4), np.float32]:
+    """
+    Finds the straight line segments, such as walls, in a LIDAR scan.
+
+    Args:
+        scan: The samples from a LIDAR scan.
+        max_gap: The largest distance (in cm) between the points of two adjacent
+            samples on the same segment.
+        tolerance: The farthest distance (in cm) a point may be from the segment it
+            belongs to.
+        min_samples: The fewest samples a segment must contain to be returned.
+
+    Returns:
+        An array with one row per segment, where each row is (x0, y0, x1, y1), the
+        positions (in cm) of the segment's end points to the right of and in front of
+        the car.
+
+    Note:
+        Ignores any samples with a value of 0.0 (no data).
+
+        The scan is first split into clusters (see get_lidar_clusters).  Each cluster
+        is then recursively split at the point farthest from the line between its
+        ends until every point is within tolerance, and adjacent pieces which
+        together still fit within tolerance are merged back together.
+
+    Example::
+
+        scan = rc.lidar.get_samples()
+        segments = rc_utils.get_lidar_segments(scan)
+
+        # Find the length of the longest wall
+        if len(segments) > 0:
+            lengths = np.hypot(
+                segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1]
+            )
+            longest = segments[np.argmax(lengths)]
+    """
+    assert tolerance > 0, f"tolerance ({tolerance}) must be positive."
+
+    _, points, starts, ends = _get_lidar_cluster_bounds(scan, max_gap)
+
+    segments: List[Tuple[float, float, float, float]] = []
+    for cluster_start, cluster_end in zip(starts, ends):
+        if cluster_end - cluster_start < min_samples:
+            continue
+
+        # Split: divide each run of points until all points are close to the line
+        # between the ends of their run
+        pieces: List[Tuple[int, int]] = []
+        stack = [(cluster_start, cluster_end)]
+        while len(stack) > 0:
+            start, end = stack.pop()
+            deviations = _get_line_deviations(points[start:end])
+            farthest = int(np.argmax(deviations))
+            if deviations[farthest] > tolerance and 0 < farthest < end - start - 1:
+                # Keep pieces in clockwise order by processing the first half next
+                stack.append((start + farthest, end))
+                stack.append((start, start + farthest + 1))
+            else:
+                pieces.append((start, end))
+
+        # Merge: join neighboring pieces which are collinear within tolerance
+        merged = [pieces[0]]
+        for start, end in pieces[1:]:
+            if np.max(_get_line_deviations(points[merged[-1][0] : end])) <= tolerance:
+                merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+
+        for start, end in merged:
+            if end - start >= min_samples:
+                segments.append((*points[start], *points[end - 1]))
+
+    return np.array(segments, np.float32).reshape(-1, 4)
+
+
+def get_lidar_wall(
+    scan: NDArray[Any, np.float32],
+    angle: float = 90,
+    window_angle: float = 90,
+    outlier_distance: float = 10,
+) -> Optional[Tuple[float, float, float]]:
+    """
+    Fits a straight wall to the samples in a window of a LIDAR scan.
+
+    Args:
+        scan: The samples from a LIDAR scan.
+        angle: The angle (in degrees) at the center of the window, starting at 0
+            directly in front of the car and increasing clockwise.
+        window_angle: The number of degrees to consider around angle.
+        outlier_distance: After an initial fit, samples farther than this distance
+            (in cm) from the wall are ignored and the wall is fit again.
+
+    Returns:
+        The (distance, heading, residual) of the wall, or None if fewer than two
+        samples in the window contain data.  distance is the shortest distance (in
+        cm) from the car to the line through the wall.  heading is the number of
+        degrees the wall is turned clockwise from the direction the car is facing,
+        ranging from -90 to 90.  residual is the root mean square distance (in cm)
+        of the samples from the wall.
+
+    Note:
+        Ignores any samples with a value of 0.0 (no data).
+
+        Every sample in the window contributes to a single least squares fit, which
+        is less sensitive to noise than comparing the average distance at a few
+        angles.  A large residual indicates that the window does not contain a
+        single straight wall.
+
+        The fit is not free: for a 90 degree window it takes several times as long
+        as measuring three small windows with get_lidar_average_distance, so only
+        use it when the noise of those measurements is a problem.
+
+    Example::
+
+        scan = rc.lidar.get_samples()
+
+        # Fit the wall to the right of the car
+        wall = rc_utils.get_lidar_wall(scan, 90)
+        if wall is not None:
+            distance, heading, residual = wall
+
+            # Steer to stay parallel to the wall, 30 cm away from it
+            angle = rc_utils.clamp(heading / 20 + (distance - 30) / 20, -1, 1)
+    """
+    assert (
+        0 < window_angle < 360
+    ), f"window_angle ({window_angle}) must be in the range 0 to 360."
+
+    # Select the samples in the window, wrapping around the 360-0 degree boundary
+    num_samples = len(scan)
+    center_index = round((angle % 360) * num_samples / 360)
+    num_side_samples = int(window_angle / 2 * num_samples / 360)
+    start = (center_index - num_side_samples) % num_samples
+    end = start + 2 * num_side_samples + 1
+    if end <= num_samples:
+        distances = scan[start:end]
+    else:
+        distances = np.concatenate((scan[start:], scan[: end - num_samples]))
+
+    valid = (distances > 0) & (distances < np.inf)
+    count = int(np.count_nonzero(valid))
+    if count < 2:
+        return None
+
+    # Samples with no data are placed at the car, where they add nothing to the sums
+    # from which the line is fit
+    points = _get_lidar_directions(num_samples)[:, start:end] * np.where(
+        valid, distances, 0
+    )
+
+    # Fit a line with total least squares, then refit without outliers.  No sample
+    # can be an outlier if the squared distances of all samples sum to less than
+    # outlier_distance squared, which is the case for a clean, straight wall.
+    normal, offset, variance = _fit_line(points, count)
+    if count * variance > outlier_distance ** 2:
+        outliers = np.abs(normal @ points - offset) > outlier_distance
+        outliers &= valid
+        num_outliers = int(np.count_nonzero(outliers))
+        if 0 < num_outliers <= count - 2:
+            points[:, outliers] = 0
+            normal, offset, variance = _fit_line(points, count - num_outliers)
+
+    # The wall runs perpendicular to its normal; orient it to point forward
+    direction = (normal[1], -normal[0])
+    if direction[1] < 0 or (direction[1] == 0 and direction[0] < 0):
+        direction = (-direction[0], -direction[1])
+
+    distance = abs(offset)
+    heading = math.degrees(math.atan2(direction[0], direction[1]))
+    residual = math.sqrt(variance)
+    return distance, heading, residual
+
+
+def _get_lidar_cluster_bounds(
+    scan: NDArray[Any, np.float32], max_gap: float
+) -> Tuple[NDArray, NDArray, NDArray, NDArray]:
+    """
+    Converts the samples of a LIDAR scan into points and splits them into clusters.
+
+    Args:
+        scan: The samples from a LIDAR scan.
+        max_gap: The largest distance (in cm) between adjacent points in a cluster.
+
+    Returns:
+        The index in scan of each point, the (x, y) position of each point, and the
+        start (inclusive) and end (exclusive) of each cluster in the point array.
+        The points are rotated so that no cluster passes through the end of the
+        array.
+    """
+    assert max_gap > 0, f"max_gap ({max_gap}) must be positive."
+
+    indices = np.flatnonzero((scan > 0) & np.isfinite(scan))
+    if len(indices) == 0:
+        empty = np.zeros(0, np.int64)
+        return empty, np.zeros((0, 2), np.float32), empty, empty
+
+    angles = indices * (2 * np.pi / len(scan))
+    distances = scan[indices]
+    points = np.stack((distances * np.sin(angles), distances * np.cos(angles)), axis=1)
+
+    # A new cluster begins after each gap, including the gap from the last point
+    # back around to the first point
+    gaps = np.linalg.norm(np.roll(points, -1, axis=0) - points, axis=1) > max_gap
+    breaks = np.flatnonzero(gaps) + 1
+    if len(breaks) == 0:
+        return indices, points, np.array([0]), np.array([len(points)])
+
+    # Rotate the points to begin at a gap, so no cluster wraps around
+    first = breaks[-1] % len(points)
+    indices = np.roll(indices, -first)
+    points = np.roll(points, -first, axis=0)
+    breaks = np.sort((breaks - first) % len(points))
+    starts = breaks
+    ends = np.append(breaks[1:], len(points))
+    return indices, points, starts, ends
+
+
+def _fit_line(
+    points: NDArray[(2, Any), np.float64], count: int
+) -> Tuple[NDArray[2, np.float64], float, float]:
+    """
+    Fits a line to points with total least squares.
+
+    Args:
+        points: The x coordinates of the points in the first row and the y
+            coordinates in the second row, where points at (0, 0) are ignored.
+        count: The number of points which are not at (0, 0).
+
+    Returns:
+        The unit normal of the line, the distance along the normal from (0, 0) to
+        the line, and the mean squared distance of the points from the line.
+    """
+    # The fit only depends on the sums of the coordinates and of their products
+    sum_x, sum_y = points.sum(axis=1).tolist()
+    (sum_xx, sum_xy), (_, sum_yy) = (points @ points.T).tolist()
+    mean_x, mean_y = sum_x / count, sum_y / count
+    xx = sum_xx - sum_x * mean_x
+    yy = sum_yy - sum_y * mean_y
+    xy = sum_xy - sum_x * mean_y
+
+    # The line runs along the direction of greatest variance, and the remaining
+    # variance is the smaller eigenvalue of the covariance matrix
+    direction_angle = 0.5 * math.atan2(2 * xy, xx - yy)
+    normal = np.array([-math.sin(direction_angle), math.cos(direction_angle)])
+    variance = max((xx + yy) / 2 - math.hypot((xx - yy) / 2, xy), 0) / count
+    return normal, float(normal @ (mean_x, mean_y)), variance
+
+
+# The directions of the samples of a LIDAR scan, indexed by the number of samples
+_lidar_directions: Dict[int, NDArray[(2, Any), np.float64]] = {}
+
+
+def _get_lidar_directions(num_samples: int) -> NDArray[(2, Any), np.float64]:
+    """
+    Returns the sine and cosine of the angle of each sample in a scan.
+
+    Note:
+        The directions repeat twice, so that a window which wraps around the end of
+        the scan can be sliced without copying.
+    """
+    directions = _lidar_directions.get(num_samples)
+    if directions is None:
+        angles = np.arange(2 * num_samples) * (2 * np.pi / num_samples)
+        directions = np.stack((np.sin(angles), np.cos(angles)))
+        _lidar_directions[num_samples] = directions
+    return directions
+
+
+def _get_line_deviations(points: NDArray[(Any, 2), np.float32]) -> NDArray:
+    """
+    Returns the distance of each point from the line through the first and last point.
+    """
+    direction = points[-1] - points[0]
+    length = np.hypot(direction[0], direction[1])
+    offsets = points - points[0]
+    if length == 0:
+        return np.hypot(offsets[:, 0], offsets[:, 1])
+    return np.abs(offsets[:, 0] * direction[1] - offsets[:, 1] * direction[0]) / length
+
+
 ########################################################################################
 # AR Markers
 ########################################################################################
@@ -1179,10 +1578,16 @@ def draw_ar_markers(
         markers: The AR markers detected in the image.
         color: The color used to outline each AR marker, represented in the BGR format.
 
+    Returns:
+        The image on which the annotations were drawn.
+
     Warning:
         This modifies the provided image. If you accessed the image with
         rc.camera.get_color_image_no_copy(), you must manually create a copy of the
-        image first with copy.deepcopy().
+        image first with copy.deepcopy().  A read-only image, such as an image from
+        rc.camera.get_color_image(), is drawn on a hidden copy as in draw_contour,
+        and is returned as is.  To pass the drawing on to other functions, use
+        get_writable_image first.
 
     Example::
 
@@ -1199,4 +1604,7 @@ def draw_ar_markers(
     for i in range(len(markers)):
         ids[i][0] = markers[i].get_id()
         corners.append(markers[i].get_corners_aruco_format())
-    cv.aruco.drawDetectedMarkers(color_image, corners, ids, color)
+    cv.aruco.drawDetectedMarkers(
+        copy_on_write.get_drawing_image(color_image), corners, ids, color
+    )
+    return color_image
@@ -7,14 +7,20 @@ Contains the Camera module of the racecar_core library
 """
 
 from camera import Camera
+from latest_value import LatestValue
+from sensor_frame import stamp_to_timestamp
+import tracer
 
 # General
+import sys
 import cv2 as cv
 import numpy as np
+from typing import List, Optional, Tuple
 from nptyping import NDArray
 
 # ROS2
 import rclpy as ros2
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 from rclpy.qos import (
     QoSDurabilityPolicy,
     QoSHistoryPolicy,
@@ -25,12 +31,72 @@ from sensor_msgs.msg import Image
 from cv_bridge import CvBridge, CvBridgeError
 
 
+class _BufferPool:
+    """
+    A fixed number of reusable arrays which are handed out in rotation.
+
+    Note:
+        A buffer is only reused once nothing outside the pool refers to it or to a
+        view of it, so an image which a program keeps is never overwritten.  If
+        every buffer is still in use, a new buffer replaces one of them.
+    """
+
+    def __init__(self, size: int, dtype: np.dtype) -> None:
+        self.__dtype = dtype
+        self.__buffers: List[np.ndarray] = [np.empty(0, dtype)] * size
+        self.__index: int = 0
+
+    def get(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Returns the least recently used free buffer, or a new buffer if none is free.
+        """
+        for offset in range(1, len(self.__buffers) + 1):
+            index = (self.__index + offset) % len(self.__buffers)
+            if self.__is_free(index, shape):
+                self.__index = index
+                return self.__buffers[index]
+
+        self.__index = (self.__index + 1) % len(self.__buffers)
+        self.__buffers[self.__index] = np.empty(shape, self.__dtype)
+        return self.__buffers[self.__index]
+
+    def __is_free(self, index: int, shape: Tuple[int, ...]) -> bool:
+        """
+        Returns whether the buffer at index has shape and is referenced only by the
+        pool.
+        """
+        # A view holds a reference to the array it views, so the only references to
+        # a free buffer are the pool's list, buffer, and the argument to getrefcount
+        buffer = self.__buffers[index]
+        return buffer.shape == shape and sys.getrefcount(buffer) <= 3
+
+
 class CameraReal(Camera):
     # The ROS topic from which we read camera data
     __COLOR_TOPIC = "/camera/color"
     __DEPTH_TOPIC = "/camera/depth"
 
+    # The number of converted images of each kind kept for reuse.  An image returned
+    # by get_color_image_no_copy or get_depth_image is only reused once the program
+    # no longer holds it or any view of it.  The async getters may be called from
+    # any thread at any time, so they allocate a new image instead of taking one
+    # from these pools.
+    __POOL_SIZE = 3
+
+    # The factor which converts each depth encoding to cm
+    __DEPTH_SCALES = {"16UC1": 0.1, "mono16": 0.1, "32FC1": 100.0}
+
+    # The OpenCV conversion from each color encoding to BGR, where None means the
+    # image is already BGR
+    __COLOR_CONVERSIONS = {
+        "bgr8": None,
+        "rgb8": cv.COLOR_RGB2BGR,
+        "bgra8": cv.COLOR_BGRA2BGR,
+        "rgba8": cv.COLOR_RGBA2BGR,
+    }
+
     def __init__(self):
+        Camera.__init__(self)
         self.__bridge = CvBridge()
 
         # ROS node
@@ -44,49 +110,165 @@ class CameraReal(Camera):
         qos_profile.durability = QoSDurabilityPolicy.RMW_QOS_POLICY_DURABILITY_VOLATILE
 
         # subscribe to the color image topic, which will call
-        # __color_callback every time the camera publishes data
+        # __color_callback every time the camera publishes data.  Each topic has its
+        # own callback group so that a multi-threaded executor can receive color and
+        # depth images in parallel with each other and with the other sensors
         self.__color_image_sub = self.node.create_subscription(
-            Image, self.__COLOR_TOPIC, self.__color_callback, qos_profile
+            Image,
+            self.__COLOR_TOPIC,
+            self.__color_callback,
+            qos_profile,
+            callback_group=MutuallyExclusiveCallbackGroup(),
         )
-        self.__color_image = None
-        self.__color_image_new = None
+        self.__color_image_buffer = LatestValue()
+        self.__color_image_sample = self.__color_image_buffer.get()
+        self.__is_color_image_new = False
 
         # subscribe to the depth image topic, which will call
         # __depth_callback every time the camera publishes data
         self.__depth_image_sub = self.node.create_subscription(
-            Image, self.__DEPTH_TOPIC, self.__depth_callback, qos_profile
+            Image,
+            self.__DEPTH_TOPIC,
+            self.__depth_callback,
+            qos_profile,
+            callback_group=MutuallyExclusiveCallbackGroup(),
         )
-        self.__depth_image = None
-        self.__depth_image_new = None
+        self.__depth_image_buffer = LatestValue()
+        self.__depth_image_sample = self.__depth_image_buffer.get()
+        self.__is_depth_image_new = False
 
-    def __color_callback(self, data):
-        try:
-            cv_color_image = self.__bridge.imgmsg_to_cv2(data, "bgr8")
-        except CvBridgeError as e:
-            print(e)
+        # Messages are only converted when their image is requested, so messages
+        # which arrive faster than they are used are dropped without any work.  The
+        # sequence number of the converted message is kept with its image.
+        self.__color_pool = _BufferPool(self.__POOL_SIZE, np.uint8)
+        self.__color_image: Tuple[int, Optional[np.ndarray]] = (-1, None)
+        self.__depth_pool = _BufferPool(self.__POOL_SIZE, np.float32)
+        self.__depth_image: Tuple[int, Optional[np.ndarray]] = (-1, None)
 
-        self.__color_image_new = cv_color_image
+    def __color_callback(self, data):
+        with tracer.span("camera.color_callback", "ros"):
+            stamp = data.header.stamp
+            timestamp = stamp_to_timestamp(stamp.sec, stamp.nanosec)
+            self.__color_image_buffer.publish(data, timestamp)
 
     def __depth_callback(self, data):
-        try:
-            cv_depth_image = self.__bridge.imgmsg_to_cv2(data, "16UC1")
-        except CvBridgeError as e:
-            print(e)
-
-        self.__depth_image_new = cv_depth_image
+        with tracer.span("camera.depth_callback", "ros"):
+            stamp = data.header.stamp
+            timestamp = stamp_to_timestamp(stamp.sec, stamp.nanosec)
+            self.__depth_image_buffer.publish(data, timestamp)
 
     def __update(self):
-        self.__depth_image = self.__depth_image_new
-        self.__color_image = self.__color_image_new
+        # Take the latest images once per frame so they stay fixed during the frame
+        color_image_sample = self.__color_image_buffer.get()
+        self.__is_color_image_new = (
+            color_image_sample.sequence != self.__color_image_sample.sequence
+        )
+        self.__color_image_sample = color_image_sample
+
+        depth_image_sample = self.__depth_image_buffer.get()
+        self.__is_depth_image_new = (
+            depth_image_sample.sequence != self.__depth_image_sample.sequence
+        )
+        self.__depth_image_sample = depth_image_sample
 
     def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
-        return self.__color_image
+        sample = self.__color_image_sample
+        if self.__color_image[0] != sample.sequence:
+            with tracer.span("camera.convert_color_image", "sensor"):
+                image = self.__convert_color_image(sample.value, self.__color_pool)
+            self.__color_image = (sample.sequence, image)
+        return self.__color_image[1]
 
     def get_depth_image(self) -> NDArray[(480, 640), np.float32]:
-        return self.__depth_image
+        sample = self.__depth_image_sample
+        if self.__depth_image[0] != sample.sequence:
+            with tracer.span("camera.convert_depth_image", "sensor"):
+                image = self.__convert_depth_image(sample.value, self.__depth_pool)
+            self.__depth_image = (sample.sequence, image)
+        return self.__depth_image[1]
 
     def get_color_image_async(self) -> NDArray[(480, 640, 3), np.uint8]:
-        return self.__color_image_new
+        return self.__convert_color_image(self.__color_image_buffer.get_value(), None)
 
     def get_depth_image_async(self) -> NDArray[(480, 640), np.float32]:
-        return self.__depth_image_new
+        return self.__convert_depth_image(self.__depth_image_buffer.get_value(), None)
+
+    def has_new_color_image(self) -> bool:
+        return self.__is_color_image_new
+
+    def has_new_depth_image(self) -> bool:
+        return self.__is_depth_image_new
+
+    def _get_color_image_meta(self) -> Tuple[int, int]:
+        return self.__color_image_sample.timestamp, self.__color_image_sample.sequence
+
+    def _get_depth_image_meta(self) -> Tuple[int, int]:
+        return self.__depth_image_sample.timestamp, self.__depth_image_sample.sequence
+
+    def __view_message(self, message, dtype: np.dtype, channels: int) -> np.ndarray:
+        """
+        Returns an array which views the pixels of an Image message without copying.
+        """
+        dtype = np.dtype(dtype).newbyteorder(">" if message.is_bigendian else "<")
+        rows = np.frombuffer(message.data, np.uint8).reshape(message.height, -1)
+
+        # Rows may be padded beyond the width of the image
+        row_size = message.width * channels * dtype.itemsize
+        pixels = rows[:, :row_size].view(dtype)
+        if channels > 1:
+            pixels = pixels.reshape(message.height, message.width, channels)
+        return pixels
+
+    def __convert_color_image(
+        self, message, pool: Optional[_BufferPool]
+    ) -> Optional[np.ndarray]:
+        """
+        Converts an Image message into a BGR image stored in pool, or in a newly
+        allocated image if pool is None.
+        """
+        if message is None:
+            return None
+
+        if message.encoding not in self.__COLOR_CONVERSIONS:
+            try:
+                return self.__bridge.imgmsg_to_cv2(message, "bgr8")
+            except CvBridgeError as e:
+                print(e)
+                return None
+
+        channels = 4 if message.encoding.endswith("a8") else 3
+        pixels = self.__view_message(message, np.uint8, channels)
+        shape = (message.height, message.width, 3)
+        color_image = np.empty(shape, np.uint8) if pool is None else pool.get(shape)
+        conversion = self.__COLOR_CONVERSIONS[message.encoding]
+        if conversion is None:
+            np.copyto(color_image, pixels)
+        else:
+            cv.cvtColor(pixels, conversion, dst=color_image)
+        return color_image
+
+    def __convert_depth_image(
+        self, message, pool: Optional[_BufferPool]
+    ) -> Optional[np.ndarray]:
+        """
+        Converts an Image message into a depth image in cm stored in pool, or in a
+        newly allocated image if pool is None.
+        """
+        if message is None:
+            return None
+
+        if message.encoding not in self.__DEPTH_SCALES:
+            print(f"Unsupported depth image encoding {message.encoding}")
+            return None
+
+        dtype = np.float32 if message.encoding == "32FC1" else np.uint16
+        pixels = self.__view_message(message, dtype, 1)
+        shape = (message.height, message.width)
+        depth_image = np.empty(shape, np.float32) if pool is None else pool.get(shape)
+        np.multiply(
+            pixels,
+            self.__DEPTH_SCALES[message.encoding],
+            out=depth_image,
+            casting="unsafe",
+        )
+        return depth_image
@@ -7,6 +7,7 @@ Contains the Controller module of the racecar_core library
 """
 
 from controller import Controller
+import tracer
 
 # General
 import copy
@@ -14,6 +15,7 @@ from typing import Tuple
 
 # ROS2
 import rclpy as ros2
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 from sensor_msgs.msg import Joy
 
 
@@ -84,7 +86,11 @@ class ControllerReal(Controller):
         # subscribe to the controller topic, which will call
         # __controller_callback every time the controller state changes
         self.__subscriber = self.node.create_subscription(
-            Joy, self.__TOPIC, self.__controller_callback, 1
+            Joy,
+            self.__TOPIC,
+            self.__controller_callback,
+            1,
+            callback_group=MutuallyExclusiveCallbackGroup(),
         )
 
     def is_down(self, button: Controller.Button) -> bool:
@@ -103,6 +109,10 @@ class ControllerReal(Controller):
         return self.__last_joystick[joystick.value]
 
     def __controller_callback(self, message):
+        with tracer.span("controller.callback", "ros"):
+            self.__handle_message(message)
+
+    def __handle_message(self, message):
         """
         Updates the state of Controller in response to a change in controller state.
 
@@ -9,7 +9,9 @@ import cv2 as cv
 import os
 from nptyping import NDArray
 
+import copy_on_write
 from display import Display
+from display_worker import DisplayWorker
 
 
 class DisplayReal(Display):
@@ -26,14 +28,15 @@ class DisplayReal(Display):
         )
         if self.__display_found:
             os.environ["DISPLAY"] = self.__DISPLAY
+            if not isHeadless:
+                self._worker = DisplayWorker(self.__WINDOW_NAME, cv.WINDOW_AUTOSIZE)
         else:
             print(f"Display {self.__DISPLAY} not found.")
 
     def create_window(self) -> None:
         if not self._Display__isHeadless and self.__display_found:
-            cv.namedWindow(self.__WINDOW_NAME)
+            self._worker.create_window()
 
     def show_color_image(self, image: NDArray) -> None:
         if not self._Display__isHeadless and self.__display_found:
-            cv.imshow(self.__WINDOW_NAME, image)
-            cv.waitKey(1)
+            self._worker.show(copy_on_write.resolve_image(image))
@@ -6,18 +6,21 @@ Spring 2020
 Contains the Lidar module of the racecar_core library
 """
 
+from latest_value import LatestValue
 from lidar import Lidar
+from sensor_frame import stamp_to_timestamp
+import tracer
 
 # General
 import numpy as np
+from typing import Tuple
 from nptyping import NDArray
 
 # ROS2
 import rclpy as ros2
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 from rclpy.qos import qos_profile_sensor_data
 from sensor_msgs.msg import LaserScan
-from cv_bridge import CvBridge, CvBridgeError
-import threading
 
 
 class LidarReal(Lidar):
@@ -25,26 +28,47 @@ class LidarReal(Lidar):
     __SCAN_TOPIC = "/scan"
 
     def __init__(self):
+        Lidar.__init__(self)
+
         # ROS node
         self.node = ros2.create_node("scan_sub")
 
         # subscribe to the scan topic, which will call
         # __scan_callback every time the lidar sends data
         self.__scan_sub = self.node.create_subscription(
-            LaserScan, self.__SCAN_TOPIC, self.__scan_callback, qos_profile_sensor_data
+            LaserScan,
+            self.__SCAN_TOPIC,
+            self.__scan_callback,
+            qos_profile_sensor_data,
+            callback_group=MutuallyExclusiveCallbackGroup(),
         )
 
-        self.__samples = np.empty(0)
-        self.__samples_new = np.empty(0)
+        self.__samples_buffer = LatestValue(np.empty(0))
+        self.__samples_sample = self.__samples_buffer.get()
+        self.__is_new = False
 
     def __scan_callback(self, data):
-        self.__samples_new = np.array(data.ranges)
+        with tracer.span("lidar.scan_callback", "ros"):
+            stamp = data.header.stamp
+            timestamp = stamp_to_timestamp(stamp.sec, stamp.nanosec)
+            self.__samples_buffer.publish(np.array(data.ranges), timestamp)
 
     def __update(self):
-        self.__samples = self.__samples_new
+        # Take the latest scan once per frame so it stays fixed during the frame
+        sample = self.__samples_buffer.get()
+        self.__is_new = sample.sequence != self.__samples_sample.sequence
+        if self.__is_new:
+            self._record_samples(sample.value, sample.timestamp)
+        self.__samples_sample = sample
 
     def get_samples(self) -> NDArray[720, np.float32]:
-        return self.__samples
+        return self.__samples_sample.value
 
     def get_samples_async(self) -> NDArray[720, np.float32]:
-        return self.__samples_new
+        return self.__samples_buffer.get_value()
+
+    def has_new_samples(self) -> bool:
+        return self.__is_new
+
+    def _get_samples_meta(self) -> Tuple[int, int]:
+        return self.__samples_sample.timestamp, self.__samples_sample.sequence
@@ -6,15 +6,19 @@ Spring 2020
 Contains the Physics module of the racecar_core library
 """
 
+from latest_value import LatestValue
 from physics import Physics
+from sensor_frame import stamp_to_timestamp
+import tracer
 
 # General
-from collections import deque
 import numpy as np
+from typing import Tuple
 from nptyping import NDArray
 
 # ROS2
 import rclpy as ros2
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
 from rclpy.qos import (
     QoSDurabilityPolicy,
     QoSHistoryPolicy,
@@ -29,10 +33,8 @@ class PhysicsReal(Physics):
     __ACCEL_TOPIC = "/camera/accel"
     __GYRO_TOPIC = "/camera/gyro"
 
-    # Limit on buffer size to prevent memory overflow
-    __BUFFER_CAP = 60
-
     def __init__(self):
+        Physics.__init__(self)
         self.node = ros2.create_node("imu_sub")
 
         qos_profile = QoSProfile(depth=1)
@@ -42,55 +44,106 @@ class PhysicsReal(Physics):
         )
         qos_profile.durability = QoSDurabilityPolicy.RMW_QOS_POLICY_DURABILITY_VOLATILE
 
+        # The IMU callbacks share a callback group, so they never run at the same
+        # time as each other, but may run at the same time as __update
+        callback_group = MutuallyExclusiveCallbackGroup()
+
         # subscribe to the accel topic, which will call
         # __accel_callback every time the camera publishes data
         self.__accel_sub = self.node.create_subscription(
-            Imu, self.__ACCEL_TOPIC, self.__accel_callback, qos_profile
+            Imu,
+            self.__ACCEL_TOPIC,
+            self.__accel_callback,
+            qos_profile,
+            callback_group=callback_group,
         )
         # subscribe to the gyro topic, which will call
         # __gyro_callback every time the camera publishes data
         self.__gyro_sub = self.node.create_subscription(
-            Imu, self.__GYRO_TOPIC, self.__gyro_callback, qos_profile
+            Imu,
+            self.__GYRO_TOPIC,
+            self.__gyro_callback,
+            qos_profile,
+            callback_group=callback_group,
         )
 
+        # Each callback publishes the running (sum, count) of its measurements,
+        # stamped with the time of the latest measurement, and __update averages the
+        # measurements received since the previous frame
         self.__acceleration = np.array([0, 0, 0])
-        self.__acceleration_buffer = deque()
+        self.__acceleration_totals = LatestValue((np.zeros(3), 0))
+        self.__last_acceleration_totals = self.__acceleration_totals.get()
         self.__angular_velocity = np.array([0, 0, 0])
-        self.__angular_velocity_buffer = deque()
+        self.__angular_velocity_totals = LatestValue((np.zeros(3), 0))
+        self.__last_angular_velocity_totals = self.__angular_velocity_totals.get()
+        self.__is_new = False
 
     def __accel_callback(self, data):
-        new_acceleration = np.array(
-            [
-                data.linear_acceleration.x,
-                data.linear_acceleration.y,
-                data.linear_acceleration.z,
-            ]
-        )
-
-        self.__acceleration_buffer.append(new_acceleration)
-        if len(self.__acceleration_buffer) > self.__BUFFER_CAP:
-            self.__acceleration_buffer.popleft()
+        with tracer.span("physics.accel_callback", "ros"):
+            new_acceleration = np.array(
+                [
+                    data.linear_acceleration.x,
+                    data.linear_acceleration.y,
+                    data.linear_acceleration.z,
+                ]
+            )
+            self.__add_measurement(self.__acceleration_totals, new_acceleration, data)
 
     def __gyro_callback(self, data):
-        new_angular_velocity = np.array(
-            [data.angular_velocity.x, data.angular_velocity.y, data.angular_velocity.z]
-        )
-
-        self.__angular_velocity_buffer.append(new_angular_velocity)
-        if len(self.__angular_velocity_buffer) > self.__BUFFER_CAP:
-            self.__angular_velocity_buffer.popleft()
+        with tracer.span("physics.gyro_callback", "ros"):
+            new_angular_velocity = np.array(
+                [
+                    data.angular_velocity.x,
+                    data.angular_velocity.y,
+                    data.angular_velocity.z,
+                ]
+            )
+            self.__add_measurement(
+                self.__angular_velocity_totals, new_angular_velocity, data
+            )
+
+    def __add_measurement(self, totals: LatestValue, measurement, data) -> None:
+        """
+        Adds a measurement to the running totals published for __update.
+        """
+        total, count = totals.get_value()
+        stamp = data.header.stamp
+        timestamp = stamp_to_timestamp(stamp.sec, stamp.nanosec)
+        totals.publish((total + measurement, count + 1), timestamp)
 
     def __update(self):
-        if len(self.__acceleration_buffer) > 0:
-            self.__acceleration = np.mean(self.__acceleration_buffer, axis=0)
-            self.__acceleration_buffer.clear()
-
-        if len(self.__angular_velocity_buffer) > 0:
-            self.__angular_velocity = np.mean(self.__angular_velocity_buffer, axis=0)
-            self.__angular_velocity_buffer.clear()
+        acceleration_totals = self.__acceleration_totals.get()
+        angular_velocity_totals = self.__angular_velocity_totals.get()
+        self.__is_new = False
+
+        # Average the measurements added since the previous frame, if there are any
+        total, count = acceleration_totals.value
+        last_total, last_count = self.__last_acceleration_totals.value
+        if count > last_count:
+            self.__acceleration = (total - last_total) / (count - last_count)
+            self.__is_new = True
+        self.__last_acceleration_totals = acceleration_totals
+
+        total, count = angular_velocity_totals.value
+        last_total, last_count = self.__last_angular_velocity_totals.value
+        if count > last_count:
+            self.__angular_velocity = (total - last_total) / (count - last_count)
+            self.__is_new = True
+        self.__last_angular_velocity_totals = angular_velocity_totals
 
     def get_linear_acceleration(self) -> NDArray[3, np.float32]:
         return np.array(self.__acceleration)
 
     def get_angular_velocity(self) -> NDArray[3, np.float32]:
         return np.array(self.__angular_velocity)
+
+    def has_new_data(self) -> bool:
+        return self.__is_new
+
+    def _get_linear_acceleration_meta(self) -> Tuple[int, int]:
+        totals = self.__last_acceleration_totals
+        return totals.timestamp, totals.sequence
+
+    def _get_angular_velocity_meta(self) -> Tuple[int, int]:
+        totals = self.__last_angular_velocity_totals
+        return totals.timestamp, totals.sequence
@@ -7,12 +7,12 @@ Contains the Racecar class, the top level of the racecar_core library
 """
 
 # General
-from datetime import datetime
 import threading
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 # ROS2
 import rclpy as ros2
+from rclpy.executors import MultiThreadedExecutor
 
 # racecar_core modules
 import camera_real
@@ -22,39 +22,58 @@ import drive_real
 import lidar_real
 import physics_real
 
+from display import Display
+from frame_timer import FrameStats, FrameTimer
 from racecar_core import Racecar
+from scheduler import OverrunPolicy, Scheduler
+from slow_worker import SlowWorker, SlowWorkerStats
+import tracer
 
 
 class RacecarReal(Racecar):
+    # The policies which can be passed to set_overrun_policy
+    OverrunPolicy = OverrunPolicy
+
     # Default number of seconds to wait between calls to update_slow
     __DEFAULT_UPDATE_SLOW_TIME = 1
 
-    # Number of frames per second
-    __FRAME_RATE = 60
+    # Default number of frames per second
+    __DEFAULT_FRAME_RATE = 60
+
+    # The number of threads which run sensor callbacks in multi-threaded mode
+    __NUM_EXECUTOR_THREADS = 4
 
-    def __init__(self, isHeadless: bool = False):
+    def __init__(
+        self,
+        isHeadless: bool = False,
+        isMultithreaded: bool = False,
+        display: Optional[Display] = None,
+    ):
         # initialize ROS 2
         ros2.init()
-        self.__executor = ros2.get_global_executor()
-        self.__rate_node = ros2.create_node("rate_node")
+
+        # In multi-threaded mode, each sensor's callbacks run in their own callback
+        # group, so a slow camera image conversion cannot delay LIDAR or IMU data
+        if isMultithreaded:
+            self.__executor = MultiThreadedExecutor(self.__NUM_EXECUTOR_THREADS)
+        else:
+            self.__executor = ros2.get_global_executor()
 
         # Modules
         self.camera = camera_real.CameraReal()
         self.controller = controller_real.ControllerReal(self)
-        self.display = display_real.DisplayReal(isHeadless)
+        self.display = display or display_real.DisplayReal(isHeadless)
         self.drive = drive_real.DriveReal()
         self.lidar = lidar_real.LidarReal()
         self.physics = physics_real.PhysicsReal()
 
         # Add all nodes to the executor
-        rate_added = self.__executor.add_node(self.__rate_node)
         camera_added = self.__executor.add_node(self.camera.node)
         lidar_added = self.__executor.add_node(self.lidar.node)
         controller_added = self.__executor.add_node(self.controller.node)
         physics_added = self.__executor.add_node(self.physics.node)
-        assert rate_added and lidar_added and camera_added and controller_added, (
+        assert lidar_added and camera_added and controller_added, (
             "Issues initializing Racecar nodes. Node status: \n"
-            f"Rate operational: {rate_added} | "
             f"Camera operational: {camera_added} | "
             f"Lidar operational: {lidar_added} | "
             f"Controller operational: {controller_added} | "
@@ -65,6 +84,7 @@ class RacecarReal(Racecar):
         self.__user_start = None
         self.__user_update = None
         self.__user_update_slow = None
+        self.__slow_worker = None
 
         # True if the main thread should be running
         self.__running = False
@@ -73,10 +93,9 @@ class RacecarReal(Racecar):
         self.__run_thread = None
         self.__cur_update = self.__default_update
         self.__cur_update_slow = None
-        self.__cur_frame_time = datetime.now()
-        self.__last_frame_time = datetime.now()
-        self.__cur_update_counter = 0
-        self.__max_update_counter = 1
+        self.__scheduler = Scheduler(self.__DEFAULT_FRAME_RATE)
+        self.__frame_timer = FrameTimer(self.__DEFAULT_FRAME_RATE)
+        self.__next_update_slow_time = 0
         self.set_update_slow_time(self.__DEFAULT_UPDATE_SLOW_TIME)
 
         # Start run_thread in default drive mode
@@ -108,17 +127,88 @@ class RacecarReal(Racecar):
         self,
         start: Callable[[], None],
         update: Callable[[], None],
-        update_slow: Optional[Callable[[], None]] = None,
+        update_slow: Optional[Callable[..., Any]] = None,
+        update_slow_async: bool = False,
     ) -> None:
+        start, update, update_slow = self._instrument_callbacks(
+            start, update, update_slow
+        )
         self.__user_start = start
         self.__user_update = update
-        self.__user_update_slow = update_slow
+        self.__user_update_slow = None
+        if self.__slow_worker is not None:
+            self.__slow_worker.close()
+        self.__slow_worker = None
+
+        # Run an asynchronous update_slow on its own thread, handing it a snapshot
+        # of the sensors.  Otherwise update_slow runs inline on the frame's thread.
+        if update_slow is not None and update_slow_async:
+            self.__slow_worker = SlowWorker(update_slow)
+            self.__user_update_slow = self.__submit_update_slow
+        else:
+            self.__user_update_slow = update_slow
 
     def get_delta_time(self) -> float:
-        return (self.__cur_frame_time - self.__last_frame_time).total_seconds()
+        return self.__frame_timer.get_delta_time()
+
+    def get_update_slow_result(self) -> Any:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_result()
+
+    def get_update_slow_stats(self) -> Optional[SlowWorkerStats]:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_stats()
+
+    def get_frame_timestamp(self) -> int:
+        return self.__frame_timer.get_frame_timestamp()
+
+    def get_frame_stats(self) -> FrameStats:
+        return self.__frame_timer.get_stats()
 
     def set_update_slow_time(self, time: float = 1.0) -> None:
-        self.__max_update_counter = max(1, round(time * self.__FRAME_RATE))
+        self.__update_slow_time_ns = int(time * 1e9)
+
+    def set_frame_rate(self, frame_rate: int = __DEFAULT_FRAME_RATE) -> None:
+        """
+        Changes the number of times update is called per second.
+
+        Args:
+            frame_rate: The number of frames per second, which must be 30, 60, 100,
+                or 200.
+
+        Note:
+            Only the real car schedules its own frames, so this function does not
+            exist in the simulator or in a replay.
+
+        Example::
+
+            # Run update 100 times per second
+            rc.set_frame_rate(100)
+        """
+        self.__scheduler.set_frame_rate(frame_rate)
+        self.__frame_timer.set_frame_rate(frame_rate)
+
+    def set_overrun_policy(self, policy: OverrunPolicy = OverrunPolicy.skip) -> None:
+        """
+        Changes what happens when a frame takes longer than the time between frames.
+
+        Args:
+            policy: skip to drop the missed frames, catch_up to run the missed frames
+                back to back, or degrade to drop the missed frames and postpone
+                update_slow until frames fit within their budget again.
+
+        Note:
+            Only the real car schedules its own frames, so this function does not
+            exist in the simulator or in a replay.
+
+        Example::
+
+            # Never let update_slow delay a frame which is already running late
+            rc.set_overrun_policy(rc.OverrunPolicy.degrade)
+        """
+        self.__scheduler.set_overrun_policy(policy)
 
     def __handle_start(self):
         """
@@ -133,6 +223,7 @@ class RacecarReal(Racecar):
         else:
             print(">> Entering user program mode")
             self.__user_start()
+            self.__next_update_slow_time = 0
             self.__cur_update = self.__user_update
             self.__cur_update_slow = self.__user_update_slow
 
@@ -156,21 +247,31 @@ class RacecarReal(Racecar):
         """
         Calls the current update and update_modules once per frame.
         """
-        rate = self.__rate_node.create_rate(self.__FRAME_RATE)
         while True:
-            self.__last_frame_time = self.__cur_frame_time
-            self.__cur_frame_time = datetime.now()
+            frame_time = self.__frame_timer.start_frame()
             self.__cur_update()
-            self.__update_modules()
-
-            # Use a counter to decide when we need to call update_slow
-            if self.__cur_update_slow is not None:
-                self.__cur_update_counter -= 1
-                if self.__cur_update_counter <= 0:
-                    self.__cur_update_slow()
-                    self.__cur_update_counter = self.__max_update_counter
-
-            rate.sleep()
+            with tracer.span("update_modules", "racecar"):
+                self.__update_modules()
+
+            # Call update_slow only after the drive command has been published, and
+            # postpone it if the scheduler needs to protect the next frame
+            if (
+                self.__cur_update_slow is not None
+                and frame_time >= self.__next_update_slow_time
+                and self.__scheduler.should_run_update_slow()
+            ):
+                self.__cur_update_slow()
+                self.__next_update_slow_time = frame_time + self.__update_slow_time_ns
+
+            work_time = self.__frame_timer.end_frame()
+            tracer.add_span("frame", "racecar", frame_time, frame_time + work_time)
+            self.__scheduler.wait()
+
+    def __submit_update_slow(self):
+        """
+        Passes a snapshot of the current frame to the update_slow worker thread.
+        """
+        self.__slow_worker.submit(self._take_snapshot())
 
     def __update_modules(self):
         """
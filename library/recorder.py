@@ -0,0 +1,449 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the Recorder class, which logs the racecar's sensor data and drive commands
+to disk every frame, and the Recording class, which reads such a log.
+
+A recording is a directory containing index.json and a series of chunk files for
+each stream.  Each chunk file is a memory-mapped array of fixed-size records, and
+each record holds the frame number (starting at 1, so that 0 marks an unused
+record), the frame timestamp in time.perf_counter_ns units, and the stream's data.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import numpy as np
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import racecar_utils as rc_utils
+import tracer
+
+# The version of the recording format written by Recorder
+FORMAT_VERSION = 1
+
+
+class RecorderStats(NamedTuple):
+    """
+    Summarizes how many frames a Recorder has saved.
+    """
+
+    # The number of frames written to disk
+    num_written: int
+
+    # The number of frames dropped because the writer thread fell behind
+    num_dropped: int
+
+
+class _StreamWriter:
+    """
+    Appends fixed-size records of a single stream to memory-mapped chunk files.
+    """
+
+    # The approximate size of each chunk file in bytes
+    __CHUNK_BYTES = 64 * 1024 * 1024
+
+    def __init__(
+        self, directory: str, name: str, dtype: np.dtype, shape: Tuple[int, ...]
+    ) -> None:
+        self.__directory = directory
+        self.name = name
+        self.data_dtype = np.dtype(dtype)
+        self.shape = shape
+        self.dtype = self.get_record_dtype(dtype, shape)
+        self.chunk_records = max(1, self.__CHUNK_BYTES // self.dtype.itemsize)
+        self.chunks: List[str] = []
+        self.num_records = 0
+        self.__chunk: Optional[np.memmap] = None
+
+    def append(self, frame: int, timestamp: int, data: np.ndarray) -> None:
+        """
+        Writes a record, starting a new chunk file if the current one is full.
+        """
+        index = self.num_records % self.chunk_records
+        if index == 0:
+            self.__start_chunk()
+
+        record = self.__chunk[index]
+        record["frame"] = frame
+        record["timestamp"] = timestamp
+        record["data"] = data
+        self.num_records += 1
+
+    def get_index(self) -> Dict[str, Any]:
+        """
+        Returns the description of the stream stored in index.json.
+        """
+        return {
+            "dtype": self.data_dtype.str,
+            "shape": list(self.shape),
+            "record_size": self.dtype.itemsize,
+            "chunk_records": self.chunk_records,
+            "num_records": self.num_records,
+            "chunks": self.chunks,
+        }
+
+    @staticmethod
+    def get_record_dtype(dtype: np.dtype, shape: Tuple[int, ...]) -> np.dtype:
+        """
+        Returns the data type of a record holding data of the provided type and shape.
+        """
+        return np.dtype(
+            [("frame", np.int64), ("timestamp", np.int64), ("data", dtype, shape)]
+        )
+
+    def close(self) -> None:
+        """
+        Flushes the current chunk file to disk.
+        """
+        if self.__chunk is not None:
+            self.__chunk.flush()
+            self.__chunk = None
+
+    def __start_chunk(self) -> None:
+        """
+        Flushes the current chunk file and creates the next one.
+        """
+        self.close()
+        file_name = f"{self.name}_{len(self.chunks):05d}.bin"
+        self.__chunk = np.memmap(
+            os.path.join(self.__directory, file_name),
+            self.dtype,
+            "w+",
+            shape=(self.chunk_records,),
+        )
+        self.chunks.append(file_name)
+
+
+class Recorder:
+    """
+    Records the racecar's sensor data, controller state, and drive commands each
+    frame on a background thread.
+
+    Note:
+        record() copies the data of the current frame and hands it to the writer
+        thread, so the control loop never waits for the disk.  If the writer falls
+        more than a few frames behind, new frames are dropped instead.
+
+        The index is saved at least once per second while recording, so a recording
+        cut short by a crash can still be read up to the last save.
+    """
+
+    # The number of frames which may wait for the writer thread
+    __QUEUE_SIZE = 8
+
+    # The longest number of seconds between saves of the index while recording
+    __INDEX_INTERVAL = 1.0
+
+    # The number of seconds close waits for the writer thread to finish
+    __CLOSE_TIMEOUT = 5.0
+
+    def __init__(self, racecar, path: str) -> None:
+        """
+        Creates a recording directory at path and starts the writer thread.
+
+        Args:
+            racecar: The Racecar whose data is recorded.
+            path: The directory in which to store the recording.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.__racecar = racecar
+        self.__path = path
+        self.__queue: queue.Queue = queue.Queue(self.__QUEUE_SIZE)
+        self.__streams: Dict[str, _StreamWriter] = {}
+        self.__num_frames: int = 0
+        self.__num_written: int = 0
+        self.__num_dropped: int = 0
+        self.__closed: bool = False
+
+        # Drive does not report the current command, so remember each command sent
+        self.__speed_angle = np.zeros(2, np.float32)
+        set_speed_angle = racecar.drive.set_speed_angle
+
+        def set_and_record_speed_angle(speed: float, angle: float) -> None:
+            set_speed_angle(speed, angle)
+            self.__speed_angle = np.array([speed, angle], np.float32)
+
+        racecar.drive.set_speed_angle = set_and_record_speed_angle
+
+        self.__thread = threading.Thread(target=self.__run, name="recorder")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def record(self) -> None:
+        """
+        Copies the data of the current frame and queues it to be written.
+        """
+        with tracer.span("recorder.record", "racecar"):
+            self.__num_frames += 1
+            frame = (
+                self.__num_frames,
+                self.__racecar.get_frame_timestamp(),
+                self.__get_frame_data(),
+            )
+            try:
+                self.__queue.put_nowait(frame)
+            except queue.Full:
+                self.__num_dropped += 1
+
+    def get_stats(self) -> RecorderStats:
+        """
+        Returns the number of frames written and dropped so far.
+        """
+        return RecorderStats(self.__num_written, self.__num_dropped)
+
+    def get_path(self) -> str:
+        """
+        Returns the directory in which the recording is stored.
+        """
+        return self.__path
+
+    def close(self) -> None:
+        """
+        Writes any queued frames, flushes every chunk file, and saves the index.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+
+        # The writer thread stops after any queued frames, unless it already stopped
+        # because of an error
+        if self.__thread.is_alive():
+            try:
+                self.__queue.put(None, timeout=self.__CLOSE_TIMEOUT)
+            except queue.Full:
+                pass
+            self.__thread.join(self.__CLOSE_TIMEOUT)
+        if self.__thread.is_alive():
+            rc_utils.print_warning(
+                f">> The recorder did not finish writing to {self.__path} within "
+                f"{self.__CLOSE_TIMEOUT} seconds, so its last frames may be missing."
+            )
+            return
+
+        for stream in self.__streams.values():
+            stream.close()
+        self.__write_index()
+        rc_utils.print_colored(
+            f">> Recorded {self.__num_written} frames to {self.__path} "
+            f"({self.__num_dropped} dropped)",
+            rc_utils.TerminalColor.pink,
+        )
+
+    def __get_frame_data(self) -> Dict[str, np.ndarray]:
+        """
+        Returns a copy of the data of each stream in the current frame.
+        """
+        racecar = self.__racecar
+        controller = racecar.controller
+        data = {
+            "color_image": racecar.camera.get_color_image_no_copy(),
+            "depth_image": racecar.camera.get_depth_image(),
+            "lidar": racecar.lidar.get_samples(),
+        }
+        data = {
+            name: np.array(value)
+            for name, value in data.items()
+            if value is not None and np.size(value) > 0
+        }
+
+        data["imu"] = np.concatenate(
+            [
+                racecar.physics.get_linear_acceleration(),
+                racecar.physics.get_angular_velocity(),
+            ]
+        ).astype(np.float32)
+        data["controller"] = np.array(
+            [controller.is_down(button) for button in controller.Button]
+            + [controller.get_trigger(trigger) for trigger in controller.Trigger]
+            + [
+                value
+                for joystick in controller.Joystick
+                for value in controller.get_joystick(joystick)
+            ],
+            np.float32,
+        )
+        data["drive"] = self.__speed_angle
+        return data
+
+    def __run(self) -> None:
+        """
+        Writes queued frames to the chunk files until close is called.
+        """
+        next_index_time = time.perf_counter() + self.__INDEX_INTERVAL
+        while True:
+            frame = self.__queue.get()
+            if frame is None:
+                return
+
+            try:
+                is_new_chunk = self.__write_frame(*frame)
+                if is_new_chunk or time.perf_counter() >= next_index_time:
+                    self.__write_index()
+                    next_index_time = time.perf_counter() + self.__INDEX_INTERVAL
+            except Exception:
+                rc_utils.print_error(
+                    f">> Error writing the recording to {self.__path}, so recording "
+                    "has stopped:\n" + traceback.format_exc()
+                )
+                return
+
+    def __write_frame(self, number: int, timestamp: int, data: Dict) -> bool:
+        """
+        Appends the data of a frame to the stream of each kind of data.
+
+        Returns:
+            True if a new chunk file was started.
+        """
+        is_new_chunk = False
+        for name, value in data.items():
+            stream = self.__streams.get(name)
+            if stream is None:
+                stream = _StreamWriter(self.__path, name, value.dtype, value.shape)
+                self.__streams[name] = stream
+            elif value.shape != stream.shape:
+                continue
+
+            is_new_chunk |= stream.num_records % stream.chunk_records == 0
+            stream.append(number, timestamp, value)
+        self.__num_written += 1
+        return is_new_chunk
+
+    def __write_index(self) -> None:
+        """
+        Saves the description of every stream to index.json.
+
+        Note:
+            The index is written to a temporary file which then replaces index.json,
+            so a crash while saving never leaves a partial index.
+        """
+        index = {
+            "version": FORMAT_VERSION,
+            "num_frames": self.__num_written,
+            "streams": {
+                name: stream.get_index() for name, stream in self.__streams.items()
+            },
+        }
+        path = os.path.join(self.__path, "index.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(index, file, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+class Recording:
+    """
+    Reads a recording made by Recorder without copying the recorded data.
+
+    Example::
+
+        recording = Recording("recordings/2020-07-01_12-00-00")
+
+        # Print the LIDAR samples of the first recorded frame
+        frame = recording.get_frame_numbers()[0]
+        print(recording.get("lidar", frame))
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens the chunk files of every stream in a recording as read-only memory maps.
+
+        Args:
+            path: The directory containing the recording.
+        """
+        with open(os.path.join(path, "index.json")) as file:
+            index = json.load(file)
+        assert (
+            index["version"] == FORMAT_VERSION
+        ), f"The recording at {path} has format version {index['version']}, but only version {FORMAT_VERSION} is supported."
+
+        self.__path = path
+        self.__chunks: Dict[str, List[np.memmap]] = {}
+        self.__frames: Dict[str, np.ndarray] = {}
+        self.__timestamps: Dict[str, np.ndarray] = {}
+        for name, stream in index["streams"].items():
+            dtype = _StreamWriter.get_record_dtype(
+                np.dtype(stream["dtype"]), tuple(stream["shape"])
+            )
+            chunks = [
+                np.memmap(os.path.join(path, file_name), dtype, "r")
+                for file_name in stream["chunks"]
+            ]
+
+            # Records past the end of a stream have a frame number of 0
+            num_records = sum(
+                int(np.count_nonzero(chunk["frame"])) for chunk in chunks
+            )
+            self.__chunks[name] = chunks
+            self.__frames[name] = np.concatenate(
+                [chunk["frame"] for chunk in chunks] or [np.zeros(0, np.int64)]
+            )[:num_records]
+            self.__timestamps[name] = np.concatenate(
+                [chunk["timestamp"] for chunk in chunks] or [np.zeros(0, np.int64)]
+            )[:num_records]
+
+        # Every frame in which at least one stream was written
+        self.__frame_numbers = np.unique(
+            np.concatenate(list(self.__frames.values()) or [np.zeros(0, np.int64)])
+        )
+
+    def get_path(self) -> str:
+        """
+        Returns the directory containing the recording.
+        """
+        return self.__path
+
+    def get_stream_names(self) -> List[str]:
+        """
+        Returns the names of the recorded streams, such as "color_image" and "lidar".
+        """
+        return list(self.__chunks.keys())
+
+    def get_frame_numbers(self) -> np.ndarray:
+        """
+        Returns the number of each recorded frame in increasing order.
+        """
+        return self.__frame_numbers
+
+    def get_timestamp(self, frame: int) -> int:
+        """
+        Returns the recorded timestamp (in time.perf_counter_ns units) of a frame.
+
+        Args:
+            frame: The frame number, which must be a recorded frame.
+        """
+        for name, frames in self.__frames.items():
+            index = int(np.searchsorted(frames, frame))
+            if index < len(frames) and frames[index] == frame:
+                return int(self.__timestamps[name][index])
+        assert False, f"frame ({frame}) was not recorded."
+
+    def get(self, name: str, frame: int) -> Tuple[Optional[np.ndarray], int]:
+        """
+        Returns the most recent data of a stream as of a frame.
+
+        Args:
+            name: The name of the stream.
+            frame: The frame number.
+
+        Returns:
+            A read-only view of the data in the memory-mapped chunk file (or None if
+            the stream was not recorded by that frame), and the frame number in which
+            the data was recorded (or 0).
+        """
+        frames = self.__frames.get(name)
+        if frames is None:
+            return None, 0
+
+        index = int(np.searchsorted(frames, frame, "right")) - 1
+        if index < 0:
+            return None, 0
+
+        chunks = self.__chunks[name]
+        chunk_records = len(chunks[0])
+        data = chunks[index // chunk_records]["data"][index % chunk_records]
+        return data, int(frames[index])
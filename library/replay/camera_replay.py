@@ -0,0 +1,45 @@
+import numpy as np
+from typing import Tuple
+from nptyping import NDArray
+
+from camera import Camera
+
+
+class CameraReplay(Camera):
+    def __init__(self, racecar) -> None:
+        Camera.__init__(self)
+        self.__racecar = racecar
+
+        # The frame in which each image was recorded and the number of images before
+        self.__color_image_frame: Tuple[int, int] = (0, -1)
+        self.__depth_image_frame: Tuple[int, int] = (0, -1)
+
+    def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
+        image, frame = self.__racecar._RacecarReplay__get("color_image")
+        if frame != self.__color_image_frame[0]:
+            self.__color_image_frame = (frame, self.__color_image_frame[1] + 1)
+        return image
+
+    def get_color_image_async(self) -> NDArray[(480, 640, 3), np.uint8]:
+        return self.get_color_image_no_copy()
+
+    def get_depth_image(self) -> NDArray[(480, 640), np.float32]:
+        image, frame = self.__racecar._RacecarReplay__get("depth_image")
+        if frame != self.__depth_image_frame[0]:
+            self.__depth_image_frame = (frame, self.__depth_image_frame[1] + 1)
+        return image
+
+    def get_depth_image_async(self) -> NDArray[(480, 640), np.float32]:
+        return self.get_depth_image()
+
+    def has_new_color_image(self) -> bool:
+        return self.__racecar._RacecarReplay__is_current("color_image")
+
+    def has_new_depth_image(self) -> bool:
+        return self.__racecar._RacecarReplay__is_current("depth_image")
+
+    def _get_color_image_meta(self) -> Tuple[int, int]:
+        return (self.__racecar.get_frame_timestamp(), self.__color_image_frame[1])
+
+    def _get_depth_image_meta(self) -> Tuple[int, int]:
+        return (self.__racecar.get_frame_timestamp(), self.__depth_image_frame[1])
@@ -0,0 +1,43 @@
+import numpy as np
+from typing import Tuple
+from nptyping import NDArray
+
+from controller import Controller
+
+
+class ControllerReplay(Controller):
+    # The recorder stores whether each button is down, followed by the value of each
+    # trigger, followed by the x and y values of each joystick
+    __TRIGGER_OFFSET: int = len(Controller.Button)
+    __JOYSTICK_OFFSET: int = __TRIGGER_OFFSET + len(Controller.Trigger)
+    __STATE_SIZE: int = __JOYSTICK_OFFSET + 2 * len(Controller.Joystick)
+
+    def __init__(self, racecar) -> None:
+        self.__racecar = racecar
+        self.__last_state: NDArray[14, np.float32] = np.zeros(
+            self.__STATE_SIZE, np.float32
+        )
+
+    def is_down(self, button: Controller.Button) -> bool:
+        return bool(self.__get_state()[button.value])
+
+    def was_pressed(self, button: Controller.Button) -> bool:
+        return self.is_down(button) and not self.__last_state[button.value]
+
+    def was_released(self, button: Controller.Button) -> bool:
+        return not self.is_down(button) and bool(self.__last_state[button.value])
+
+    def get_trigger(self, trigger: Controller.Trigger) -> float:
+        return float(self.__get_state()[self.__TRIGGER_OFFSET + trigger.value])
+
+    def get_joystick(self, joystick: Controller.Joystick) -> Tuple[float, float]:
+        index = self.__JOYSTICK_OFFSET + 2 * joystick.value
+        state = self.__get_state()
+        return (float(state[index]), float(state[index + 1]))
+
+    def __get_state(self) -> NDArray[14, np.float32]:
+        state, _ = self.__racecar._RacecarReplay__get("controller")
+        return self.__last_state if state is None else state
+
+    def __update(self) -> None:
+        self.__last_state = self.__get_state()
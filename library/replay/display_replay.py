@@ -0,0 +1,23 @@
+import cv2 as cv
+from nptyping import NDArray
+
+import copy_on_write
+from display import Display
+from display_worker import DisplayWorker
+
+
+class DisplayReplay(Display):
+    __WINDOW_NAME: str = "Replay display window"
+
+    def __init__(self, isHeadless) -> None:
+        Display.__init__(self, isHeadless)
+        if not isHeadless:
+            self._worker = DisplayWorker(self.__WINDOW_NAME, cv.WINDOW_NORMAL)
+
+    def create_window(self) -> None:
+        if not self._Display__isHeadless:
+            self._worker.create_window()
+
+    def show_color_image(self, image: NDArray) -> None:
+        if not self._Display__isHeadless:
+            self._worker.show(copy_on_write.resolve_image(image))
@@ -0,0 +1,26 @@
+from typing import Tuple
+
+from drive import Drive
+
+
+class DriveReplay(Drive):
+    def __init__(self) -> None:
+        self.__speed_angle: Tuple[float, float] = (0.0, 0.0)
+
+    def set_speed_angle(self, speed: float, angle: float) -> None:
+        assert (
+            -1.0 <= speed <= 1.0
+        ), f"speed [{speed}] must be between -1.0 and 1.0 inclusive."
+        assert (
+            -1.0 <= angle <= 1.0
+        ), f"angle [{angle}] must be between -1.0 and 1.0 inclusive."
+
+        self.__speed_angle = (speed, angle)
+
+    def set_max_speed(self, max_speed: float = 0.25) -> None:
+        assert (
+            0.0 <= max_speed <= 1.0
+        ), f"max_speed [{max_speed}] must be between 0.0 and 1.0 inclusive."
+
+    def __get_speed_angle(self) -> Tuple[float, float]:
+        return self.__speed_angle
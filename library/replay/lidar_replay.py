@@ -0,0 +1,33 @@
+import numpy as np
+from typing import Tuple
+from nptyping import NDArray
+
+from lidar import Lidar
+
+
+class LidarReplay(Lidar):
+    def __init__(self, racecar) -> None:
+        Lidar.__init__(self)
+        self.__racecar = racecar
+
+        # The frame in which the scan was recorded and the number of scans before
+        self.__frame: Tuple[int, int] = (-1, -1)
+
+    def get_samples(self) -> NDArray[720, np.float32]:
+        samples, frame = self.__racecar._RacecarReplay__get("lidar")
+        if samples is None:
+            return np.zeros(0, np.float32)
+
+        if frame != self.__frame[0]:
+            self.__frame = (frame, self.__frame[1] + 1)
+            self._record_samples(samples, self.__racecar.get_frame_timestamp())
+        return samples
+
+    def get_samples_async(self) -> NDArray[720, np.float32]:
+        return self.get_samples()
+
+    def has_new_samples(self) -> bool:
+        return self.__racecar._RacecarReplay__is_current("lidar")
+
+    def _get_samples_meta(self) -> Tuple[int, int]:
+        return (self.__racecar.get_frame_timestamp(), self.__frame[1])
@@ -0,0 +1,42 @@
+import numpy as np
+from typing import Tuple
+from nptyping import NDArray
+
+from physics import Physics
+
+
+class PhysicsReplay(Physics):
+    def __init__(self, racecar) -> None:
+        Physics.__init__(self)
+        self.__racecar = racecar
+
+        # The frame in which the values were recorded and the number of values before
+        self.__frame: Tuple[int, int] = (0, -1)
+
+    def get_linear_acceleration(self) -> NDArray[3, np.float32]:
+        return np.array(self.__get_imu()[:3])
+
+    def get_angular_velocity(self) -> NDArray[3, np.float32]:
+        return np.array(self.__get_imu()[3:])
+
+    def has_new_data(self) -> bool:
+        return self.__racecar._RacecarReplay__is_current("imu")
+
+    def _get_linear_acceleration_meta(self) -> Tuple[int, int]:
+        return self.__get_meta()
+
+    def _get_angular_velocity_meta(self) -> Tuple[int, int]:
+        return self.__get_meta()
+
+    def __get_imu(self) -> NDArray[6, np.float32]:
+        # The recorder stores the linear acceleration followed by the angular velocity
+        imu, frame = self.__racecar._RacecarReplay__get("imu")
+        if imu is None:
+            return np.zeros(6, np.float32)
+
+        if frame != self.__frame[0]:
+            self.__frame = (frame, self.__frame[1] + 1)
+        return imu
+
+    def __get_meta(self) -> Tuple[int, int]:
+        return (self.__racecar.get_frame_timestamp(), self.__frame[1])
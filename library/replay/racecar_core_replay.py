@@ -0,0 +1,262 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Plays back a recording made with the -r flag through the racecar_core interface.
+"""
+
+import time
+import numpy as np
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+import camera_replay
+import controller_replay
+import display_replay
+import drive_replay
+import lidar_replay
+import physics_replay
+
+from display import Display
+from frame_timer import FrameStats, FrameTimer
+from racecar_core import Racecar
+from recorder import Recording
+from slow_worker import SlowWorker, SlowWorkerStats
+import racecar_utils as rc_utils
+import tracer
+
+
+class ReplayStats(NamedTuple):
+    """
+    Summarizes a replay of a recording.
+    """
+
+    # The number of frames played back so far
+    num_frames: int
+
+    # The number of seconds the replay took and the number of seconds it recorded
+    wall_time: float
+    recorded_time: float
+
+    # The number of frames in which the drive command differed from the recording,
+    # and the largest difference in speed or angle
+    num_drive_mismatches: int
+    max_drive_difference: float
+
+
+class RacecarReplay(Racecar):
+    # The delta time of the first frame, which has no previous frame to compare to
+    __DEFAULT_DELTA_TIME = 1 / 60
+
+    # The largest difference in speed or angle considered a matching drive command
+    __DRIVE_TOLERANCE = 1e-3
+
+    def __init__(
+        self,
+        path: str,
+        isHeadless: bool = False,
+        speedup: float = 0,
+        display: Optional[Display] = None,
+    ) -> None:
+        """
+        Opens a recording to play back.
+
+        Args:
+            path: The directory containing the recording.
+            isHeadless: If True, the display module does not open a window.
+            speedup: How many times faster than it was recorded to play the recording,
+                or 0 to play it as fast as possible.
+            display: The display to use instead of a window, such as a stream.
+        """
+        assert speedup >= 0, f"speedup ({speedup}) must be non-negative."
+
+        self.camera = camera_replay.CameraReplay(self)
+        self.controller = controller_replay.ControllerReplay(self)
+        self.display = display or display_replay.DisplayReplay(isHeadless)
+        self.drive = drive_replay.DriveReplay()
+        self.physics = physics_replay.PhysicsReplay(self)
+        self.lidar = lidar_replay.LidarReplay(self)
+
+        self.__recording = Recording(path)
+        self.__frame_numbers = self.__recording.get_frame_numbers()
+        self.__timestamps = np.array(
+            [self.__recording.get_timestamp(frame) for frame in self.__frame_numbers],
+            np.int64,
+        )
+        self.__speedup: float = speedup
+
+        self.__start: Callable[[], None]
+        self.__update: Callable[[], None]
+        self.__update_slow: Optional[Callable[[], None]]
+        self.__slow_worker: Optional[SlowWorker] = None
+        self.__update_slow_time: float = 1
+        self.__update_slow_counter: float = 0
+        self.__frame_timer = FrameTimer()
+
+        # The position in the recording and the data already looked up this frame
+        self.__index: int = 0
+        self.__cache: Dict[str, Tuple[Optional[np.ndarray], int]] = {}
+
+        self.__wall_time: float = 0
+        self.__num_drive_mismatches: int = 0
+        self.__max_drive_difference: float = 0
+
+    def go(self) -> None:
+        num_frames = len(self.__frame_numbers)
+        if num_frames == 0:
+            rc_utils.print_error(
+                f">> The recording at {self.__recording.get_path()} contains no frames."
+            )
+            return
+
+        speed = f"{self.__speedup}x" if self.__speedup > 0 else "full"
+        print(
+            f">> Replaying {num_frames} frames from {self.__recording.get_path()} "
+            f"at {speed} speed..."
+        )
+
+        start_time = time.perf_counter_ns()
+        self.__index = 0
+        self.__cache.clear()
+        self.set_update_slow_time()
+        self.__start()
+
+        for index in range(num_frames):
+            self.__index = index
+            self.__cache.clear()
+            if self.__speedup > 0:
+                recorded_time = self.__timestamps[index] - self.__timestamps[0]
+                wait = start_time + recorded_time / self.__speedup
+                wait -= time.perf_counter_ns()
+                if wait > 0:
+                    time.sleep(wait / 1e9)
+            self.__handle_update()
+
+        self.__wall_time = (time.perf_counter_ns() - start_time) / 1e9
+        stats = self.get_replay_stats()
+        rc_utils.print_colored(
+            f">> Replayed {stats.num_frames} frames ({stats.recorded_time:.2f} s "
+            f"recorded) in {stats.wall_time:.2f} s, with "
+            f"{stats.num_drive_mismatches} drive commands differing from the "
+            f"recording (max difference {stats.max_drive_difference:.3f}).",
+            rc_utils.TerminalColor.green,
+        )
+
+    def set_start_update(
+        self,
+        start: Callable[[], None],
+        update: Callable[[], None],
+        update_slow: Optional[Callable[..., Any]] = None,
+        update_slow_async: bool = False,
+    ) -> None:
+        start, update, update_slow = self._instrument_callbacks(
+            start, update, update_slow
+        )
+        self.__start = start
+        self.__update = update
+        self.__update_slow = update_slow
+        if self.__slow_worker is not None:
+            self.__slow_worker.close()
+        self.__slow_worker = None
+
+        # Run update_slow on its own thread, handing it a snapshot of the sensors
+        if update_slow is not None and update_slow_async:
+            self.__slow_worker = SlowWorker(update_slow)
+            self.__update_slow = self.__submit_update_slow
+
+    def get_delta_time(self) -> float:
+        # Report the recorded frame times so that the program behaves as it did live
+        if self.__index == 0:
+            return self.__DEFAULT_DELTA_TIME
+        timestamps = self.__timestamps
+        return (timestamps[self.__index] - timestamps[self.__index - 1]) / 1e9
+
+    def get_update_slow_result(self) -> Any:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_result()
+
+    def get_update_slow_stats(self) -> Optional[SlowWorkerStats]:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_stats()
+
+    def get_frame_timestamp(self) -> int:
+        return self.__frame_timer.get_frame_timestamp()
+
+    def get_frame_stats(self) -> FrameStats:
+        return self.__frame_timer.get_stats()
+
+    def set_update_slow_time(self, update_slow_time: float = 1.0) -> None:
+        self.__update_slow_time = update_slow_time
+
+    def get_replay_stats(self) -> ReplayStats:
+        """
+        Returns how long the replay took and how closely its drive commands matched
+        the recording.
+
+        Note:
+            This method is only available when replaying a recording.
+        """
+        num_frames = min(self.__index + 1, len(self.__frame_numbers))
+        recorded_time = 0.0
+        if num_frames > 0:
+            recorded_time = (
+                self.__timestamps[num_frames - 1] - self.__timestamps[0]
+            ) / 1e9
+        return ReplayStats(
+            num_frames=num_frames,
+            wall_time=self.__wall_time,
+            recorded_time=recorded_time,
+            num_drive_mismatches=self.__num_drive_mismatches,
+            max_drive_difference=self.__max_drive_difference,
+        )
+
+    def __get(self, name: str) -> Tuple[Optional[np.ndarray], int]:
+        """
+        Returns the most recent data of a stream as of the current frame, and the
+        frame in which it was recorded.
+        """
+        value = self.__cache.get(name)
+        if value is None:
+            value = self.__recording.get(name, self.__frame_numbers[self.__index])
+            self.__cache[name] = value
+        return value
+
+    def __is_current(self, name: str) -> bool:
+        """
+        Returns whether a stream was recorded in the current frame.
+        """
+        return self.__get(name)[1] == self.__frame_numbers[self.__index]
+
+    def __handle_update(self) -> None:
+        frame_time = self.__frame_timer.start_frame()
+        self.__update()
+
+        if self.__update_slow is not None:
+            self.__update_slow_counter -= self.get_delta_time()
+            if self.__update_slow_counter < 0:
+                self.__update_slow()
+                self.__update_slow_counter = self.__update_slow_time
+
+        self.__compare_drive()
+        self.controller._ControllerReplay__update()
+        work_time = self.__frame_timer.end_frame()
+        tracer.add_span("frame", "racecar", frame_time, frame_time + work_time)
+
+    def __compare_drive(self) -> None:
+        """
+        Compares the drive command chosen this frame with the recorded command.
+        """
+        if not self.__is_current("drive"):
+            return
+
+        recorded, _ = self.__get("drive")
+        speed_angle = self.drive._DriveReplay__get_speed_angle()
+        difference = float(np.max(np.abs(np.subtract(speed_angle, recorded))))
+        self.__max_drive_difference = max(self.__max_drive_difference, difference)
+        if difference > self.__DRIVE_TOLERANCE:
+            self.__num_drive_mismatches += 1
+
+    def __submit_update_slow(self) -> None:
+        self.__slow_worker.submit(self._take_snapshot())
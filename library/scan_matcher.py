@@ -0,0 +1,372 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the ScanMatcher class, which estimates the motion of the car from LIDAR.
+"""
+
+import math
+import time
+import cv2 as cv
+import numpy as np
+from typing import Any, Optional, Tuple
+from nptyping import NDArray
+
+
+class ScanMatcher:
+    """
+    Tracks the pose of the car by aligning each LIDAR scan with the previous scan
+    using the point-to-line iterative closest point (ICP) algorithm.
+
+    Correspondences are found with a lookup grid built once per scan, so each ICP
+    iteration costs a constant amount of work per point.
+    """
+
+    # The largest number of points from each scan used for matching
+    __MAX_POINTS = 360
+
+    # The largest distance between the neighbors of a reference point, as a fraction
+    # of its range, for which the point is considered part of a smooth surface
+    __MAX_NEIGHBOR_GAP = 0.1
+
+    # The change in the estimate (in cm and degrees) below which ICP has converged
+    __CONVERGED_TRANSLATION = 0.05
+    __CONVERGED_ROTATION = 0.01
+
+    def __init__(
+        self,
+        time_budget: float = 0.005,
+        max_iterations: int = 20,
+        resolution: float = 5.0,
+        max_range: float = 800,
+        max_correspondence_distance: float = 25,
+    ) -> None:
+        """
+        Creates a scan matcher with the car at the origin.
+
+        Args:
+            time_budget: The maximum number of seconds each update may spend
+                matching; once it is exceeded, the best estimate so far is used.
+            max_iterations: The maximum number of ICP iterations per update.
+            resolution: The width (in cm) of each cell in the correspondence
+                lookup grid.
+            max_range: The farthest LIDAR measurement (in cm) used for matching.
+            max_correspondence_distance: Points farther than this distance (in cm)
+                from every point in the previous scan are ignored.
+
+        Example::
+
+            # Allow scan matching to use at most 3 ms per frame
+            matcher = ScanMatcher(0.003)
+        """
+        assert time_budget > 0, f"time_budget ({time_budget}) must be positive."
+        assert (
+            max_iterations > 0
+        ), f"max_iterations ({max_iterations}) must be a positive integer."
+        assert resolution > 0, f"resolution ({resolution}) must be positive."
+        assert max_range > 0, f"max_range ({max_range}) must be positive."
+
+        self.__time_budget_ns: int = int(time_budget * 1e9)
+        self.__max_iterations: int = max_iterations
+        self.__resolution: float = resolution
+        self.__max_range: float = max_range
+        self.__max_correspondence: float = max_correspondence_distance / resolution
+
+        # The lookup grid covers every point within max_range of the car
+        self.__grid_size: int = 2 * int(math.ceil(max_range / resolution)) + 1
+        self.__mask: NDArray[(Any, Any), np.uint8] = np.ones(
+            (self.__grid_size, self.__grid_size), np.uint8
+        )
+
+        self.__reset_state()
+
+    def update(
+        self, scan: NDArray[Any, np.float32], delta_heading_guess: float = 0.0
+    ) -> Tuple[float, Tuple[float, float]]:
+        """
+        Estimates how far the car moved since the previous scan.
+
+        Args:
+            scan: The samples from the current LIDAR scan.
+            delta_heading_guess: An initial estimate of the number of degrees the
+                car turned clockwise since the previous scan, such as one integrated
+                from the IMU.
+
+        Returns:
+            The number of degrees the car turned clockwise, and the distance (in cm)
+            it moved expressed as (right, forward) relative to its new heading.
+
+        Note:
+            Ignores any samples with a value of 0.0 (no data).  The first call only
+            stores the scan and reports no motion.
+
+        Example::
+
+            matcher = ScanMatcher()
+            grid = OccupancyGrid()
+
+            def update():
+                scan = rc.lidar.get_samples()
+                delta_heading, delta_position = matcher.update(scan)
+                grid.update(scan, delta_heading, delta_position)
+        """
+        start_time = time.perf_counter_ns()
+        points = self.__scan_to_points(scan)
+
+        delta_heading = 0.0
+        delta_position = (0.0, 0.0)
+        if self.__reference_points is not None and len(points) > 0:
+            rotation, translation = self.__match(
+                points, -math.radians(delta_heading_guess), start_time
+            )
+
+            # Express the translation along the axes of the car's new heading
+            cos, sin = math.cos(rotation), math.sin(rotation)
+            delta_heading = -math.degrees(rotation)
+            delta_position = (
+                cos * translation[0] + sin * translation[1],
+                -sin * translation[0] + cos * translation[1],
+            )
+            self.__update_pose(translation)
+            self.__pose = (
+                self.__pose[0],
+                self.__pose[1],
+                (self.__pose[2] + delta_heading) % 360,
+            )
+
+        if len(points) > 0:
+            self.__build_lookup(points)
+
+        self.__last_duration_ns = time.perf_counter_ns() - start_time
+        return delta_heading, delta_position
+
+    def get_pose(self) -> Tuple[float, float, float]:
+        """
+        Returns the position and heading of the car relative to its first scan.
+
+        Returns:
+            The (x, y, heading) of the car, where x is the distance (in cm) to the
+            right of the start, y is the distance (in cm) forward of the start, and
+            heading is the number of degrees the car has turned clockwise.
+
+        Example::
+
+            x, y, heading = matcher.get_pose()
+            print(f"The car is {math.hypot(x, y):.1f} cm from where it started")
+        """
+        return self.__pose
+
+    def get_fit_error(self) -> float:
+        """
+        Returns the average distance (in cm) between matched points in the last update.
+
+        Note:
+            A large fit error suggests that the last estimate is unreliable, for
+            example because the scans contain little structure.
+        """
+        return self.__fit_error
+
+    def get_last_duration(self) -> float:
+        """
+        Returns the number of seconds spent in the last call to update.
+        """
+        return self.__last_duration_ns / 1e9
+
+    def reset(self) -> None:
+        """
+        Forgets the previous scan and moves the car back to the origin.
+        """
+        self.__reset_state()
+
+    def __reset_state(self) -> None:
+        """
+        Clears the reference scan and pose.
+        """
+        self.__pose: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+        self.__fit_error: float = 0.0
+        self.__last_duration_ns: int = 0
+        self.__reference_points: Optional[NDArray[(Any, 2), np.float32]] = None
+        self.__reference_normals: Optional[NDArray[(Any, 2), np.float32]] = None
+        self.__distances: Optional[NDArray[(Any, Any), np.float32]] = None
+        self.__labels: Optional[NDArray[(Any, Any), np.int32]] = None
+
+    def __scan_to_points(
+        self, scan: NDArray[Any, np.float32]
+    ) -> NDArray[(Any, 2), np.float32]:
+        """
+        Converts the usable samples of a scan into (right, forward) points in cm.
+        """
+        step = max(1, len(scan) // self.__MAX_POINTS)
+        indices = np.arange(0, len(scan), step)
+        distances = scan[indices]
+        valid = (distances > 0) & (distances < self.__max_range)
+        angles = np.radians(indices[valid] * 360 / len(scan))
+        distances = distances[valid]
+        return np.stack(
+            (distances * np.sin(angles), distances * np.cos(angles)), axis=1
+        ).astype(np.float32)
+
+    def __to_cells(
+        self, points: NDArray[(Any, 2), np.float32]
+    ) -> Tuple[NDArray[Any, np.int32], NDArray[Any, np.int32]]:
+        """
+        Converts (right, forward) points into (row, column) cells of the lookup grid.
+        """
+        center = self.__grid_size // 2
+        rows = np.rint(center - points[:, 1] / self.__resolution).astype(np.int32)
+        cols = np.rint(center + points[:, 0] / self.__resolution).astype(np.int32)
+        return rows, cols
+
+    def __build_lookup(self, points: NDArray[(Any, 2), np.float32]) -> None:
+        """
+        Stores a scan as the reference for the next update, along with the grid used
+        to find the closest reference point to any location.
+        """
+        # Estimate the direction of the surface at each point from its neighbors
+        tangents = np.roll(points, -1, axis=0) - np.roll(points, 1, axis=0)
+        normals = np.stack((-tangents[:, 1], tangents[:, 0]), axis=1)
+        normals /= np.maximum(np.linalg.norm(normals, axis=1), 1e-6)[:, np.newaxis]
+
+        # Points next to a jump in range (such as the edge of an obstacle) have no
+        # reliable surface direction, so they are left out of the reference
+        smooth = np.linalg.norm(tangents, axis=1) < self.__MAX_NEIGHBOR_GAP * (
+            np.linalg.norm(points, axis=1)
+        )
+        points, normals = points[smooth], normals[smooth]
+
+        rows, cols = self.__to_cells(points)
+        in_grid = (
+            (0 <= rows)
+            & (rows < self.__grid_size)
+            & (0 <= cols)
+            & (cols < self.__grid_size)
+        )
+        rows, cols = rows[in_grid], cols[in_grid]
+        points, normals = points[in_grid], normals[in_grid]
+
+        self.__mask.fill(1)
+        self.__mask[rows, cols] = 0
+        self.__distances, self.__labels = cv.distanceTransformWithLabels(
+            self.__mask, cv.DIST_L2, cv.DIST_MASK_5, labelType=cv.DIST_LABEL_PIXEL
+        )
+
+        # Each occupied cell receives a label in row-major order, so average the
+        # points and normals in each cell to look them up by label
+        cells = rows * self.__grid_size + cols
+        _, cell_index = np.unique(cells, return_inverse=True)
+        counts = np.bincount(cell_index)
+        self.__reference_points = np.stack(
+            (
+                np.bincount(cell_index, points[:, 0]) / counts,
+                np.bincount(cell_index, points[:, 1]) / counts,
+            ),
+            axis=1,
+        )
+        cell_normals = np.stack(
+            (
+                np.bincount(cell_index, normals[:, 0]),
+                np.bincount(cell_index, normals[:, 1]),
+            ),
+            axis=1,
+        )
+        cell_normals /= np.maximum(np.linalg.norm(cell_normals, axis=1), 1e-6)[
+            :, np.newaxis
+        ]
+        self.__reference_normals = cell_normals
+
+    def __match(
+        self,
+        points: NDArray[(Any, 2), np.float32],
+        rotation: float,
+        start_time: int,
+    ) -> Tuple[float, NDArray[2, np.float64]]:
+        """
+        Finds the rigid transform which aligns points with the reference scan.
+
+        Args:
+            points: The points of the current scan.
+            rotation: The initial counterclockwise rotation estimate in radians.
+            start_time: The perf_counter_ns time at which the update began.
+
+        Returns:
+            The counterclockwise rotation (in radians) and translation (in cm) which
+            map the current scan onto the reference scan.
+        """
+        translation = np.zeros(2)
+        for _ in range(self.__max_iterations):
+            cos, sin = math.cos(rotation), math.sin(rotation)
+            moved = points @ np.array([[cos, sin], [-sin, cos]]) + translation
+
+            # Find the closest reference point to each moved point
+            rows, cols = self.__to_cells(moved)
+            in_grid = (
+                (0 <= rows)
+                & (rows < self.__grid_size)
+                & (0 <= cols)
+                & (cols < self.__grid_size)
+            )
+            rows, cols = rows[in_grid], cols[in_grid]
+            close = self.__distances[rows, cols] <= self.__max_correspondence
+            if np.count_nonzero(close) < 3:
+                break
+
+            source = moved[in_grid][close]
+            labels = self.__labels[rows[close], cols[close]] - 1
+            target = self.__reference_points[labels]
+            normals = self.__reference_normals[labels]
+            offsets = np.sum((target - source) * normals, axis=1)
+            self.__fit_error = float(np.mean(np.abs(offsets)))
+
+            # Solve the linearized least squares problem which minimizes the distance
+            # from each point to the line through its correspondence:
+            # [n_x, n_y, p x n] . [t_x, t_y, rotation] = (q - p) . n
+            jacobian = np.stack(
+                (
+                    normals[:, 0],
+                    normals[:, 1],
+                    source[:, 0] * normals[:, 1] - source[:, 1] * normals[:, 0],
+                ),
+                axis=1,
+            )
+            try:
+                step = np.linalg.solve(jacobian.T @ jacobian, jacobian.T @ offsets)
+            except np.linalg.LinAlgError:
+                break
+            step_translation = step[:2]
+            step_rotation = float(step[2])
+
+            # Compose the step with the current estimate
+            cos, sin = math.cos(step_rotation), math.sin(step_rotation)
+            rotation += step_rotation
+            translation = (
+                np.array(
+                    [
+                        cos * translation[0] - sin * translation[1],
+                        sin * translation[0] + cos * translation[1],
+                    ]
+                )
+                + step_translation
+            )
+
+            if (
+                np.hypot(*step_translation) < self.__CONVERGED_TRANSLATION
+                and abs(math.degrees(step_rotation)) < self.__CONVERGED_ROTATION
+            ) or time.perf_counter_ns() - start_time > self.__time_budget_ns:
+                break
+
+        return rotation, translation
+
+    def __update_pose(self, translation: NDArray[2, np.float64]) -> None:
+        """
+        Moves the pose by a translation expressed in the previous car frame.
+        """
+        x, y, heading = self.__pose
+        heading_rad = math.radians(heading)
+        x += translation[0] * math.cos(heading_rad) + translation[1] * math.sin(
+            heading_rad
+        )
+        y += -translation[0] * math.sin(heading_rad) + translation[1] * math.cos(
+            heading_rad
+        )
+        self.__pose = (x, y, heading)
@@ -0,0 +1,123 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the Scheduler class, which paces the racecar's frames.
+"""
+
+import time
+from enum import IntEnum
+
+
+class OverrunPolicy(IntEnum):
+    """
+    What the scheduler does when a frame runs past the start of the next frame.
+    """
+
+    # Drop the missed frames and start the next frame immediately
+    skip = 0
+
+    # Run the missed frames back to back until the schedule is caught up
+    catch_up = 1
+
+    # Drop the missed frames, and postpone update_slow until frames fit again
+    degrade = 2
+
+
+class Scheduler:
+    """
+    Starts frames on a fixed schedule of deadlines measured with a monotonic clock.
+
+    Unlike sleeping for a fixed period after each frame, the deadlines do not drift
+    when frames take a varying amount of time.
+    """
+
+    # The frame rates which the scheduler supports
+    SUPPORTED_FRAME_RATES = (30, 60, 100, 200)
+
+    # The most frames the catch_up policy will run back to back before giving up
+    __MAX_CATCH_UP_FRAMES = 5
+
+    def __init__(
+        self, frame_rate: int = 60, policy: OverrunPolicy = OverrunPolicy.skip
+    ) -> None:
+        self.__policy: OverrunPolicy = policy
+        self.__num_missed: int = 0
+        self.__is_overrunning: bool = False
+        self.set_frame_rate(frame_rate)
+
+    def set_frame_rate(self, frame_rate: int) -> None:
+        """
+        Changes the number of frames per second, starting the schedule over.
+
+        Args:
+            frame_rate: One of the SUPPORTED_FRAME_RATES.
+        """
+        assert (
+            frame_rate in self.SUPPORTED_FRAME_RATES
+        ), f"frame_rate ({frame_rate}) must be one of {self.SUPPORTED_FRAME_RATES}."
+
+        self.__frame_rate: int = frame_rate
+        self.__period_ns: int = 1_000_000_000 // frame_rate
+        self.__next_deadline: int = time.perf_counter_ns() + self.__period_ns
+
+    def get_frame_rate(self) -> int:
+        """
+        Returns the number of frames per second.
+        """
+        return self.__frame_rate
+
+    def set_overrun_policy(self, policy: OverrunPolicy) -> None:
+        """
+        Changes what happens when a frame runs past the start of the next frame.
+        """
+        self.__policy = policy
+
+    def get_overrun_policy(self) -> OverrunPolicy:
+        """
+        Returns what happens when a frame runs past the start of the next frame.
+        """
+        return self.__policy
+
+    def get_num_missed(self) -> int:
+        """
+        Returns the total number of frames dropped by the skip and degrade policies.
+        """
+        return self.__num_missed
+
+    def is_overrunning(self) -> bool:
+        """
+        Returns True if the previous frame ran past the start of the next frame.
+        """
+        return self.__is_overrunning
+
+    def should_run_update_slow(self) -> bool:
+        """
+        Returns False if update_slow should be postponed to protect the schedule.
+        """
+        return not (self.__is_overrunning and self.__policy == OverrunPolicy.degrade)
+
+    def wait(self) -> None:
+        """
+        Blocks until the start of the next frame.
+        """
+        now = time.perf_counter_ns()
+        if now < self.__next_deadline:
+            self.__is_overrunning = False
+            time.sleep((self.__next_deadline - now) / 1e9)
+            self.__next_deadline += self.__period_ns
+            return
+
+        # The frame ran past the deadline, so start the next frame immediately
+        self.__is_overrunning = True
+        behind = (now - self.__next_deadline) // self.__period_ns + 1
+        if (
+            self.__policy == OverrunPolicy.catch_up
+            and behind <= self.__MAX_CATCH_UP_FRAMES
+        ):
+            self.__next_deadline += self.__period_ns
+        else:
+            # Every deadline which passed after the late frame's deadline is dropped
+            self.__num_missed += behind - 1
+            self.__next_deadline += behind * self.__period_ns
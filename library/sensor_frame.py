@@ -0,0 +1,150 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the SensorFrame and LatencyHistogram classes, which describe when sensor
+data was captured and how old it was when it was used.
+"""
+
+import time
+import numpy as np
+from typing import Any, NamedTuple, Optional, Tuple
+from nptyping import NDArray
+
+
+class SensorFrame(NamedTuple):
+    """
+    A sensor reading along with when it was captured.
+    """
+
+    data: Any
+
+    # The monotonic timestamp (in nanoseconds) at which the data was captured,
+    # measured with the same clock as rc.get_frame_timestamp()
+    timestamp: int
+
+    # The number of readings the sensor produced before this one
+    sequence: int
+
+
+class LatencyStats(NamedTuple):
+    """
+    Summarizes the ages (in seconds) of the sensor readings recorded in a histogram.
+    """
+
+    num_samples: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+
+class LatencyHistogram:
+    """
+    Counts how old sensor readings were when they were used, in logarithmically
+    spaced bins from 0.1 ms to 10 s.
+    """
+
+    # The edges (in nanoseconds) of the histogram bins, where the last bin also
+    # holds every age beyond the last edge
+    BIN_EDGES: NDArray[Any, np.int64] = np.logspace(5, 10, 51).astype(np.int64)
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def record_frame(self, frame: SensorFrame) -> None:
+        """
+        Records the age of a sensor frame, unless the same frame was already recorded.
+        """
+        if frame.sequence < 0 or frame.sequence == self.__last_sequence:
+            return
+        self.__last_sequence = frame.sequence
+        self.record(frame.timestamp)
+
+    def record(self, timestamp: int, now: Optional[int] = None) -> None:
+        """
+        Records the age of a reading.
+
+        Args:
+            timestamp: The time (in time.perf_counter_ns units) the reading was
+                captured.
+            now: The time at which the reading was used, or None for the current time.
+        """
+        if now is None:
+            now = time.perf_counter_ns()
+        age = max(now - timestamp, 0)
+        index = np.searchsorted(self.BIN_EDGES, age, "right") - 1
+        self.__counts[min(max(index, 0), len(self.__counts) - 1)] += 1
+        self.__num_samples += 1
+        self.__total_age += age
+        self.__max_age = max(self.__max_age, age)
+
+    def get_counts(self) -> Tuple[NDArray[Any, np.float64], NDArray[Any, np.int64]]:
+        """
+        Returns the edges of each bin in seconds and the number of ages in each bin.
+        """
+        return self.BIN_EDGES[:-1] / 1e9, self.__counts.copy()
+
+    def get_stats(self) -> LatencyStats:
+        """
+        Returns the mean, approximate percentiles, and maximum of the recorded ages.
+
+        Note:
+            Percentiles are interpolated within a bin, so they are accurate to within
+            about a quarter of the bin's age.
+        """
+        if self.__num_samples == 0:
+            return LatencyStats(0, 0.0, 0.0, 0.0, 0.0, 0.0)
+
+        cumulative = np.cumsum(self.__counts)
+        percentiles = []
+        for fraction in (0.5, 0.9, 0.99):
+            target = fraction * self.__num_samples
+            index = int(np.searchsorted(cumulative, target))
+            before = cumulative[index - 1] if index > 0 else 0
+            position = (target - before) / self.__counts[index]
+            low, high = self.BIN_EDGES[index], self.BIN_EDGES[index + 1]
+            percentiles.append(min(low + position * (high - low), self.__max_age) / 1e9)
+
+        return LatencyStats(
+            num_samples=self.__num_samples,
+            mean=self.__total_age / self.__num_samples / 1e9,
+            p50=percentiles[0],
+            p90=percentiles[1],
+            p99=percentiles[2],
+            max=self.__max_age / 1e9,
+        )
+
+    def reset(self) -> None:
+        """
+        Removes every recorded age.
+        """
+        self.__counts: NDArray[Any, np.int64] = np.zeros(
+            len(self.BIN_EDGES) - 1, np.int64
+        )
+        self.__num_samples: int = 0
+        self.__total_age: int = 0
+        self.__max_age: int = 0
+        self.__last_sequence: int = -1
+
+
+def stamp_to_timestamp(sec: int, nanosec: int) -> int:
+    """
+    Converts a ROS message stamp into a time.perf_counter_ns timestamp.
+
+    Args:
+        sec: The whole seconds of the wall-clock stamp.
+        nanosec: The nanoseconds of the wall-clock stamp.
+
+    Returns:
+        The monotonic time at which the message was stamped, or the current time if
+        the stamp is unset or in the future.
+    """
+    now = time.perf_counter_ns()
+    if sec == 0 and nanosec == 0:
+        return now
+
+    age = time.time_ns() - (sec * 1_000_000_000 + nanosec)
+    return now - max(age, 0)
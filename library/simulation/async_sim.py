@@ -0,0 +1,472 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Communicates with RacecarSim from an asyncio event loop.
+"""
+
+import asyncio
+import collections
+import inspect
+import socket
+import struct
+import sys
+from signal import signal, SIGINT
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+from nptyping import NDArray
+
+import display_sim
+from camera_sim import CameraSim
+from controller import Controller
+from frame_timer import FrameStats, FrameTimer
+from racecar_core_sim import (
+    RacecarSim,
+    _get_connect_message,
+    _handle_command,
+    _handle_connect_reply,
+)
+import copy_on_write
+import racecar_utils as rc_utils
+
+
+class _RacecarSimProtocol(asyncio.DatagramProtocol):
+    """
+    Sorts the datagrams from RacecarSim into replies and commands.
+    """
+
+    def __init__(self) -> None:
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+        # RacecarSim answers requests in the order they were sent, so each reply
+        # resolves the oldest pending request
+        self.replies: Deque[asyncio.Future] = collections.deque()
+        self.commands: asyncio.Queue = asyncio.Queue()
+
+    def connection_made(self, transport: asyncio.DatagramTransport) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        if self.replies:
+            # The reply of a cancelled request is discarded
+            reply = self.replies.popleft()
+            if not reply.done():
+                reply.set_result(data)
+        else:
+            self.commands.put_nowait(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if self.replies:
+            reply = self.replies.popleft()
+            if not reply.done():
+                reply.set_exception(exc)
+
+
+class CameraSimAsync:
+    def __init__(self, racecar: "RacecarSimAsync") -> None:
+        self.__racecar = racecar
+
+    async def get_color_image(self) -> NDArray[(480, 640, 3), np.uint8]:
+        return copy_on_write.get_read_only_view(await self.get_color_image_no_copy())
+
+    async def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
+        # Read the color image as 32 packets
+        return await self.__racecar._RacecarSimAsync__get(
+            struct.pack("B", RacecarSim.Header.camera_get_color_image),
+            CameraSim._decode_color_image,
+            32,
+        )
+
+    async def get_depth_image(self) -> NDArray[(480, 640), np.float32]:
+        return await self.__racecar._RacecarSimAsync__get(
+            struct.pack("B", RacecarSim.Header.camera_get_depth_image),
+            CameraSim._decode_depth_image,
+        )
+
+    def get_width(self) -> int:
+        return CameraSim._WIDTH
+
+    def get_height(self) -> int:
+        return CameraSim._HEIGHT
+
+    def get_max_range(self) -> float:
+        return CameraSim._MAX_RANGE
+
+
+class ControllerSimAsync:
+    Button = Controller.Button
+    Trigger = Controller.Trigger
+    Joystick = Controller.Joystick
+
+    def __init__(self, racecar: "RacecarSimAsync") -> None:
+        self.__racecar = racecar
+
+    async def is_down(self, button: Controller.Button) -> bool:
+        return await self.__get(
+            RacecarSim.Header.controller_is_down, button, self.__decode_bool
+        )
+
+    async def was_pressed(self, button: Controller.Button) -> bool:
+        return await self.__get(
+            RacecarSim.Header.controller_was_pressed, button, self.__decode_bool
+        )
+
+    async def was_released(self, button: Controller.Button) -> bool:
+        return await self.__get(
+            RacecarSim.Header.controller_was_released, button, self.__decode_bool
+        )
+
+    async def get_trigger(self, trigger: Controller.Trigger) -> float:
+        return await self.__get(
+            RacecarSim.Header.controller_get_trigger,
+            trigger,
+            lambda raw_bytes: struct.unpack("f", raw_bytes[:4])[0],
+        )
+
+    async def get_joystick(self, joystick: Controller.Joystick) -> Tuple[float, float]:
+        return await self.__get(
+            RacecarSim.Header.controller_get_joystick,
+            joystick,
+            lambda raw_bytes: struct.unpack("ff", raw_bytes[:8]),
+        )
+
+    def __get(
+        self, header: RacecarSim.Header, key: Any, decode: Callable[[bytes], Any]
+    ) -> Awaitable[Any]:
+        return self.__racecar._RacecarSimAsync__get(
+            struct.pack("BB", header, key.value), decode
+        )
+
+    @staticmethod
+    def __decode_bool(raw_bytes: bytes) -> bool:
+        return bool(int.from_bytes(raw_bytes, sys.byteorder))
+
+
+class DriveSimAsync:
+    def __init__(self, racecar: "RacecarSimAsync") -> None:
+        self.__racecar = racecar
+
+    async def set_speed_angle(self, speed: float, angle: float) -> None:
+        assert (
+            -1.0 <= speed <= 1.0
+        ), f"speed [{speed}] must be between -1.0 and 1.0 inclusive."
+        assert (
+            -1.0 <= angle <= 1.0
+        ), f"angle [{angle}] must be between -1.0 and 1.0 inclusive."
+
+        await self.__racecar._RacecarSimAsync__send(
+            struct.pack("Bff", RacecarSim.Header.drive_set_speed_angle, speed, angle)
+        )
+
+    async def stop(self) -> None:
+        await self.set_speed_angle(0, 0)
+
+    async def set_max_speed(self, max_speed: float = 0.25) -> None:
+        assert (
+            0.0 <= max_speed <= 1.0
+        ), f"max_speed [{max_speed}] must be between 0.0 and 1.0 inclusive."
+
+        await self.__racecar._RacecarSimAsync__send(
+            struct.pack("Bf", RacecarSim.Header.drive_set_max_speed, max_speed)
+        )
+
+
+class LidarSimAsync:
+    def __init__(self, racecar: "RacecarSimAsync") -> None:
+        self.__racecar = racecar
+
+    async def get_samples(self) -> NDArray[720, np.float32]:
+        return await self.__racecar._RacecarSimAsync__get(
+            struct.pack("B", RacecarSim.Header.lidar_get_samples),
+            lambda raw_bytes: np.frombuffer(raw_bytes, dtype=np.float32),
+        )
+
+
+class PhysicsSimAsync:
+    def __init__(self, racecar: "RacecarSimAsync") -> None:
+        self.__racecar = racecar
+
+    async def get_linear_acceleration(self) -> NDArray[3, np.float32]:
+        return await self.__racecar._RacecarSimAsync__get(
+            struct.pack("B", RacecarSim.Header.physics_get_linear_acceleration),
+            lambda raw_bytes: np.array(struct.unpack("fff", raw_bytes)),
+        )
+
+    async def get_angular_velocity(self) -> NDArray[3, np.float32]:
+        return await self.__racecar._RacecarSimAsync__get(
+            struct.pack("B", RacecarSim.Header.physics_get_angular_velocity),
+            lambda raw_bytes: np.array(struct.unpack("fff", raw_bytes)),
+        )
+
+
+class RacecarSimAsync:
+    """
+    Runs start and update functions in RacecarSim from an asyncio event loop.
+
+    Note:
+        The sensor and drive functions of this class are coroutines, and start,
+        update, and update_slow may be either coroutines or regular functions.  Sensor
+        requests made concurrently (for example with asyncio.gather) are sent to
+        RacecarSim together rather than one round trip at a time, and each value is
+        requested at most once per frame.  Only a color image transfer, which is sent
+        in fragments, holds the connection to itself.
+
+        Since the event loop keeps running while the car waits on RacecarSim, other
+        tasks, such as sending telemetry, can run alongside the car in the same
+        thread by awaiting run() instead of calling go().
+
+        The -p, -t, -r, and -b flags do not apply.
+
+    Example::
+
+        rc = racecar_core.create_racecar_async()
+
+        async def update():
+            image, depth_image, scan = await asyncio.gather(
+                rc.camera.get_color_image(),
+                rc.camera.get_depth_image(),
+                rc.lidar.get_samples(),
+            )
+            await rc.drive.set_speed_angle(0.5, 0)
+
+        rc.set_start_update(start, update)
+        rc.go()
+    """
+
+    __IP = "127.0.0.1"
+    __UNITY_PORT = (__IP, 5065)
+    __UNITY_ASYNC_PORT = (__IP, 5064)
+
+    # The number of seconds between attempts to connect to RacecarSim
+    __CONNECT_INTERVAL = 0.25
+
+    Header = RacecarSim.Header
+    Error = RacecarSim.Error
+
+    def __init__(self, isHeadless: bool = False) -> None:
+        self.camera = CameraSimAsync(self)
+        self.controller = ControllerSimAsync(self)
+        self.display = display_sim.DisplaySim(isHeadless)
+        self.drive = DriveSimAsync(self)
+        self.lidar = LidarSimAsync(self)
+        self.physics = PhysicsSimAsync(self)
+
+        self.__start: Callable[[], Any]
+        self.__update: Callable[[], Any]
+        self.__update_slow: Optional[Callable[[], Any]] = None
+        self.__update_slow_time: float = 1
+        self.__update_slow_counter: float = 0
+        self.__frame_timer = FrameTimer()
+
+        # The event loop objects are created by run, inside the loop
+        self.__protocol: Optional[_RacecarSimProtocol] = None
+        self.__lock: Optional[asyncio.Lock] = None
+
+        # The task of each request made in the current frame, indexed by its packet
+        self.__requests: Dict[bytes, asyncio.Future] = {}
+        self.__in_call: bool = False
+
+        signal(SIGINT, self.__handle_sigint)
+
+    def set_start_update(
+        self,
+        start: Callable[[], Any],
+        update: Callable[[], Any],
+        update_slow: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """
+        Sets the start and update functions, each of which may be a coroutine.
+        """
+        self.__start = start
+        self.__update = update
+        self.__update_slow = update_slow
+
+    def go(self) -> None:
+        """
+        Runs the car in a new event loop until RacecarSim closes it.
+        """
+        asyncio.run(self.run())
+
+    async def run(self) -> None:
+        """
+        Connects to RacecarSim and responds to its start and update commands until it
+        exits.
+        """
+        loop = asyncio.get_running_loop()
+        self.__lock = asyncio.Lock()
+        _, self.__protocol = await loop.create_datagram_endpoint(
+            _RacecarSimProtocol, family=socket.AF_INET
+        )
+        print(">> Python script loaded, awaiting connection from RacecarSim.")
+
+        try:
+            if await self.__connect():
+                while await self.__handle_message(
+                    await self.__protocol.commands.get()
+                ):
+                    pass
+        finally:
+            self.__protocol.transport.close()
+
+    async def get_delta_time(self) -> float:
+        return await self.__get(
+            struct.pack("B", self.Header.racecar_get_delta_time),
+            lambda raw_bytes: struct.unpack("f", raw_bytes[:4])[0],
+        )
+
+    def get_frame_timestamp(self) -> int:
+        return self.__frame_timer.get_frame_timestamp()
+
+    def get_frame_stats(self) -> FrameStats:
+        return self.__frame_timer.get_stats()
+
+    def set_update_slow_time(self, update_slow_time: float = 1.0) -> None:
+        self.__update_slow_time = update_slow_time
+
+    def __send_header(self, header: RacecarSim.Header, is_async: bool = False) -> None:
+        self.__send_data(struct.pack("B", header), is_async)
+
+    def __send_data(self, data: bytes, is_async: bool = False) -> None:
+        self.__protocol.transport.sendto(
+            data, self.__UNITY_ASYNC_PORT if is_async else self.__UNITY_PORT
+        )
+
+    def __expect_reply(self) -> asyncio.Future:
+        reply = asyncio.get_running_loop().create_future()
+        self.__protocol.replies.append(reply)
+        return reply
+
+    async def __send(self, data: bytes) -> None:
+        # Wait for any fragmented transfer, which must not be interrupted
+        async with self.__lock:
+            self.__send_data(data)
+
+    async def __request(self, data: bytes, num_fragments: int = 1) -> bytes:
+        """
+        Sends a request to RacecarSim and returns its reply.
+        """
+        if num_fragments == 1:
+            async with self.__lock:
+                reply = self.__expect_reply()
+                self.__send_data(data)
+            return await reply
+
+        # RacecarSim waits for python_send_next after each fragment
+        fragments = []
+        async with self.__lock:
+            reply = self.__expect_reply()
+            self.__send_data(data)
+            for i in range(num_fragments):
+                fragments.append(await reply)
+                if i + 1 < num_fragments:
+                    reply = self.__expect_reply()
+                self.__send_header(self.Header.python_send_next)
+        return b"".join(fragments)
+
+    def __get(
+        self, data: bytes, decode: Callable[[bytes], Any], num_fragments: int = 1
+    ) -> Awaitable[Any]:
+        """
+        Returns a task which requests data from RacecarSim at most once per frame.
+        """
+        task = self.__requests.get(data)
+        if task is None:
+
+            async def request() -> Any:
+                return decode(await self.__request(data, num_fragments))
+
+            task = asyncio.ensure_future(request())
+            self.__requests[data] = task
+        return task
+
+    async def __call(self, function: Callable[[], Any]) -> None:
+        result = function()
+        if inspect.isawaitable(result):
+            await result
+
+    async def __finish_frame(self) -> None:
+        # Requests which were not awaited must be answered before the frame ends
+        requests = list(self.__requests.values())
+        self.__requests.clear()
+        await asyncio.gather(*requests, return_exceptions=True)
+
+    async def __connect(self) -> bool:
+        """
+        Repeatedly sends the connect handshake (async) until RacecarSim responds.
+
+        Returns:
+            True if the connection was established.
+        """
+        while True:
+            self.__send_data(_get_connect_message(), True)
+            try:
+                data = await asyncio.wait_for(
+                    self.__protocol.commands.get(), self.__CONNECT_INTERVAL
+                )
+                break
+            except asyncio.TimeoutError:
+                pass
+
+        return _handle_connect_reply(data, self.__send_header)
+
+    async def __handle_message(self, data: bytes) -> bool:
+        """
+        Handles a start, update, exit, or error command from RacecarSim.
+
+        Returns:
+            False if the script should stop responding to RacecarSim.
+        """
+        header = int(data[0])
+
+        if header in (self.Header.unity_start.value, self.Header.unity_update.value):
+            try:
+                self.__in_call = True
+                if header == self.Header.unity_start.value:
+                    self.set_update_slow_time()
+                    await self.__call(self.__start)
+                    await self.__finish_frame()
+                else:
+                    await self.__handle_update()
+                self.__in_call = False
+            except SystemExit:
+                raise
+            except:
+                self.__send_data(
+                    struct.pack(
+                        "BB", self.Header.error, self.Error.python_exception
+                    )
+                )
+                raise
+        elif not _handle_command(data, self.__send_header):
+            return False
+
+        self.__send_header(self.Header.python_finished)
+        return True
+
+    async def __handle_update(self) -> None:
+        self.__frame_timer.start_frame()
+        await self.__call(self.__update)
+
+        if self.__update_slow is not None:
+            self.__update_slow_counter -= await self.get_delta_time()
+            if self.__update_slow_counter < 0:
+                await self.__call(self.__update_slow)
+                self.__update_slow_counter = self.__update_slow_time
+
+        await self.__finish_frame()
+        self.__frame_timer.end_frame()
+
+    def __handle_sigint(self, signal_received: int, frame) -> None:
+        # Send exit command to sync port if we are in the middle of servicing a start
+        # or update call; otherwise send it to the async port
+        if self.__protocol is not None:
+            is_async = not self.__in_call
+            label = "async" if is_async else "sync"
+            rc_utils.print_warning(
+                f">> CTRL-C (SIGINT) detected. Sending exit command to Unity ({label})..."
+            )
+            self.__send_header(self.Header.python_exit, is_async)
+        print(">> Closing script...")
+        exit(0)
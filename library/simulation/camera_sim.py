@@ -1,26 +1,36 @@
 import sys
+import time
 import numpy as np
+from typing import Optional, Tuple
 import cv2 as cv
 from nptyping import NDArray
 
 from camera import Camera
+import tracer
 
 
 class CameraSim(Camera):
     def __init__(self, racecar) -> None:
+        Camera.__init__(self)
         self.__racecar = racecar
         self.__color_image: NDArray[(480, 640, 3), np.uint8] = None
         self.__is_color_image_current: bool = False
         self.__depth_image: NDArray[(480, 640), np.float32] = None
         self.__is_depth_image_current: bool = False
 
+        # The time each image was requested and the number of images received before
+        self.__color_image_meta: Tuple[int, int] = (0, -1)
+        self.__depth_image_meta: Tuple[int, int] = (0, -1)
+
         self._MAX_DEPTH_WIDTH: int = self._WIDTH // 8
         self._MAX_DEPTH_HEIGHT: int = self._HEIGHT // 8
 
     def get_color_image_no_copy(self) -> NDArray[(480, 640, 3), np.uint8]:
         if not self.__is_color_image_current:
+            timestamp = time.perf_counter_ns()
             self.__color_image = self.__request_color_image(False)
             self.__is_color_image_current = True
+            self.__color_image_meta = (timestamp, self.__color_image_meta[1] + 1)
 
         return self.__color_image
 
@@ -29,19 +39,53 @@ class CameraSim(Camera):
 
     def get_depth_image(self) -> NDArray[(480, 640), np.float32]:
         if not self.__is_depth_image_current:
+            timestamp = time.perf_counter_ns()
             self.__depth_image = self.__request_depth_image(False)
-            self.__is_depth_image_current = False
+            self.__is_depth_image_current = True
+            self.__depth_image_meta = (timestamp, self.__depth_image_meta[1] + 1)
 
         return self.__depth_image
 
     def get_depth_image_async(self) -> NDArray[(480, 640), np.float32]:
         return self.__request_depth_image(True)
 
+    def has_new_color_image(self) -> bool:
+        # The simulation renders a new image every frame
+        return True
+
+    def has_new_depth_image(self) -> bool:
+        return True
+
+    def _get_color_image_meta(self) -> Tuple[int, int]:
+        return self.__color_image_meta
+
+    def _get_depth_image_meta(self) -> Tuple[int, int]:
+        return self.__depth_image_meta
+
     def __update(self) -> None:
         self.__is_color_image_current = False
         self.__is_depth_image_current = False
 
+    def __get_received_images(
+        self,
+    ) -> Tuple[
+        Optional[NDArray[(480, 640, 3), np.uint8]],
+        Optional[NDArray[(480, 640), np.float32]],
+    ]:
+        """
+        Returns the color and depth images received this frame, or None for each
+        image which was not requested.
+        """
+        return (
+            self.__color_image if self.__is_color_image_current else None,
+            self.__depth_image if self.__is_depth_image_current else None,
+        )
+
     def __request_color_image(self, isAsync: bool) -> NDArray[(480, 640), np.uint8]:
+        with tracer.span("camera.color_image", "sensor"):
+            return self.__receive_color_image(isAsync)
+
+    def __receive_color_image(self, isAsync: bool) -> NDArray[(480, 640), np.uint8]:
         # Ask for a the current color image
         self.__racecar._RacecarSim__send_header(
             self.__racecar.Header.camera_get_color_image, isAsync
@@ -51,19 +95,37 @@ class CameraSim(Camera):
         raw_bytes = self.__racecar._RacecarSim__receive_fragmented(
             32, self._WIDTH * self._HEIGHT * 4, isAsync
         )
-        color_image = np.frombuffer(raw_bytes, dtype=np.uint8)
-        color_image = np.reshape(color_image, (self._HEIGHT, self._WIDTH, 4), "C")
-
-        color_image = cv.cvtColor(color_image, cv.COLOR_RGB2BGR)
-        return color_image
+        return self._decode_color_image(raw_bytes)
 
     def __request_depth_image(self, isAsync: bool) -> NDArray[(480, 640), np.float32]:
+        with tracer.span("camera.depth_image", "sensor"):
+            return self.__receive_depth_image(isAsync)
+
+    def __receive_depth_image(self, isAsync: bool) -> NDArray[(480, 640), np.float32]:
         self.__racecar._RacecarSim__send_header(
             self.__racecar.Header.camera_get_depth_image, isAsync
         )
         raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
             self._MAX_DEPTH_WIDTH * self._MAX_DEPTH_HEIGHT * 4
         )
+        return self._decode_depth_image(raw_bytes)
+
+    @staticmethod
+    def _decode_color_image(raw_bytes: bytes) -> NDArray[(480, 640, 3), np.uint8]:
+        """
+        Converts the RGBA pixels sent by RacecarSim to a BGR image.
+        """
+        color_image = np.frombuffer(raw_bytes, dtype=np.uint8)
+        color_image = np.reshape(
+            color_image, (CameraSim._HEIGHT, CameraSim._WIDTH, 4), "C"
+        )
+        return cv.cvtColor(color_image, cv.COLOR_RGB2BGR)
+
+    @staticmethod
+    def _decode_depth_image(raw_bytes: bytes) -> NDArray[(480, 640), np.float32]:
+        """
+        Converts the reduced depth image sent by RacecarSim to full resolution.
+        """
         depth_image = np.frombuffer(raw_bytes, dtype=np.float32)
 
         # Calculate received height and width
@@ -74,6 +136,8 @@ class CameraSim(Camera):
         # Reshape and resize to full resolution
         depth_image = np.reshape(depth_image, (depth_height, depth_width), "C")
         depth_image = cv.resize(
-            depth_image, (self._WIDTH, self._HEIGHT), interpolation=cv.INTER_AREA
+            depth_image,
+            (CameraSim._WIDTH, CameraSim._HEIGHT),
+            interpolation=cv.INTER_AREA,
         )
         return depth_image
@@ -2,7 +2,9 @@ import cv2 as cv
 import numpy as np
 from nptyping import NDArray
 
+import copy_on_write
 from display import Display
+from display_worker import DisplayWorker
 
 
 class DisplaySim(Display):
@@ -10,12 +12,13 @@ class DisplaySim(Display):
 
     def __init__(self, isHeadless) -> None:
         Display.__init__(self, isHeadless)
+        if not isHeadless:
+            self._worker = DisplayWorker(self.__WINDOW_NAME, cv.WINDOW_NORMAL)
 
     def create_window(self) -> None:
         if not self._Display__isHeadless:
-            cv.namedWindow(self.__WINDOW_NAME, cv.WINDOW_NORMAL)
+            self._worker.create_window()
 
     def show_color_image(self, image: NDArray) -> None:
         if not self._Display__isHeadless:
-            cv.imshow(self.__WINDOW_NAME, image)
-            cv.waitKey(1)
+            self._worker.show(copy_on_write.resolve_image(image))
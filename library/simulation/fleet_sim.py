@@ -0,0 +1,192 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Runs several cars in RacecarSim from a single Python process.
+"""
+
+import os
+import queue
+import selectors
+import socket
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from signal import signal, SIGINT
+from typing import List, Optional, Set
+
+from racecar_core_sim import RacecarSim
+
+
+class RacecarSimFleet:
+    """
+    Manages the connections of several simulated cars, each with its own start and
+    update functions.
+
+    Note:
+        A single selector waits on every car's socket.  When several cars receive a
+        command at once, they are handed to a shared thread pool in round-robin
+        order, so no car can starve the others.  Each car's commands are still
+        handled one at a time and in order.
+
+        The display module of each car is disabled, since windows can only be shown
+        from the main thread.
+
+    Example::
+
+        fleet = racecar_core.create_racecar_fleet(2)
+
+        for rc in fleet.cars:
+            rc.set_start_update(start, update)
+
+        fleet.go()
+    """
+
+    # The number of seconds between attempts to connect to RacecarSim
+    __CONNECT_INTERVAL = 0.25
+
+    def __init__(self, num_cars: int, max_workers: Optional[int] = None) -> None:
+        """
+        Creates the simulated cars and the thread pool they share.
+
+        Args:
+            num_cars: The number of cars to connect to RacecarSim.
+            max_workers: The number of threads in the pool, or None to use one
+                thread per car up to the number of processors.
+        """
+        assert num_cars > 0, f"num_cars ({num_cars}) must be a positive integer."
+
+        self.cars: List[RacecarSim] = [RacecarSim(True) for _ in range(num_cars)]
+        if max_workers is None:
+            max_workers = min(num_cars, os.cpu_count() or 1)
+        self.__executor = ThreadPoolExecutor(max_workers, thread_name_prefix="car")
+        self.__selector = selectors.DefaultSelector()
+
+        # Worker threads report finished commands through a queue and wake up the
+        # selector by writing to a socket
+        self.__finished: queue.SimpleQueue = queue.SimpleQueue()
+        self.__wake_reader, self.__wake_writer = socket.socketpair()
+        self.__next_car: int = 0
+
+        # Replace the handlers installed by each car so that every car is closed
+        signal(SIGINT, self.__handle_sigint)
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        """
+        Returns the thread pool shared by the cars.
+
+        Note:
+            update functions may submit vision work to this pool and collect the
+            result in a later frame, so that work overlaps with the other cars.
+
+        Example::
+
+            # Find contours in the background and use them in the next frame
+            future = fleet.get_executor().submit(
+                rc_utils.find_contours, image, ORANGE[0], ORANGE[1]
+            )
+        """
+        return self.__executor
+
+    def go(self) -> None:
+        """
+        Connects every car to RacecarSim and runs their start and update functions
+        until RacecarSim closes every car.
+        """
+        print(
+            f">> Python script loaded, awaiting connection from RacecarSim for "
+            f"{len(self.cars)} cars."
+        )
+        try:
+            if self.__connect():
+                self.__serve()
+        finally:
+            self.__executor.shutdown()
+            self.__selector.close()
+
+    def __connect(self) -> bool:
+        """
+        Repeatedly sends the connect handshake (async) for each car until every car
+        has been assigned.
+
+        Returns:
+            True if every car connected.
+        """
+        pending: Set[int] = set(range(len(self.cars)))
+        for index, car in enumerate(self.cars):
+            self.__selector.register(
+                car._RacecarSim__socket, selectors.EVENT_READ, index
+            )
+
+        next_attempt = time.perf_counter()
+        while pending:
+            if time.perf_counter() >= next_attempt:
+                for index in pending:
+                    self.cars[index]._RacecarSim__send_connect()
+                next_attempt = time.perf_counter() + self.__CONNECT_INTERVAL
+
+            timeout = max(next_attempt - time.perf_counter(), 0)
+            for key, _ in self.__selector.select(timeout):
+                index = key.data
+                data, _ = key.fileobj.recvfrom(2)
+                if index not in pending:
+                    continue
+                if not self.cars[index]._RacecarSim__handle_connect(data):
+                    return False
+                pending.discard(index)
+        return True
+
+    def __serve(self) -> None:
+        """
+        Hands each command from RacecarSim to the thread pool until every car exits.
+        """
+        self.__selector.register(self.__wake_reader, selectors.EVENT_READ, None)
+        running: Set[int] = set(range(len(self.cars)))
+        while running:
+            ready: List[int] = []
+            for key, _ in self.__selector.select():
+                if key.data is None:
+                    self.__wake_reader.recv(4096)
+                else:
+                    ready.append(key.data)
+
+            # Start with the car after the last car served
+            num_cars = len(self.cars)
+            ready.sort(key=lambda index: (index - self.__next_car) % num_cars)
+            for index in ready:
+                self.__submit(index)
+                self.__next_car = (index + 1) % num_cars
+
+            while not self.__finished.empty():
+                index, future = self.__finished.get()
+                if future.result():
+                    self.__selector.register(
+                        self.cars[index]._RacecarSim__socket,
+                        selectors.EVENT_READ,
+                        index,
+                    )
+                else:
+                    running.discard(index)
+
+    def __submit(self, index: int) -> None:
+        """
+        Reads a command for a car and handles it on the thread pool.
+        """
+        car = self.cars[index]
+
+        # While the command is handled, the car's socket carries replies to its own
+        # requests, so it must not be watched by the selector
+        self.__selector.unregister(car._RacecarSim__socket)
+        data, _ = car._RacecarSim__socket.recvfrom(8)
+        future = self.__executor.submit(car._RacecarSim__handle_message, data)
+        future.add_done_callback(lambda done: self.__finish(index, done))
+
+    def __finish(self, index: int, future: Future) -> None:
+        self.__finished.put((index, future))
+        self.__wake_writer.send(b"\0")
+
+    def __handle_sigint(self, signal_received: int, frame) -> None:
+        for car in self.cars:
+            car._RacecarSim__send_exit()
+        print(">> Closing script...")
+        exit(0)
@@ -1,27 +1,37 @@
 import sys
 import struct
+import time
 import numpy as np
+from typing import Optional, Tuple
 from nptyping import NDArray
 
 from lidar import Lidar
+import tracer
 
 
 class LidarSim(Lidar):
     def __init__(self, racecar) -> None:
+        Lidar.__init__(self)
         self.__racecar = racecar
         self.__ranges: NDArray[720, np.float32]
         self.__is_current: bool = False
 
+        # The time the scan was requested and the number of scans received before
+        self.__meta: Tuple[int, int] = (0, -1)
+
     def get_samples(self) -> NDArray[720, np.float32]:
         if not self.__is_current:
-            self.__racecar._RacecarSim__send_header(
-                self.__racecar.Header.lidar_get_samples
-            )
-            raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
-                self._NUM_SAMPLES * 4
-            )
+            self.__meta = (time.perf_counter_ns(), self.__meta[1] + 1)
+            with tracer.span("lidar.samples", "sensor"):
+                self.__racecar._RacecarSim__send_header(
+                    self.__racecar.Header.lidar_get_samples
+                )
+                raw_bytes: bytes = self.__racecar._RacecarSim__receive_data(
+                    self._NUM_SAMPLES * 4
+                )
             self.__ranges = np.frombuffer(raw_bytes, dtype=np.float32)
             self.__is_current = True
+            self._record_samples(self.__ranges, self.__meta[0])
         return self.__ranges
 
     def get_samples_async(self) -> NDArray[720, np.float32]:
@@ -33,5 +43,18 @@ class LidarSim(Lidar):
         )
         return np.frombuffer(raw_bytes, dtype=np.float32)
 
+    def has_new_samples(self) -> bool:
+        # The simulation produces a new scan every frame
+        return True
+
+    def _get_samples_meta(self) -> Tuple[int, int]:
+        return self.__meta
+
+    def __get_received_samples(self) -> Optional[NDArray[720, np.float32]]:
+        """
+        Returns the scan received this frame, or None if it was not requested.
+        """
+        return self.__ranges if self.__is_current else None
+
     def __update(self) -> None:
         self.__is_current = False
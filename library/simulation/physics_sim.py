@@ -1,24 +1,71 @@
 import sys
 import struct
+import time
 import numpy as np
+from typing import Optional, Tuple
 from nptyping import NDArray
 
 from physics import Physics
+import tracer
 
 class PhysicsSim(Physics):
     def __init__(self, racecar) -> None:
+        Physics.__init__(self)
         self.__racecar = racecar
 
+        # The time each value was requested and the number of values received before
+        self.__linear_acceleration_meta: Tuple[int, int] = (0, -1)
+        self.__angular_velocity_meta: Tuple[int, int] = (0, -1)
+
+        # The values received this frame, or None if they were not requested
+        self.__linear_acceleration: Optional[NDArray[3, np.float32]] = None
+        self.__angular_velocity: Optional[NDArray[3, np.float32]] = None
+
     def get_linear_acceleration(self) -> NDArray[3, np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.physics_get_linear_acceleration
+        self.__linear_acceleration_meta = (
+            time.perf_counter_ns(),
+            self.__linear_acceleration_meta[1] + 1,
         )
-        values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
-        return np.array(values)
+        with tracer.span("physics.linear_acceleration", "sensor"):
+            self.__racecar._RacecarSim__send_header(
+                self.__racecar.Header.physics_get_linear_acceleration
+            )
+            values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
+        self.__linear_acceleration = np.array(values)
+        return self.__linear_acceleration
 
     def get_angular_velocity(self) -> NDArray[3, np.float32]:
-        self.__racecar._RacecarSim__send_header(
-            self.__racecar.Header.physics_get_angular_velocity
+        self.__angular_velocity_meta = (
+            time.perf_counter_ns(),
+            self.__angular_velocity_meta[1] + 1,
         )
-        values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
-        return np.array(values)
+        with tracer.span("physics.angular_velocity", "sensor"):
+            self.__racecar._RacecarSim__send_header(
+                self.__racecar.Header.physics_get_angular_velocity
+            )
+            values = struct.unpack("fff", self.__racecar._RacecarSim__receive_data(12))
+        self.__angular_velocity = np.array(values)
+        return self.__angular_velocity
+
+    def has_new_data(self) -> bool:
+        # The simulation measures the car's motion every frame
+        return True
+
+    def _get_linear_acceleration_meta(self) -> Tuple[int, int]:
+        return self.__linear_acceleration_meta
+
+    def _get_angular_velocity_meta(self) -> Tuple[int, int]:
+        return self.__angular_velocity_meta
+
+    def __update(self) -> None:
+        self.__linear_acceleration = None
+        self.__angular_velocity = None
+
+    def __get_received_values(
+        self,
+    ) -> Tuple[Optional[NDArray[3, np.float32]], Optional[NDArray[3, np.float32]]]:
+        """
+        Returns the linear acceleration and angular velocity received this frame, or
+        None for each value which was not requested.
+        """
+        return self.__linear_acceleration, self.__angular_velocity
@@ -6,13 +6,14 @@ Summer 2020
 Manages communication with RacecarSim.
 """
 
+import copy
 import struct
 import socket
 import sys
 import select
 from enum import IntEnum
 from signal import signal, SIGINT
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 import camera_sim
 import controller_sim
@@ -21,15 +22,18 @@ import drive_sim
 import lidar_sim
 import physics_sim
 
+from display import Display
+from frame_timer import FrameStats, FrameTimer
 from racecar_core import Racecar
+from slow_worker import SensorSnapshot, SlowWorker, SlowWorkerStats
 import racecar_utils as rc_utils
+import tracer
 
 
 class RacecarSim(Racecar):
     __IP = "127.0.0.1"
     __UNITY_PORT = (__IP, 5065)
     __UNITY_ASYNC_PORT = (__IP, 5064)
-    __VERSION = 1
 
     class Header(IntEnum):
         """
@@ -101,14 +105,17 @@ class RacecarSim(Racecar):
         raw_bytes: bytes = bytes()
         fragment_size = total_bytes // num_fragments
         for i in range(0, num_fragments):
-            raw_bytes += self.__receive_data(fragment_size)
-            self.__send_header(self.Header.python_send_next, is_async)
+            with tracer.span("receive_fragment", "network"):
+                raw_bytes += self.__receive_data(fragment_size)
+                self.__send_header(self.Header.python_send_next, is_async)
         return raw_bytes
 
-    def __init__(self, isHeadless: bool = False) -> None:
+    def __init__(
+        self, isHeadless: bool = False, display: Optional[Display] = None
+    ) -> None:
         self.camera = camera_sim.CameraSim(self)
         self.controller = controller_sim.ControllerSim(self)
-        self.display = display_sim.DisplaySim(isHeadless)
+        self.display = display or display_sim.DisplaySim(isHeadless)
         self.drive = drive_sim.DriveSim(self)
         self.physics = physics_sim.PhysicsSim(self)
         self.lidar = lidar_sim.LidarSim(self)
@@ -116,9 +123,11 @@ class RacecarSim(Racecar):
         self.__start: Callable[[], None]
         self.__update: Callable[[], None]
         self.__update_slow: Optional[Callable[[], None]]
+        self.__slow_worker: Optional[SlowWorker] = None
         self.__update_slow_time: float = 1
         self.__update_slow_counter: float = 0
         self.__delta_time: float = -1
+        self.__frame_timer = FrameTimer()
 
         self.__socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.__in_call: bool = False
@@ -130,82 +139,42 @@ class RacecarSim(Racecar):
 
         # Repeatedly try to connect to RacecarSim (async) until we receive a response
         while True:
-            self.__send_data(
-                struct.pack("BB", self.Header.connect, self.__VERSION), True
-            )
+            self.__send_connect()
             ready = select.select([self.__socket], [], [], 0.25)
             if ready[0]:
                 data, _ = self.__socket.recvfrom(2)
-                header = int(data[0])
-                if header == self.Header.connect.value:
-                    car_index = int(data[1])
-                    rc_utils.print_colored(
-                        f">> Connection established with RacecarSim (assigned to car number {car_index}). Enter user program mode in RacecarSim to begin...",
-                        rc_utils.TerminalColor.green,
-                    )
-                    break
-                elif header == self.Header.error.value:
-                    self.__handle_error(int(data[1]))
-                else:
-                    rc_utils.print_error(
-                        ">> Invalid handshake with RacecarSim, closing script..."
-                    )
-                    self.__send_header(self.Header.error)
+                if not self.__handle_connect(data):
                     return
+                break
 
         # Respond to start/update commands from RacecarSim (sync) until we receive an
         # exit or error command
         while True:
             data, _ = self.__socket.recvfrom(8)
-            header = int(data[0])
-
-            if header == self.Header.unity_start.value:
-                try:
-                    self.__in_call = True
-                    self.set_update_slow_time()
-                    self.__start()
-                    self.__in_call = False
-                except SystemExit:
-                    raise
-                except:
-                    self.__send_error(self.Error.python_exception)
-                    raise
-            elif header == self.Header.unity_update.value:
-                try:
-                    self.__in_call = True
-                    self.__handle_update()
-                    self.__in_call = False
-                except SystemExit:
-                    raise
-                except:
-                    self.__send_error(self.Error.python_exception)
-                    raise
-            elif header == self.Header.unity_exit.value:
-                rc_utils.print_warning(
-                    ">> Exit command received from RacecarSim, closing script..."
-                )
-                break
-            elif header == self.Header.error:
-                error = int(data[1]) if len(data) > 1 else self.Error.generic
-                self.__handle_error(error)
-            else:
-                rc_utils.print_error(
-                    f">> Error: unexpected packet with header [{header}] received from RacecarSim, closing script..."
-                )
-                self.__send_header(self.Header.error)
+            if not self.__handle_message(data):
                 break
 
-            self.__send_header(self.Header.python_finished)
-
     def set_start_update(
         self,
         start: Callable[[], None],
         update: Callable[[], None],
-        update_slow: Optional[Callable[[], None]] = None,
+        update_slow: Optional[Callable[..., Any]] = None,
+        update_slow_async: bool = False,
     ) -> None:
+        start, update, update_slow = self._instrument_callbacks(
+            start, update, update_slow
+        )
         self.__start = start
         self.__update = update
         self.__update_slow = update_slow
+        if self.__slow_worker is not None:
+            self.__slow_worker.close()
+        self.__slow_worker = None
+
+        # Run update_slow on its own thread, handing it a snapshot of the sensors
+        if update_slow is not None and update_slow_async:
+            self.__slow_worker = SlowWorker(update_slow)
+            self.__update_slow = self.__submit_update_slow
 
     def get_delta_time(self) -> float:
         if self.__delta_time < 0:
@@ -214,10 +183,27 @@ class RacecarSim(Racecar):
             self.__delta_time = value
         return self.__delta_time
 
+    def get_update_slow_result(self) -> Any:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_result()
+
+    def get_update_slow_stats(self) -> Optional[SlowWorkerStats]:
+        if self.__slow_worker is None:
+            return None
+        return self.__slow_worker.get_stats()
+
+    def get_frame_timestamp(self) -> int:
+        return self.__frame_timer.get_frame_timestamp()
+
+    def get_frame_stats(self) -> FrameStats:
+        return self.__frame_timer.get_stats()
+
     def set_update_slow_time(self, update_slow_time: float = 1.0) -> None:
         self.__update_slow_time = update_slow_time
 
     def __handle_update(self) -> None:
+        frame_time = self.__frame_timer.start_frame()
         self.__update()
 
         self.__delta_time = -1
@@ -230,8 +216,83 @@ class RacecarSim(Racecar):
         self.camera._CameraSim__update()
         self.controller._ControllerSim__update()
         self.lidar._LidarSim__update()
+        self.physics._PhysicsSim__update()
+        work_time = self.__frame_timer.end_frame()
+        tracer.add_span("frame", "racecar", frame_time, frame_time + work_time)
+
+    def __send_connect(self) -> None:
+        self.__send_data(_get_connect_message(), True)
+
+    def __handle_connect(self, data: bytes) -> bool:
+        """
+        Handles RacecarSim's response to the connect handshake.
+
+        Returns:
+            True if the connection was established.
+        """
+        return _handle_connect_reply(data, self.__send_header)
+
+    def __handle_message(self, data: bytes) -> bool:
+        """
+        Handles a start, update, exit, or error command from RacecarSim.
+
+        Returns:
+            False if the script should stop responding to RacecarSim.
+        """
+        header = int(data[0])
+
+        if header == self.Header.unity_start.value:
+            try:
+                self.__in_call = True
+                self.set_update_slow_time()
+                self.__start()
+                self.__in_call = False
+            except SystemExit:
+                raise
+            except:
+                self.__send_error(self.Error.python_exception)
+                raise
+        elif header == self.Header.unity_update.value:
+            try:
+                self.__in_call = True
+                self.__handle_update()
+                self.__in_call = False
+            except SystemExit:
+                raise
+            except:
+                self.__send_error(self.Error.python_exception)
+                raise
+        elif not _handle_command(data, self.__send_header):
+            return False
+
+        self.__send_header(self.Header.python_finished)
+        return True
+
+    def _take_snapshot(self) -> SensorSnapshot:
+        # Only copy the data received this frame, since requesting more from
+        # RacecarSim would delay the frame
+        color_image, depth_image = self.camera._CameraSim__get_received_images()
+        linear_acceleration, angular_velocity = (
+            self.physics._PhysicsSim__get_received_values()
+        )
+        return SensorSnapshot(
+            timestamp=self.get_frame_timestamp(),
+            color_image=copy.deepcopy(color_image),
+            depth_image=copy.deepcopy(depth_image),
+            lidar_samples=copy.deepcopy(self.lidar._LidarSim__get_received_samples()),
+            linear_acceleration=linear_acceleration,
+            angular_velocity=angular_velocity,
+        )
+
+    def __submit_update_slow(self) -> None:
+        self.__slow_worker.submit(self._take_snapshot())
 
     def __handle_sigint(self, signal_received: int, frame) -> None:
+        self.__send_exit()
+        print(">> Closing script...")
+        exit(0)
+
+    def __send_exit(self) -> None:
         # Send exit command to sync port if we are in the middle of servicing a start
         # or update call; otherwise send it to the async port
         is_async = not self.__in_call
@@ -242,24 +303,97 @@ class RacecarSim(Racecar):
         )
         self.__send_header(self.Header.python_exit, is_async)
 
-        print(">> Closing script...")
-        exit(0)
 
-    def __handle_error(self, error: Error):
-        text = ">> Error: "
-        if error == self.Error.generic:
-            text += "An unknown error has occurred when communicating with RacecarSim."
-        elif error == self.Error.timeout:
-            text = "The Python script took too long to respond to RacecarSim. If this issue persists, make sure that your script does not block execution."
-        elif error == self.Error.no_free_car:
-            text += "Unable to connect to RacecarSim because every racecar already has a connected Python script."
-        elif error == self.Error.python_outdated:
-            text = "racecar_core is out of date and incompatible with RacecarSim. Please update your Python racecar libraries to the newest version."
-        elif error == self.Error.racecarsim_outdated:
-            text = "RacecarSim is out of date and incompatible with racecar_core. Please download the newest version of RacecarSim."
-        elif error == self.Error.fragment_mismatch:
-            text = "RacecarSim and Python become out of sync while sending a block message."
-
-        rc_utils.print_error(text)
-        print(">> Closing script...")
-        exit(0)
+
+# The version of the communication protocol sent in the connect handshake
+_VERSION = 1
+
+
+def _get_connect_message() -> bytes:
+    """
+    Returns the connect handshake, which is sent (async) until RacecarSim responds.
+    """
+    return struct.pack("BB", RacecarSim.Header.connect, _VERSION)
+
+
+def _handle_connect_reply(
+    data: bytes, send_header: Callable[[RacecarSim.Header], None]
+) -> bool:
+    """
+    Handles RacecarSim's response to the connect handshake.
+
+    Args:
+        data: The packet which RacecarSim sent in response.
+        send_header: Sends a packet containing only a header to RacecarSim (sync).
+
+    Returns:
+        True if the connection was established.
+    """
+    header = int(data[0])
+    if header == RacecarSim.Header.connect.value:
+        car_index = int(data[1])
+        rc_utils.print_colored(
+            f">> Connection established with RacecarSim (assigned to car number {car_index}). Enter user program mode in RacecarSim to begin...",
+            rc_utils.TerminalColor.green,
+        )
+        return True
+    elif header == RacecarSim.Header.error.value:
+        _handle_error(int(data[1]))
+    else:
+        rc_utils.print_error(">> Invalid handshake with RacecarSim, closing script...")
+        send_header(RacecarSim.Header.error)
+    return False
+
+
+def _handle_command(
+    data: bytes, send_header: Callable[[RacecarSim.Header], None]
+) -> bool:
+    """
+    Handles a command from RacecarSim other than start and update.
+
+    Args:
+        data: The packet containing the command.
+        send_header: Sends a packet containing only a header to RacecarSim (sync).
+
+    Returns:
+        False if the script should stop responding to RacecarSim.
+    """
+    header = int(data[0])
+    if header == RacecarSim.Header.unity_exit.value:
+        rc_utils.print_warning(
+            ">> Exit command received from RacecarSim, closing script..."
+        )
+        return False
+    elif header == RacecarSim.Header.error:
+        error = int(data[1]) if len(data) > 1 else RacecarSim.Error.generic
+        _handle_error(error)
+    else:
+        rc_utils.print_error(
+            f">> Error: unexpected packet with header [{header}] received from RacecarSim, closing script..."
+        )
+        send_header(RacecarSim.Header.error)
+        return False
+    return True
+
+
+def _handle_error(error: RacecarSim.Error) -> None:
+    """
+    Prints the message for an error code received from RacecarSim and exits.
+    """
+    text = ">> Error: "
+    if error == RacecarSim.Error.generic:
+        text += "An unknown error has occurred when communicating with RacecarSim."
+    elif error == RacecarSim.Error.timeout:
+        text = "The Python script took too long to respond to RacecarSim. If this issue persists, make sure that your script does not block execution."
+    elif error == RacecarSim.Error.no_free_car:
+        text += "Unable to connect to RacecarSim because every racecar already has a connected Python script."
+    elif error == RacecarSim.Error.python_outdated:
+        text = "racecar_core is out of date and incompatible with RacecarSim. Please update your Python racecar libraries to the newest version."
+    elif error == RacecarSim.Error.racecarsim_outdated:
+        text = "RacecarSim is out of date and incompatible with racecar_core. Please download the newest version of RacecarSim."
+    elif error == RacecarSim.Error.fragment_mismatch:
+        text = "RacecarSim and Python become out of sync while sending a block message."
+
+    rc_utils.print_error(text)
+    print(">> Closing script...")
+    exit(0)
@@ -0,0 +1,156 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the SlowWorker class, which runs update_slow on a separate thread.
+"""
+
+import threading
+import time
+import traceback
+import numpy as np
+from typing import Any, Callable, NamedTuple, Optional
+from nptyping import NDArray
+
+import racecar_utils as rc_utils
+from latest_value import LatestValue
+
+
+class SensorSnapshot(NamedTuple):
+    """
+    A copy of the sensor data captured in a single frame.
+    """
+
+    # The monotonic timestamp (in nanoseconds) of the frame
+    timestamp: int
+
+    # In the simulator, data which the frame did not request is None
+    color_image: Optional[NDArray[(480, 640, 3), np.uint8]]
+    depth_image: Optional[NDArray[(480, 640), np.float32]]
+    lidar_samples: Optional[NDArray[720, np.float32]]
+    linear_acceleration: Optional[NDArray[3, np.float32]]
+    angular_velocity: Optional[NDArray[3, np.float32]]
+
+
+class SlowWorkerStats(NamedTuple):
+    """
+    Summarizes how far behind the control loop update_slow runs.
+    """
+
+    # The number of times update_slow finished
+    num_runs: int
+
+    # The number of snapshots replaced by a newer snapshot before update_slow began
+    num_dropped: int
+
+    # The average, longest, and most recent number of seconds from the frame in
+    # which a snapshot was taken until update_slow finished processing it
+    mean_lag: float
+    max_lag: float
+    last_lag: float
+
+
+class SlowWorker:
+    """
+    Calls update_slow on a dedicated thread so that it cannot delay the frame in
+    which it was requested.
+
+    Only the most recent snapshot is kept; if update_slow is still running when
+    a new snapshot arrives, any snapshot still waiting is dropped.
+    """
+
+    def __init__(self, update_slow: Callable[[SensorSnapshot], Any]) -> None:
+        self.__update_slow = update_slow
+        self.__condition = threading.Condition()
+
+        # The snapshot waiting to be passed to update_slow
+        self.__pending: Optional[SensorSnapshot] = None
+        self.__is_closed: bool = False
+
+        # The value returned by the most recent call to update_slow
+        self.__result: LatestValue = LatestValue()
+
+        # The statistics are guarded by the condition's lock, like the pending
+        # snapshot, since dropping a snapshot is counted while replacing it
+        self.__num_runs: int = 0
+        self.__num_dropped: int = 0
+        self.__total_lag_ns: int = 0
+        self.__max_lag_ns: int = 0
+        self.__last_lag_ns: int = 0
+
+        self.__thread = threading.Thread(target=self.__run, name="update_slow")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def submit(self, snapshot: SensorSnapshot) -> None:
+        """
+        Requests that update_slow runs on a snapshot as soon as the worker is free.
+        """
+        with self.__condition:
+            if self.__is_closed:
+                return
+            if self.__pending is not None:
+                self.__num_dropped += 1
+            self.__pending = snapshot
+            self.__condition.notify()
+
+    def close(self) -> None:
+        """
+        Stops the worker thread once any call to update_slow in progress finishes.
+
+        Note:
+            A snapshot still waiting is dropped, and later snapshots are ignored.
+        """
+        with self.__condition:
+            self.__is_closed = True
+            self.__pending = None
+            self.__condition.notify()
+
+    def get_result(self) -> Any:
+        """
+        Returns the value returned by the most recent call to update_slow.
+        """
+        return self.__result.get_value()
+
+    def get_stats(self) -> SlowWorkerStats:
+        """
+        Returns statistics about how far behind the control loop update_slow runs.
+        """
+        with self.__condition:
+            return SlowWorkerStats(
+                num_runs=self.__num_runs,
+                num_dropped=self.__num_dropped,
+                mean_lag=self.__total_lag_ns / max(self.__num_runs, 1) / 1e9,
+                max_lag=self.__max_lag_ns / 1e9,
+                last_lag=self.__last_lag_ns / 1e9,
+            )
+
+    def __run(self) -> None:
+        """
+        Waits for snapshots and passes each one to update_slow.
+        """
+        while True:
+            with self.__condition:
+                while self.__pending is None and not self.__is_closed:
+                    self.__condition.wait()
+                if self.__is_closed:
+                    return
+                snapshot = self.__pending
+                self.__pending = None
+
+            try:
+                result = self.__update_slow(snapshot)
+            except Exception:
+                rc_utils.print_error(
+                    ">> Error in update_slow:\n" + traceback.format_exc()
+                )
+                continue
+
+            self.__result.publish(result)
+            lag_ns = time.perf_counter_ns() - snapshot.timestamp
+            with self.__condition:
+                self.__num_runs += 1
+                self.__total_lag_ns += lag_ns
+                self.__max_lag_ns = max(self.__max_lag_ns, lag_ns)
+                self.__last_lag_ns = lag_ns
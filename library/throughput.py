@@ -0,0 +1,189 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the ThroughputMeter class, which measures how fast a program runs update and
+how its CPU time divides between the library and the user's code.
+"""
+
+import functools
+import json
+import resource
+import threading
+import time
+import types
+from typing import Any, Callable, NamedTuple, Optional
+
+import instrument
+
+
+class ThroughputStats(NamedTuple):
+    """
+    Summarizes the speed and resource use of a program.
+    """
+
+    # The number of calls to update and the seconds between the first and last call
+    num_ticks: int
+    wall_time: float
+
+    # The number of calls to update per second
+    ticks_per_second: float
+
+    # The CPU seconds used by the whole process per tick, including other threads
+    process_cpu_per_tick: float
+
+    # The CPU seconds spent in update per tick, split between racecar_core and
+    # racecar_utils functions and the rest of the user's code
+    update_cpu_per_tick: float
+    library_cpu_per_tick: float
+    user_cpu_per_tick: float
+
+    # The largest resident set size of the process in megabytes, assuming Linux,
+    # which reports it in kilobytes
+    peak_rss: float
+
+
+class ThroughputMeter:
+    """
+    Measures the CPU time of update and of the library functions it calls.
+
+    Note:
+        CPU time is measured with time.thread_time_ns on the thread running update.
+        Only library calls made from update are counted, and only the outermost call
+        when library functions call each other, so library time is never counted
+        twice.
+    """
+
+    def __init__(self) -> None:
+        self.__local = threading.local()
+
+        # Guards the totals, since update may run on a different thread than the one
+        # which reads the statistics
+        self.__lock = threading.Lock()
+        self.__num_ticks: int = 0
+        self.__update_cpu: int = 0
+        self.__library_cpu: int = 0
+        self.__first_tick: int = 0
+        self.__last_tick: int = 0
+        self.__start_process_cpu: int = time.process_time_ns()
+        self.__process_cpu: int = 0
+
+    def wrap_update(self, update: Callable[[], None]) -> Callable[[], None]:
+        """
+        Returns a function which calls update and measures its CPU time.
+        """
+
+        @functools.wraps(update)
+        def measured_update() -> None:
+            now = time.perf_counter_ns()
+            with self.__lock:
+                if self.__num_ticks == 0:
+                    self.__first_tick = now
+                    self.__start_process_cpu = time.process_time_ns()
+
+            self.__local.in_update = True
+            start = time.thread_time_ns()
+            try:
+                update()
+            finally:
+                update_cpu = time.thread_time_ns() - start
+                self.__local.in_update = False
+                with self.__lock:
+                    self.__update_cpu += update_cpu
+                    self.__last_tick = now
+                    self.__process_cpu = (
+                        time.process_time_ns() - self.__start_process_cpu
+                    )
+                    self.__num_ticks += 1
+
+        return measured_update
+
+    def start_call(self) -> Optional[int]:
+        """
+        Returns the CPU time at the start of a call to a wrapped function (see
+        instrument.wrap), or None if the call is not counted as library time.
+        """
+        local = self.__local
+        if not getattr(local, "in_update", False) or getattr(local, "in_call", False):
+            return None
+
+        local.in_call = True
+        return time.thread_time_ns()
+
+    def end_call(self, name: str, start: Optional[int]) -> None:
+        """
+        Counts a call to a wrapped function which began at start as library time.
+        """
+        if start is None:
+            return
+
+        library_cpu = time.thread_time_ns() - start
+        self.__local.in_call = False
+        with self.__lock:
+            self.__library_cpu += library_cpu
+
+    def wrap(self, function: Callable, name: str) -> Callable:
+        """
+        Returns a function which calls function and counts its CPU time as library
+        time.
+        """
+        return instrument.wrap(function, name, self)
+
+    def instrument_object(self, obj: Any, prefix: str) -> None:
+        """
+        Counts the time spent in the public methods of an object as library time.
+        """
+        instrument.instrument_object(obj, prefix, self)
+
+    def instrument_module(self, module: types.ModuleType, prefix: str) -> None:
+        """
+        Counts the time spent in the public functions of a module as library time.
+        """
+        instrument.instrument_module(module, prefix, self)
+
+    def get_stats(self) -> ThroughputStats:
+        """
+        Returns the speed and resource use measured so far.
+        """
+        with self.__lock:
+            num_ticks = self.__num_ticks
+            wall_time = (self.__last_tick - self.__first_tick) / 1e9
+            process_cpu = self.__process_cpu
+            update_cpu = self.__update_cpu
+            library_cpu = self.__library_cpu
+
+        per_tick = max(num_ticks, 1) * 1e9
+        return ThroughputStats(
+            num_ticks=num_ticks,
+            wall_time=wall_time,
+            ticks_per_second=(num_ticks - 1) / wall_time if wall_time else 0.0,
+            process_cpu_per_tick=process_cpu / per_tick,
+            update_cpu_per_tick=update_cpu / per_tick,
+            library_cpu_per_tick=library_cpu / per_tick,
+            user_cpu_per_tick=(update_cpu - library_cpu) / per_tick,
+            peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        )
+
+    def format_stats(self) -> str:
+        """
+        Returns a summary of the speed and resource use measured so far.
+        """
+        stats = self.get_stats()
+        return (
+            f">> {stats.num_ticks} ticks in {stats.wall_time:.2f} s "
+            f"({stats.ticks_per_second:.1f} ticks/s)\n"
+            f">> CPU per tick (ms): process {stats.process_cpu_per_tick * 1000:.3f} | "
+            f"update {stats.update_cpu_per_tick * 1000:.3f} "
+            f"(library {stats.library_cpu_per_tick * 1000:.3f}, "
+            f"user {stats.user_cpu_per_tick * 1000:.3f})\n"
+            f">> peak RSS: {stats.peak_rss:.1f} MB"
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Writes the measured speed and resource use to a JSON file and prints them.
+        """
+        with open(path, "w") as file:
+            json.dump(self.get_stats()._asdict(), file, indent=2)
+        print(self.format_stats())
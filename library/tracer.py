@@ -0,0 +1,159 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Contains the Tracer class, which records a timeline of the racecar's work that can be
+viewed in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class Tracer:
+    """
+    Records named spans of time in a bounded ring and saves them as a Chrome trace.
+
+    Note:
+        Each span is stored as a single tuple appended to a deque, which is safe to
+        do from any thread.  Once the ring is full, the oldest spans are discarded.
+    """
+
+    # The number of spans kept by default (about 10 seconds of a busy control loop)
+    DEFAULT_CAPACITY = 200_000
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        assert capacity > 0, f"capacity ({capacity}) must be a positive integer."
+        self.__events: collections.deque = collections.deque(maxlen=capacity)
+        self.__thread_names: Dict[int, str] = {}
+
+    def add_span(self, name: str, category: str, start: int, end: int) -> None:
+        """
+        Records a span of time.
+
+        Args:
+            name: The name shown on the span.
+            category: The kind of work done in the span, such as "sensor".
+            start: The start of the span in time.perf_counter_ns units.
+            end: The end of the span in time.perf_counter_ns units.
+        """
+        thread_id = threading.get_ident()
+        if thread_id not in self.__thread_names:
+            self.__thread_names[thread_id] = threading.current_thread().name
+        self.__events.append((name, category, start, end - start, thread_id))
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str) -> Iterator[None]:
+        """
+        Records the time spent in a with block as a span.
+        """
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter_ns())
+
+    def wrap(self, function: Callable, name: str, category: str) -> Callable:
+        """
+        Returns a function which calls function and records each call as a span.
+        """
+
+        @functools.wraps(function)
+        def traced(*args, **kwargs) -> Any:
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add_span(name, category, start, time.perf_counter_ns())
+
+        return traced
+
+    def save(self, path: str) -> int:
+        """
+        Writes the recorded spans to a Chrome trace JSON file.
+
+        Args:
+            path: The file to write.
+
+        Returns:
+            The number of spans written.
+        """
+        events = list(self.__events)
+        pid = os.getpid()
+        trace_events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": thread_id,
+                "args": {"name": thread_name},
+            }
+            for thread_id, thread_name in list(self.__thread_names.items())
+        ]
+        for name, category, start, duration, thread_id in events:
+            trace_events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": thread_id,
+                }
+            )
+
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, file)
+        return len(events)
+
+    def clear(self) -> None:
+        """
+        Removes every recorded span.
+        """
+        self.__events.clear()
+
+
+# The tracer used by the racecar modules, or None if tracing is disabled
+_tracer: Optional[Tracer] = None
+
+
+def enable_tracing(capacity: int = Tracer.DEFAULT_CAPACITY) -> Tracer:
+    """
+    Creates the tracer used by the racecar modules if it does not already exist.
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer(capacity)
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Returns the tracer used by the racecar modules, or None if tracing is disabled.
+    """
+    return _tracer
+
+
+def span(name: str, category: str) -> contextlib.AbstractContextManager:
+    """
+    Records a with block as a span if tracing is enabled, and otherwise does nothing.
+    """
+    if _tracer is None:
+        return contextlib.nullcontext()
+    return _tracer.span(name, category)
+
+
+def add_span(name: str, category: str, start: int, end: int) -> None:
+    """
+    Records a span of time if tracing is enabled, and otherwise does nothing.
+    """
+    if _tracer is not None:
+        _tracer.add_span(name, category, start, end)
@@ -0,0 +1,47 @@
+"""
+Copyright MIT and Harvey Mudd College
+MIT License
+Summer 2020
+
+Tests for the LIDAR functions of racecar_utils.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(1, os.path.join(os.path.dirname(__file__), "..", "library"))
+import racecar_utils as rc_utils
+
+
+def test_get_lidar_clusters_ignores_dropped_clusters() -> None:
+    # A single-sample cluster lies between two clusters which are kept
+    scan = np.zeros(720, np.float32)
+    scan[0:10] = 100
+    scan[20] = 300
+    scan[40:50] = 100
+
+    clusters = rc_utils.get_lidar_clusters(scan)
+
+    assert len(clusters) == 2
+    for cluster, first in zip(clusters, (0, 40)):
+        angles = np.arange(first, first + 10) * (2 * np.pi / 720)
+        np.testing.assert_allclose(
+            cluster[0:2],
+            (np.mean(100 * np.sin(angles)), np.mean(100 * np.cos(angles))),
+            rtol=1e-5,
+        )
+        np.testing.assert_allclose(cluster[3], 100, rtol=1e-5)
+        assert (cluster[4], cluster[5]) == (first, first + 9)
+
+
+def test_get_lidar_clusters_ignores_dropped_cluster_after_last() -> None:
+    scan = np.zeros(720, np.float32)
+    scan[0:10] = 100
+    scan[20] = 50
+
+    clusters = rc_utils.get_lidar_clusters(scan)
+
+    assert len(clusters) == 1
+    np.testing.assert_allclose(clusters[0, 3], 100, rtol=1e-5)